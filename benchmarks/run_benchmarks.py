@@ -0,0 +1,89 @@
+import os
+import platform
+import sys
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), 'scripts'))
+
+# Cold runs: no saved company index, domain table or NER cache carried between runs
+for variable in ('COMPANY_INDEX_PATH', 'DOMAIN_TABLE_PATH', 'NER_CACHE_PATH'):
+    os.environ.setdefault(variable, '')
+
+import pandas as pd
+import instrumentation
+from dataset_store import PARQUET_AVAILABLE, dataset_path, load_dataset, save_dataset
+from extract_emails import extract_mbox
+from run_pipeline import pipeline_stages, run_pipeline
+from synthetic_data import make_dataset, write_mbox
+
+DATA_DIR = os.path.join(BENCHMARK_DIR, 'data')        # generated inputs, reused across runs
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')  # one JSON report per size and run
+
+SIZES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+DEFAULT_SIZES = ['1k', '10k']
+SEED = 42
+
+# Fixed analysis date, so the metric stages see the same ages on every run
+CURRENT_DATE = datetime(2025, 7, 1)
+
+def synthetic_mbox(label):
+    path = os.path.join(DATA_DIR, f"synthetic_{label}_seed{SEED}.mbox")
+    if not os.path.exists(path):
+        print(f"📧 Generating {path}...")
+        write_mbox(path, SIZES[label], SEED)
+    return path
+
+def synthetic_dataset(label):
+    path = dataset_path(f"SYNTHETIC_{label}", f"seed{SEED}", output_dir=DATA_DIR)
+    if not os.path.exists(path):
+        print(f"📊 Generating {path}...")
+        save_dataset(make_dataset(SIZES[label], SEED), f"SYNTHETIC_{label}", f"seed{SEED}", DATA_DIR)
+    return path
+
+def benchmark(label, workers=None):
+    """Time extraction and every run_pipeline stage on one synthetic size, return the report path"""
+    print(f"\n🏁 Benchmark {label} ({SIZES[label]:,} emails)")
+    report = instrumentation.start_report(f"benchmark_{label}")
+    report.metadata = {
+        'emails': SIZES[label],
+        'seed': SEED,
+        'workers': workers or os.cpu_count(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'parquet': PARQUET_AVAILABLE,
+        'machine': platform.platform(),
+    }
+
+    # Generated once per size and seed; later runs just reuse the files
+    with instrumentation.stage('Generating inputs'):
+        mbox_path = synthetic_mbox(label)
+        dataset_file = synthetic_dataset(label)
+
+    with instrumentation.stage('Extraction') as timer:
+        timer.done(extract_mbox(mbox_path, workers))
+    with instrumentation.stage('Loading dataset') as timer:
+        df = timer.done(load_dataset(dataset_file))
+
+    # CONSOLIDATED = group_email_threads, WITH_METRICS = calculate_metrics, FINAL_CLEAN =
+    # greenhouse_cleanup, FINAL_CLEANED = hi_the_cleanup, SUPER_CLEAN = extract_from_subjects
+    run_pipeline(df, pipeline_stages(current_date=CURRENT_DATE))
+    return report.write(RESULTS_DIR)
+
+if __name__ == '__main__':
+    # Usage: python benchmarks/run_benchmarks.py [1k] [10k] [100k] [1m] [--workers=N]
+    args = sys.argv[1:]
+    labels = [arg.lower() for arg in args if not arg.startswith('--')] or DEFAULT_SIZES
+    unknown = [label for label in labels if label not in SIZES]
+    if unknown:
+        raise SystemExit(f"Unknown size(s): {', '.join(unknown)} (sizes: {', '.join(SIZES)})")
+    workers = [int(arg.split('=', 1)[1]) for arg in args if arg.startswith('--workers=')]
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    print(f"📏 Benchmarking sizes: {', '.join(labels)}")
+    reports = [benchmark(label, workers[0] if workers else None) for label in labels]
+
+    print(f"\n🎯 Benchmark reports:")
+    for path in reports:
+        print(f"  {path}")
\ No newline at end of file
@@ -0,0 +1,259 @@
+import base64
+import random
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+import pandas as pd
+
+# Synthetic job search mailboxes shaped like a real Takeout export (see docs/data_schema.md).
+# Every application gets a confirmation; some go on to rejections, interview
+# threads (replies carry In-Reply-To/References) and offers with PDF
+# attachments. LinkedIn job alerts add the near-duplicate notifications.
+
+OWNER = 'Jennifer Touchton'
+OWNER_EMAIL = 'jennifer@example.com'
+START_DATE = datetime(2025, 1, 1, 8, 0)
+DAYS = 180
+
+COMPANY_PREFIXES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Stark', 'Wayne', 'Hooli', 'Vandelay', 'Soylent',
+                    'Cyberdyne', 'Tyrell', 'Wonka', 'Aperture', 'Massive', 'Pied', 'Blue', 'Red', 'North',
+                    'Summit', 'Bright', 'Clear', 'Silver', 'Evergreen', 'Harbor', 'Pioneer', 'Atlas', 'Nimbus',
+                    'Vertex', 'Quantum', 'Horizon', 'Cascade', 'Granite', 'Beacon', 'Keystone', 'Meridian',
+                    'Orbit', 'Praxis', 'Redwood', 'Sterling', 'Tandem']
+COMPANY_SUFFIXES = ['', ' Labs', ' Health', ' Financial', ' Systems', ' Analytics', ' Logistics', ' Energy',
+                    ' Software', ' Group', ' Partners', ' Retail', ' Insurance', ' Bank', ' Media', ' Foods',
+                    ' Robotics', ' Networks', ' Consulting', ' Solutions', ' Capital', ' Mobility', ' Bio',
+                    ' Cloud', ' Works']
+LEGAL_SUFFIXES = ['', '', '', ' Inc', ' LLC', ' Corp']
+ROLES = ['Business Analyst', 'Senior Business Analyst', 'Project Manager', 'Data Analyst', 'Product Manager',
+         'Operations Manager', 'PMO Lead', 'Program Manager', 'Business Systems Analyst', 'Scrum Master']
+RECRUITER_NAMES = ['Alex Kim', 'Sam Rivera', 'Jordan Lee', 'Taylor Brooks', 'Morgan Patel', 'Casey Nguyen',
+                   'Jamie Chen', 'Riley Johnson']
+
+# (sender kind, share of applications)
+SENDER_KINDS = [('greenhouse', 0.20), ('workday', 0.12), ('icims', 0.08), ('lever', 0.08),
+                ('company', 0.37), ('recruiter', 0.15)]
+
+# Share of emails that are LinkedIn job alerts (near-identical notifications)
+JOB_ALERT_SHARE = 0.08
+
+# Outcomes after the confirmation email (the rest never hear back)
+REJECTION_RATE = 0.45
+INTERVIEW_RATE = 0.15
+FOLLOW_UP_RATE = 0.10
+OFFER_RATE = 0.15  # of interviews
+
+HTML_SHARE = 0.3  # of ATS emails sent as HTML only
+ATTACHMENT_BYTES = 8 * 1024
+
+def company_slug(company):
+    return ''.join(ch for ch in company.lower() if ch.isalnum())
+
+def sender_for(kind, company, rnd):
+    """(display name, address) of the sender for one application"""
+    slug = company_slug(company)
+    if kind == 'greenhouse':
+        return f"{company} Recruiting", 'no-reply@us.greenhouse-mail.io'
+    if kind == 'workday':
+        return f"{company} Careers", f"{slug}@myworkday.com"
+    if kind == 'icims':
+        return f"{company} Talent Acquisition", f"{slug}@talent.icims.com"
+    if kind == 'lever':
+        return company, 'no-reply@hire.lever.co'
+    if kind == 'recruiter':
+        name = rnd.choice(RECRUITER_NAMES)
+        return name, f"{name.lower().replace(' ', '.')}@gmail.com"
+    return f"{company} Careers", f"{rnd.choice(['careers', 'talent', 'jobs', 'recruiting'])}@{slug}.com"
+
+def html_body(text):
+    paragraphs = ''.join(f"<p>{line}</p>" for line in text.split('\n') if line)
+    return (f'<html xmlns="http://www.w3.org/1999/xhtml"><head><style>p {{ margin: 0 }}</style></head>'
+            f'<body><div class="content">{paragraphs}</div></body></html>')
+
+class SyntheticMailbox:
+    """Deterministic stream of synthetic emails (dicts) for a given seed"""
+
+    def __init__(self, seed=0):
+        self.rnd = random.Random(seed)
+        self.companies = [f"{prefix}{suffix}" for prefix in COMPANY_PREFIXES for suffix in COMPANY_SUFFIXES]
+        self.sequence = 0
+
+    def message_id(self):
+        self.sequence += 1
+        return f"<synthetic.{self.sequence}@mail.example.com>"
+
+    def email(self, date, sender, subject, body, status, company, role, kind, parent=None, attachment=None):
+        display, address = sender
+        return {
+            'message_id': self.message_id(),
+            'in_reply_to': parent['message_id'] if parent else '',
+            'references': f"{parent['references']} {parent['message_id']}".strip() if parent else '',
+            'sender_name': display,
+            'sender_email': address,
+            'subject_line': subject,
+            'email_date': date,
+            'body': body,
+            'html': kind in ('greenhouse', 'workday', 'icims', 'lever') and self.rnd.random() < HTML_SHARE,
+            'attachment': attachment,
+            'status': status,
+            'company': company,
+            'role': role,
+            'sender_kind': kind,
+        }
+
+    def application(self):
+        """All emails of one job application, in date order"""
+        rnd = self.rnd
+        company = rnd.choice(self.companies) + rnd.choice(LEGAL_SUFFIXES)
+        role = rnd.choice(ROLES)
+        kind = rnd.choices([kind for kind, _ in SENDER_KINDS], [share for _, share in SENDER_KINDS])[0]
+        sender = sender_for(kind, company, rnd)
+        date = START_DATE + timedelta(days=rnd.random() * DAYS)
+
+        emails = [self.email(date, sender, f"Thank you for applying to {company}",
+                             f"Hi Jennifer,\nThank you for applying to the {role} position at {company}. "
+                             f"Our team will review your application and reach out if there is a match.\n"
+                             f"Best,\n{company} Talent Team", 'applied', company, role, kind)]
+        outcome = rnd.random()
+        if outcome < REJECTION_RATE:
+            date += timedelta(days=rnd.randint(3, 30))
+            emails.append(self.email(date, sender, f"Update on your application to {company}",
+                                     f"Dear Jennifer,\nThank you for your interest in {company}. Unfortunately "
+                                     f"we will not be moving forward with your application for {role}.\n"
+                                     f"We wish you the best in your search.", 'rejected', company, role, kind))
+        elif outcome < REJECTION_RATE + INTERVIEW_RATE:
+            date += timedelta(days=rnd.randint(2, 14))
+            interview = self.email(date, sender, f"Interview for {role} at {company}",
+                                   f"Hi Jennifer,\nWe'd love to schedule an interview for the {role} role. "
+                                   f"Please pick a time that works for you this week.", 'interview_scheduled',
+                                   company, role, kind)
+            emails.append(interview)
+            parent = interview
+            for _ in range(rnd.randint(0, 3)):
+                date += timedelta(hours=rnd.randint(2, 72))
+                parent = self.email(date, sender, f"Re: Interview for {role} at {company}",
+                                    "Thanks Jennifer, confirming our call. A calendar invite is on its way.",
+                                    'interview_scheduled', company, role, kind, parent)
+                emails.append(parent)
+            if rnd.random() < OFFER_RATE:
+                date += timedelta(days=rnd.randint(3, 21))
+                emails.append(self.email(date, sender, f"Offer of employment - {role}",
+                                         f"Dear Jennifer,\nWe are pleased to extend an offer for the {role} "
+                                         f"position at {company}. Please find the offer letter attached.",
+                                         'offer', company, role, kind, parent,
+                                         attachment=('offer_letter.pdf', rnd.randbytes(ATTACHMENT_BYTES))))
+        elif outcome < REJECTION_RATE + INTERVIEW_RATE + FOLLOW_UP_RATE:
+            date += timedelta(days=rnd.randint(5, 40))
+            emails.append(self.email(date, sender, f"Checking in on your {role} application",
+                                     f"Hi Jennifer,\nJust checking in - your application with {company} is "
+                                     f"still under review. We'll have an update soon.", 'follow_up',
+                                     company, role, kind))
+        return emails
+
+    def job_alert(self):
+        rnd = self.rnd
+        date = START_DATE + timedelta(days=rnd.random() * DAYS)
+        role = rnd.choice(ROLES)
+        listings = ', '.join(rnd.sample(self.companies, 3))
+        return self.email(date, ('LinkedIn Job Alerts', 'jobalerts-noreply@linkedin.com'),
+                          f"{role}: new jobs for you",
+                          f"Jobs you may be interested in: {rnd.randint(2, 40)} new {role} jobs. "
+                          f"Top picks: {listings}. Manage your job alerts.", 'unknown', 'LinkedIn', role,
+                          'linkedin')
+
+    def emails(self, n):
+        """Exactly n emails, sorted by date"""
+        emails = []
+        while len(emails) < n:
+            if self.rnd.random() < JOB_ALERT_SHARE:
+                emails.append(self.job_alert())
+            else:
+                emails.extend(self.application())
+        emails = emails[:n]
+        emails.sort(key=lambda email: email['email_date'])
+        return emails
+
+def synthetic_emails(n, seed=0):
+    return SyntheticMailbox(seed).emails(n)
+
+def to_mbox_message(email):
+    """Raw mbox bytes (From line included) of one synthetic email"""
+    date = email['email_date']
+    headers = [
+        f"From {email['sender_email']} {date.strftime('%a %b %d %H:%M:%S %Y')}",
+        f"From: \"{email['sender_name']}\" <{email['sender_email']}>",
+        f"To: {OWNER} <{OWNER_EMAIL}>",
+        f"Subject: {email['subject_line']}",
+        f"Date: {format_datetime(date)}",
+        f"Message-ID: {email['message_id']}",
+    ]
+    if email['in_reply_to']:
+        headers.append(f"In-Reply-To: {email['in_reply_to']}")
+        headers.append(f"References: {email['references']}")
+    headers.append('MIME-Version: 1.0')
+
+    body = html_body(email['body']) if email['html'] else email['body']
+    text_type = 'html' if email['html'] else 'plain'
+    # mboxo escaping - body lines starting with "From " would split the message
+    body = '\n'.join('>' + line if line.startswith('From ') else line for line in body.split('\n'))
+    if email['attachment'] is None:
+        headers.append(f'Content-Type: text/{text_type}; charset="utf-8"')
+        lines = headers + ['', body]
+    else:
+        filename, data = email['attachment']
+        boundary = f"=_synthetic_{email['message_id'].strip('<>').split('@')[0]}"
+        encoded = base64.encodebytes(data).decode('ascii').rstrip('\n')
+        headers.append(f'Content-Type: multipart/mixed; boundary="{boundary}"')
+        lines = headers + ['', f"--{boundary}", f'Content-Type: text/{text_type}; charset="utf-8"', '', body,
+                           f"--{boundary}", f'Content-Type: application/pdf; name="{filename}"',
+                           f'Content-Disposition: attachment; filename="{filename}"',
+                           'Content-Transfer-Encoding: base64', '', encoded, f"--{boundary}--"]
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+def write_mbox(path, n, seed=0):
+    """Write an n-message synthetic Takeout mbox, return the path"""
+    with open(path, 'wb') as f:
+        for email in synthetic_emails(n, seed):
+            f.write(to_mbox_message(email))
+    return path
+
+def labelled_company(email, rnd):
+    """Company name as the extraction stages would have left it - including their usual mistakes"""
+    roll = rnd.random()
+    if email['sender_kind'] == 'linkedin' or roll < 0.08:
+        return 'Unknown Company'
+    if email['sender_kind'] == 'greenhouse' and roll < 0.25:
+        return 'Us'
+    if roll < 0.13:
+        return f"Hi Jennifer {email['company']}"
+    if roll < 0.15:
+        return 'Xmlns="Http://Www.W3.Org/1999/Xhtml'
+    return email['company']
+
+def make_dataset(n, seed=0):
+    """Processed dataset (the IMPROVED input of run_pipeline.py) for n synthetic emails"""
+    rnd = random.Random(seed + 1)
+    extraction_date = (START_DATE + timedelta(days=DAYS)).strftime('%Y-%m-%d %H:%M:%S')
+    rows = []
+    for number, email in enumerate(synthetic_emails(n, seed), 1):
+        body = ' '.join(email['body'].split())
+        rows.append({
+            'email_id': f"email_{number:05d}",
+            'subject_line': email['subject_line'],
+            'sender_email': email['sender_email'],
+            'sender_domain': email['sender_email'].split('@', 1)[1],
+            'email_date': email['email_date'].strftime('%Y-%m-%d %H:%M:%S'),
+            'body_preview': body[:200],
+            'body_length': len(email['body']),
+            'message_id': email['message_id'],
+            'in_reply_to': email['in_reply_to'],
+            'references': email['references'],
+            'gmail_thread_id': '',
+            'company_name': labelled_company(email, rnd),
+            'company_confidence': rnd.choice([50, 70, 85, 95]),
+            'role_title': email['role'],
+            'role_confidence': rnd.randint(40, 100),
+            'status': email['status'],
+            'status_confidence': rnd.randint(40, 100),
+            'extraction_date': extraction_date,
+        })
+    return pd.DataFrame(rows)
\ No newline at end of file
@@ -0,0 +1,33 @@
+from functools import partial
+from greenhouse_cleanup import extract_greenhouse_company_by_rules
+from pattern_registry import ATS_PATTERNS, WHITESPACE
+
+# Names that are the platform itself, not the hiring company
+PLATFORM_NAMES = {
+    'greenhouse': {'greenhouse'},
+    'lever': {'lever'},
+    'workday': {'workday', 'myworkday'},
+    'icims': {'icims'},
+    'bamboohr': {'bamboohr', 'bamboo hr'},
+    'ashby': {'ashby', 'ashbyhq'},
+}
+
+def extract_ats_company(platform, search_text):
+    """Company named in an ATS notification by that platform's rules (None if unresolved)"""
+    for match in ATS_PATTERNS[platform].matches(search_text):
+        company = WHITESPACE.sub(' ', match.group(1))
+        company = company.replace('!', '').replace('.', '').strip()
+        if (2 <= len(company) <= 50 and company.lower() not in PLATFORM_NAMES[platform]
+                and not company.lower().startswith(('the ', 'your ', 'our '))):
+            return company.title()
+    return None
+
+# ATS platform (domain_intelligence.ATS_DOMAINS) -> content rules for "subject body" text
+ATS_EXTRACTORS = {
+    'greenhouse': extract_greenhouse_company_by_rules,
+    'lever': partial(extract_ats_company, 'lever'),
+    'workday': partial(extract_ats_company, 'workday'),
+    'icims': partial(extract_ats_company, 'icims'),
+    'bamboohr': partial(extract_ats_company, 'bamboohr'),
+    'ashby': partial(extract_ats_company, 'ashby'),
+}
\ No newline at end of file
@@ -0,0 +1,232 @@
+import binascii
+import codecs
+import json
+import quopri
+import re
+from email.header import decode_header, make_header
+from email.parser import BytesHeaderParser
+from html.parser import HTMLParser
+from mbox_reader import FROM_SEPARATOR, read_range
+
+# Bytes decoded per message body - previews only need the start of the text
+MAX_BODY_BYTES = 256 * 1024
+
+# Tags whose content is never visible text (Outlook puts its XML in <xml>)
+SKIPPED_TAGS = {'script', 'style', 'head', 'title', 'xml'}
+
+# Tags that separate words
+BLOCK_TAGS = {'p', 'div', 'br', 'tr', 'td', 'th', 'li', 'ul', 'ol', 'table', 'section', 'article',
+              'header', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'hr', 'center'}
+
+# Encoded bytes read for MAX_BODY_BYTES of text - quoted-printable can triple the size
+ENCODED_BYTES_PER_BYTE = 3
+
+WHITESPACE_BYTES = re.compile(rb'\s+')
+
+class HtmlTextExtractor(HTMLParser):
+    """Streaming tag stripper - keeps visible text, never builds a DOM
+
+    Tags and attributes (xmlns, class="...", Office namespaces) are
+    dropped, script/style/head content is skipped and block tags become
+    spaces so words don't run together. Entities are decoded.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag in BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+    def text(self):
+        return ''.join(self.parts)
+
+def html_to_text(html):
+    """Visible text of an HTML document or fragment"""
+    parser = HtmlTextExtractor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        pass  # Keep whatever was read before the markup broke down
+    return parser.text()
+
+def decode_transfer(payload, encoding, limit=MAX_BODY_BYTES):
+    """Decode at most `limit` bytes of a Content-Transfer-Encoded payload (all of it for None)
+
+    Only the encoded prefix needed for `limit` output bytes is touched, so
+    a multi-megabyte body costs the same as a short one.
+    """
+    encoding = (encoding or '').strip().lower()
+    if encoding == 'base64':
+        if limit is None:
+            chunk = WHITESPACE_BYTES.sub(b'', payload)
+        else:
+            needed = (limit + 2) // 3 * 4
+            # Line breaks add at most 2 bytes per 76-character line
+            chunk = WHITESPACE_BYTES.sub(b'', payload[:needed + needed // 38 + 4])[:needed]
+        chunk = chunk[:len(chunk) // 4 * 4]
+        try:
+            return binascii.a2b_base64(chunk)[:limit]
+        except binascii.Error:
+            return b''
+    if encoding == 'quoted-printable':
+        if limit is None:
+            return quopri.decodestring(payload)
+        return quopri.decodestring(payload[:limit * ENCODED_BYTES_PER_BYTE])[:limit]
+    return payload[:limit]
+
+def decode_text(data, charset):
+    try:
+        codecs.lookup(charset or 'utf-8')
+    except LookupError:
+        charset = 'utf-8'
+    return data.decode(charset or 'utf-8', errors='ignore')
+
+def is_attachment(part):
+    """True for parts that are not message text - never decoded during extraction"""
+    if part.get_content_disposition() == 'attachment' or part.get_filename():
+        return True
+    return part.get_content_maintype() not in ('text', 'multipart', 'message')
+
+def payload_text(headers, payload, limit=MAX_BODY_BYTES):
+    """Text of one text/plain or text/html payload, from at most `limit` decoded bytes"""
+    text = decode_text(decode_transfer(payload, headers.get('Content-Transfer-Encoding'), limit),
+                       headers.get_content_charset())
+    if headers.get_content_type() == 'text/html':
+        text = html_to_text(text)
+    return text
+
+def split_headers(raw, start, end):
+    """(end of the header block, start of the body) for the entity at raw[start:end]"""
+    for blank in (b'\n', b'\r\n'):
+        if raw.startswith(blank, start):
+            return start, start + len(blank)
+    found = [(position, len(blank)) for blank in (b'\n\n', b'\n\r\n')
+             for position in [raw.find(blank, start, end)] if position != -1]
+    if not found:
+        return end, end
+    position, length = min(found)
+    return position + 1, position + length
+
+def parse_headers(raw, start, end):
+    """Header-only Message for the entity at raw[start:end], plus where its body starts"""
+    headers_end, body_start = split_headers(raw, start, end)
+    return BytesHeaderParser().parsebytes(raw[start:headers_end]), body_start
+
+def iter_parts(raw, headers, start, end):
+    """Yield (headers, body_start, body_end) for every leaf MIME part of an entity
+
+    Works on byte offsets into the raw message: multipart bodies are split
+    on their boundary lines and only part headers are ever parsed, so
+    payloads are not copied or decoded here.
+    """
+    boundary = headers.get_boundary() if headers.get_content_maintype() == 'multipart' else None
+    if not boundary:
+        yield headers, start, end
+        return
+
+    delimiter = b'\n--' + boundary.encode('latin-1', errors='ignore')
+    part_start = None
+    position = max(start - 1, 0)
+    while True:
+        found = raw.find(delimiter, position, end)
+        if found == -1:
+            break
+        position = found + len(delimiter)
+        if position < end and raw[position:position + 1] not in (b'-', b'\r', b'\n', b' ', b'\t'):
+            continue  # A longer boundary that starts with this one
+        if part_start is not None:
+            part_end = found - 1 if raw[found - 1:found] == b'\r' else found
+            part_headers, body_start = parse_headers(raw, part_start, part_end)
+            yield from iter_parts(raw, part_headers, body_start, part_end)
+        if raw.startswith(b'--', position):
+            return
+        line_end = raw.find(b'\n', position, end)
+        if line_end == -1:
+            return
+        part_start = line_end + 1
+
+def decode_filename(value):
+    try:
+        return str(make_header(decode_header(value)))
+    except Exception:
+        return str(value)
+
+def attachment_info(raw, headers, start, end, offset=0):
+    """Metadata of one attachment - enough to decode it later with load_attachment()"""
+    encoding = (headers.get('Content-Transfer-Encoding') or '').strip().lower()
+    size = end - start
+    if encoding == 'base64':
+        padding = raw.count(b'=', max(end - 4, start), end)
+        size = (size - raw.count(b'\n', start, end) - raw.count(b'\r', start, end)) * 3 // 4 - padding
+    filename = headers.get_filename()
+    return {
+        'filename': decode_filename(filename) if filename else '',
+        'content_type': headers.get_content_type(),
+        'size': size,
+        'offset': offset + start,
+        'length': end - start,
+        'encoding': encoding,
+    }
+
+def scan_message(raw, offset=0, limit=MAX_BODY_BYTES):
+    """(headers, body text, attachments) of one raw mbox message
+
+    Only the header blocks and the chosen text part are parsed; attachments
+    are recorded by metadata with absolute mbox offsets (`offset` is where
+    `raw` starts in the file) and never decoded.
+    """
+    start = raw.find(b'\n') + 1 if raw.startswith(FROM_SEPARATOR) else 0
+    end = len(raw)
+    # The blank line before the next separator belongs to the mbox, not the message
+    if raw.endswith(b'\r\n\r\n'):
+        end -= 2
+    elif raw.endswith(b'\n\n'):
+        end -= 1
+    headers, body_start = parse_headers(raw, start, end)
+
+    text_part = html_part = None
+    attachments = []
+    for part_headers, part_start, part_end in iter_parts(raw, headers, body_start, end):
+        if is_attachment(part_headers):
+            attachments.append(attachment_info(raw, part_headers, part_start, part_end, offset))
+            continue
+        content_type = part_headers.get_content_type()
+        if content_type == 'text/plain' and text_part is None:
+            text_part = (part_headers, part_start, part_end)
+        elif content_type == 'text/html' and html_part is None:
+            html_part = (part_headers, part_start, part_end)
+
+    body = ''
+    chosen = text_part or html_part
+    if chosen is not None:
+        part_headers, part_start, part_end = chosen
+        encoded_end = part_end if limit is None else min(part_end, part_start + limit * ENCODED_BYTES_PER_BYTE)
+        body = payload_text(part_headers, raw[part_start:encoded_end], limit)
+    return headers, body, attachments
+
+def load_attachment(mbox_path, attachment):
+    """Decoded bytes of an attachment recorded during extraction (a dict or its JSON)"""
+    if isinstance(attachment, str):
+        attachment = json.loads(attachment)
+    payload = read_range(mbox_path, attachment['offset'], attachment['length'])
+    return decode_transfer(payload, attachment['encoding'], limit=None)
\ No newline at end of file
@@ -1,7 +1,11 @@
-import pandas as pd
+from dataset_store import load_dataset
+from message_index import get_message_body
 
 # Load the data
-df = pd.read_csv('processed_data/POWERBI_WITH_METRICS_20250613_1043.csv')
+# (only the columns this report prints, plus the content fields that find a row in the message index)
+df = load_dataset('processed_data/POWERBI_WITH_METRICS_20250613_1043.csv',
+                  columns=['company_name', 'subject_line', 'sender_email', 'status', 'status_confidence',
+                           'body_preview', 'body_length', 'email_date'])
 
 # Find the "offers"
 offers = df[df['status'] == 'offer']
@@ -14,5 +18,10 @@ for i, row in offers.iterrows():
     print(f"Company: {row['company_name']}")
     print(f"Subject: {row['subject_line']}")
     print(f"Confidence: {row['status_confidence']}")
-    print(f"Body preview: {row['body_preview'][:150]}...")
+    # The whole message when the extraction index can find it in the mbox
+    body = get_message_body(row)
+    if body is None:
+        print(f"Body preview: {row['body_preview'][:150]}...")
+    else:
+        print(f"Body: {' '.join(body.split())}")
     print(f"Date: {row['email_date']}")
\ No newline at end of file
@@ -1,7 +1,10 @@
-import pandas as pd
+from dataset_store import load_dataset
+from schema import observed_counts
 
 # Load the data
-df = pd.read_csv('processed_data/POWERBI_WITH_METRICS_20250613_1043.csv')
+# (only the columns this report prints)
+df = load_dataset('processed_data/POWERBI_WITH_METRICS_20250613_1043.csv',
+                  columns=['company_name', 'sender_domain', 'sender_email', 'subject_line', 'body_preview', 'email_date'])
 
 # Find the "Us" company records
 us_records = df[df['company_name'] == 'Us']
@@ -11,7 +14,7 @@ print("\nLet's see what got classified as company 'Us':")
 
 # Look at patterns
 print(f"\nSender domains:")
-print(us_records['sender_domain'].value_counts().head(10))
+print(observed_counts(us_records['sender_domain']).head(10))
 
 print(f"\nSubject line patterns:")
 for i, row in us_records.head(10).iterrows():
@@ -0,0 +1,193 @@
+import os
+import re
+import pandas as pd
+from collections import defaultdict
+from itertools import combinations
+from pattern_registry import PLATFORM_FIXES
+
+DEFAULT_INDEX_PATH = 'processed_data/company_index.csv'
+INDEX_PATH = os.environ.get('COMPANY_INDEX_PATH', DEFAULT_INDEX_PATH)  # empty string keeps the index in memory
+
+SIMILARITY_THRESHOLD = 0.8
+BLOCK_PREFIX = 4
+
+UNKNOWN_COMPANY = 'Unknown Company'
+
+# Dropped from the end of a name ("Acme Inc", "Acme Careers", "ZipRecruiter Phil")
+LEGAL_SUFFIXES = {'inc', 'llc', 'ltd', 'corp', 'corporation', 'company', 'co', 'plc', 'gmbh'}
+PLATFORM_TOKENS = {'careers', 'career', 'hiring', 'jobs', 'job', 'talent', 'recruiting', 'team', 'phil'}
+TRAILING_TOKENS = LEGAL_SUFFIXES | PLATFORM_TOKENS
+
+# Too common to make a useful block
+STOP_TOKENS = {'the', 'and', 'of', 'for', 'at', 'a', 'an'}
+
+TOKEN = re.compile(r'[a-z0-9]+')
+
+def name_tokens(name):
+    """Lower-case word tokens of a company name without leading 'the' or trailing suffixes"""
+    tokens = TOKEN.findall(str(name).lower().replace('&', ' and '))
+    while len(tokens) > 1 and tokens[0] == 'the':
+        tokens = tokens[1:]
+    while len(tokens) > 1 and tokens[-1] in TRAILING_TOKENS:
+        tokens = tokens[:-1]
+    return tokens
+
+def normalize_company(name):
+    return ' '.join(name_tokens(name))
+
+def blocking_keys(normalized):
+    """Blocks a name belongs to - names are only compared within a shared block
+
+    Single-word names block on their prefix. Longer names block on every
+    pair of word prefixes, so a typo in one word still leaves a shared
+    block while common words ("Tech", "Global") do not make huge ones.
+    """
+    prefixes = sorted({token[:BLOCK_PREFIX] for token in normalized.split()
+                       if len(token) >= 3 and token not in STOP_TOKENS and not token.isdigit()})
+    if len(prefixes) < 2:
+        return set(prefixes) or {normalized[:BLOCK_PREFIX]}
+    return {f"{first} {second}" for first, second in combinations(prefixes, 2)}
+
+def trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+def numbers(normalized):
+    """Numeric tokens - "Company 16" and "Company 18" are never the same company"""
+    return {token for token in normalized.split() if token.isdigit()}
+
+class CompanyIndex:
+    """Canonical company table with an alias index and blocked fuzzy matching
+
+    A name resolves through its normalized alias first (one dict lookup).
+    New aliases are scored by trigram Jaccard similarity only against the
+    known aliases sharing a blocking key, so a growing table never needs an
+    all-pairs comparison. Aliases that match nothing start a new company.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.names = []             # company number -> canonical name
+        self.aliases = {}           # normalized alias -> company number
+        self.grams = {}             # normalized alias -> trigram set
+        self.blocks = defaultdict(set)  # blocking key -> normalized aliases
+        self.comparisons = 0
+        self.added = 0
+
+    def company_id(self, number):
+        return f"company_{number + 1:05d}"
+
+    def add_company(self, name):
+        self.names.append(name)
+        self.added += 1
+        return len(self.names) - 1
+
+    def add_alias(self, alias, number):
+        normalized = normalize_company(alias)
+        if not normalized or normalized in self.aliases:
+            return
+        self.aliases[normalized] = number
+        self.grams[normalized] = trigrams(normalized)
+        for key in blocking_keys(normalized):
+            self.blocks[key].add(normalized)
+
+    def best_match(self, normalized):
+        """Company number of the most similar alias in the same blocks (None below the threshold)"""
+        grams = trigrams(normalized)
+        digits = numbers(normalized)
+        candidates = set()
+        for key in blocking_keys(normalized):
+            candidates |= self.blocks.get(key, set())
+
+        best, best_score = None, self.threshold
+        for candidate in sorted(candidates):
+            self.comparisons += 1
+            if numbers(candidate) != digits:
+                continue
+            score = jaccard(grams, self.grams[candidate])
+            if score >= best_score and (best is None or score > best_score or self.aliases[candidate] < best):
+                best, best_score = self.aliases[candidate], score
+        return best
+
+    def resolve(self, name):
+        """Company number for a name, adding it to the table when it is new"""
+        normalized = normalize_company(name)
+        if not normalized:
+            return None
+        number = self.aliases.get(normalized)
+        if number is None:
+            number = self.best_match(normalized)
+            if number is None:
+                number = self.add_company(str(name).strip())
+            self.add_alias(normalized, number)
+        return number
+
+    def resolve_many(self, names):
+        """Company numbers for many names, each distinct name resolved once"""
+        resolved = {name: self.resolve(name) for name in pd.unique(pd.Series(names, dtype=object))}
+        return [resolved[name] for name in names]
+
+    def seed(self, fixes=PLATFORM_FIXES):
+        """Known platform artifacts become aliases of the company they stand for"""
+        for artifact, company in fixes.items():
+            if company:
+                number = self.resolve(company)
+                self.add_alias(artifact, number)
+        return self
+
+    def to_table(self):
+        rows = [(self.company_id(number), self.names[number], alias) for alias, number in self.aliases.items()]
+        return pd.DataFrame(rows, columns=['company_id', 'canonical_name', 'alias'])
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.to_table().to_csv(path, index=False)
+
+    @classmethod
+    def load(cls, path, threshold=SIMILARITY_THRESHOLD):
+        """Index saved by save(), seeded with the platform fixes (a new index if the file is missing)
+
+        Aliases can be added to the CSV by hand to merge companies the
+        matcher keeps apart.
+        """
+        index = cls(threshold)
+        if path and os.path.exists(path):
+            table = pd.read_csv(path, dtype=str, keep_default_na=False)
+            numbers_for_ids = {}
+            for company_id, name, alias in zip(table['company_id'], table['canonical_name'], table['alias']):
+                if company_id not in numbers_for_ids:
+                    numbers_for_ids[company_id] = index.add_company(name)
+                index.add_alias(alias, numbers_for_ids[company_id])
+        index.seed()
+        index.added = index.comparisons = 0
+        return index
+
+def resolve_companies(df, index=None, path=INDEX_PATH):
+    """Attach company_id and replace company_name variants with their canonical name
+
+    Unknown companies keep an empty company_id. The index is saved back to
+    `path` so ids stay the same from run to run.
+    """
+    own_index = index is None
+    if own_index:
+        index = CompanyIndex.load(path)
+    names = df['company_name']
+    known = names.notna() & (names != UNKNOWN_COMPANY) & (names.astype(str).str.strip() != '')
+    numbers_for_rows = index.resolve_many(names[known].astype(str).tolist())
+
+    df['company_id'] = None
+    df.loc[known, 'company_id'] = [index.company_id(number) if number is not None else None
+                                   for number in numbers_for_rows]
+    df.loc[known, 'company_name'] = [index.names[number] if number is not None else name
+                                     for number, name in zip(numbers_for_rows, names[known])]
+
+    print(f"Resolved {known.sum()} company names to {df['company_id'].nunique()} companies "
+          f"({index.added} new, {index.comparisons} similarity checks)")
+    if own_index and path:
+        index.save(path)
+    return df
\ No newline at end of file
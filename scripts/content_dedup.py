@@ -0,0 +1,176 @@
+import hashlib
+import re
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+from header_threading import UnionFind
+from instrumentation import count
+
+SIMHASH_BITS = 64
+# Previews are short, so rewording a single word already moves a fingerprint 8-12 bits;
+# proper_words() keeps copies naming different companies apart at this distance
+MAX_HAMMING_DISTANCE = 12
+# Pigeonhole: fingerprints within 15 bits agree exactly on at least one of 16 bands
+SIMHASH_BANDS = 16
+
+NON_WORD = re.compile(r'[^a-z0-9#]+')
+DIGITS = re.compile(r'\d+')
+# Capitalized words - where company names, people and places show up in a notification
+PROPER_WORDS = re.compile(r"\b[A-Z][\w&'-]*(?:\.\w+)*")
+BIT_POSITIONS = np.arange(SIMHASH_BITS, dtype=np.uint64)
+
+def normalize_text(text, mask_numbers=False):
+    """Lower-case words; masking numbers keeps dates and job counts from splitting copies"""
+    text = '' if pd.isna(text) else str(text).lower()
+    if mask_numbers:
+        text = DIGITS.sub('#', text)
+    return NON_WORD.sub(' ', text).strip()
+
+def content_hash(normalized):
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+def shingles(normalized):
+    """Word pairs of a normalized text (the text itself when shorter)"""
+    words = normalized.split()
+    return [' '.join(words[i:i + 2]) for i in range(max(len(words) - 1, 1))] if words else ['']
+
+def simhashes(texts):
+    """64-bit SimHash over word pairs of each text - near-identical texts differ in a few bits
+
+    The features of all texts are hashed in one pandas call (a fixed-key
+    64-bit hash, stable across runs) and the per-bit voting is a single
+    numpy reduction instead of a Python loop per bit.
+    """
+    if not texts:
+        return []
+    features, offsets = [], []
+    for text in texts:
+        offsets.append(len(features))
+        features.extend(shingles(text))
+    hashes = pd.util.hash_array(np.array(features, dtype=object), categorize=False)
+    votes = ((hashes[:, None] >> BIT_POSITIONS) & np.uint64(1)).astype(np.int32) * 2 - 1
+    weights = np.add.reduceat(votes, offsets, axis=0)
+    packed = ((weights > 0).astype(np.uint64) << BIT_POSITIONS).sum(axis=1, dtype=np.uint64)
+    return [int(value) for value in packed]
+
+def simhash(normalized):
+    return simhashes([normalized])[0]
+
+def bands(fingerprint):
+    width = SIMHASH_BITS // SIMHASH_BANDS
+    mask = (1 << width) - 1
+    return [(band, fingerprint >> (band * width) & mask) for band in range(SIMHASH_BANDS)]
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+def proper_words(subject, body):
+    """Capitalized words of an email's subject and body, as a set"""
+    return frozenset(PROPER_WORDS.findall(f"{'' if pd.isna(subject) else subject} {'' if pd.isna(body) else body}"))
+
+def duplicate_groups(df, max_distance=MAX_HAMMING_DISTANCE):
+    """Fingerprint per row, shared by every row of its duplicate group
+
+    Rows are blocked on content only: sender domain plus normalized subject
+    with numbers masked ("12 new jobs" and "30 new jobs" share a block).
+    Message-IDs play no part - every copy a job board sends has its own.
+    Within a block, rows group when subject + body match exactly, or when
+    the SimHash fingerprints of the number-masked texts are within
+    `max_distance` bits and they use the same capitalized words. Results
+    are copied between group members, so the subject has to match ("Your
+    application to Acme" and "Your application to Globex" share the rest
+    of their template) and so do the capitalized words: a "your
+    application with Acme is under review" follow-up is only a few bits
+    from the same template naming Globex. SimHash only runs in blocks holding more than one
+    distinct text, and candidates only come from rows sharing a (block,
+    band) bucket, so there is no all-pairs scan.
+    """
+    domains = df['sender_domain'].astype(str).str.lower().tolist() if 'sender_domain' in df.columns else [''] * len(df)
+    subjects = df['subject_line'] if 'subject_line' in df.columns else pd.Series('', index=df.index)
+    bodies = df['body_preview'].tolist() if 'body_preview' in df.columns else [''] * len(df)
+    subject_texts = [normalize_text(subject) for subject in subjects]
+    block_keys = [f"{domain}\x1f{DIGITS.sub('#', subject)}" for domain, subject in zip(domains, subject_texts)]
+
+    # Exact copies first - SimHash only runs once per distinct text
+    exact_keys = [f"{block_key}\x1f{subject} {normalize_text(body)}"
+                  for block_key, subject, body in zip(block_keys, subject_texts, bodies)]
+    codes, uniques = pd.factorize(pd.Series(exact_keys, dtype=object))
+    first_position = {}
+    for position, code in enumerate(codes):
+        first_position.setdefault(code, position)
+
+    # Near-duplicates must also use the same capitalized words, so those join the block;
+    # a block with a single distinct text has nothing to be a near-duplicate of
+    codes_by_block = defaultdict(list)
+    for code, position in first_position.items():
+        codes_by_block[block_keys[position]].append(code)
+    near_blocks = defaultdict(list)
+    for block_key, block_codes in codes_by_block.items():
+        if len(block_codes) > 1:
+            for code in block_codes:
+                position = first_position[code]
+                near_blocks[(block_key, proper_words(subjects.iloc[position], bodies[position]))].append(code)
+    near_blocks = [block_codes for block_codes in near_blocks.values() if len(block_codes) > 1]
+    candidates = [code for block_codes in near_blocks for code in block_codes]
+    masked_texts = [f"{DIGITS.sub('#', subject_texts[first_position[code]])} "
+                    f"{normalize_text(bodies[first_position[code]], mask_numbers=True)}" for code in candidates]
+
+    sets = UnionFind(len(uniques))
+    fingerprints = dict(zip(candidates, simhashes(masked_texts)))
+    for block_codes in near_blocks:
+        buckets = defaultdict(list)
+        for code in block_codes:
+            fingerprint = fingerprints[code]
+            for band in bands(fingerprint):
+                for other in buckets[band]:
+                    if hamming(fingerprint, fingerprints[other]) <= max_distance:
+                        sets.union(code, other)
+                buckets[band].append(code)
+
+    # Label every row by the first row of its group (domain included, so labels never collide)
+    group_first = {}
+    for code, position in sorted(first_position.items(), key=lambda item: item[1]):
+        group_first.setdefault(sets.find(code), position)
+    labels = {root: content_hash(exact_keys[position])[:16] for root, position in group_first.items()}
+    return [labels[sets.find(code)] for code in codes]
+
+def fingerprint_duplicates(df):
+    """Add content_fingerprint (shared by a duplicate group) and duplicate_count columns"""
+    df = df.copy()
+    df['content_fingerprint'] = duplicate_groups(df)
+    df['duplicate_count'] = df.groupby('content_fingerprint')['content_fingerprint'].transform('size').astype('int64')
+    return df
+
+def mark_duplicates(df):
+    """Pipeline stage: fingerprint duplicate groups, keeping every email as its own row
+
+    Threading and metrics count emails, so copies are only labelled here
+    (content_fingerprint, duplicate_count); the extraction stages then
+    resolve each group once through once_per_fingerprint().
+    """
+    print("🪞 Fingerprinting duplicate notification emails...")
+    df = fingerprint_duplicates(df)
+    duplicated = df['duplicate_count'] > 1
+    print(f"Found {df.loc[duplicated, 'content_fingerprint'].nunique()} duplicate groups "
+          f"covering {duplicated.sum()} of {len(df)} emails")
+    return df
+
+def once_per_fingerprint(records, resolve):
+    """resolve(rows) for one representative row per duplicate group, fanned out to every row
+
+    `resolve` takes a DataFrame and returns one result per row, in order.
+    Rows without a content_fingerprint (the DEDUPLICATED stage did not
+    run) are resolved individually. Returns a list aligned with `records`.
+    """
+    if 'content_fingerprint' not in records.columns:
+        return list(resolve(records))
+    groups = records['content_fingerprint'].astype(object)
+    groups = groups.where(groups.notna(), pd.Series(range(len(records)), index=records.index, dtype=object))
+    representative = ~groups.duplicated().to_numpy()
+    if representative.all():
+        return list(resolve(records))
+
+    print(f"Resolving {representative.sum()} distinct fingerprints for {len(records)} records")
+    count('fingerprint_fanouts', int(len(records) - representative.sum()))
+    results = dict(zip(groups[representative], resolve(records[representative])))
+    return [results[group] for group in groups]
\ No newline at end of file
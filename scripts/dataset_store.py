@@ -0,0 +1,127 @@
+import glob
+import itertools
+import os
+import tempfile
+import pandas as pd
+from datetime import datetime
+from schema import TIMESTAMP_FORMAT, apply_schema, normalize
+
+try:
+    import pyarrow  # noqa: F401 - needed by pandas for Parquet
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+OUTPUT_DIR = 'processed_data'
+
+# Stage outputs are Parquet when pyarrow is installed (DATASET_FORMAT=csv forces CSV)
+DATASET_FORMAT = os.environ.get('DATASET_FORMAT', 'parquet' if PARQUET_AVAILABLE else 'csv')
+if DATASET_FORMAT == 'parquet' and not PARQUET_AVAILABLE:
+    print("⚠️  pyarrow not installed - writing datasets as CSV")
+    DATASET_FORMAT = 'csv'
+
+def dataset_path(label, timestamp=None, prefix='job_emails', output_dir=OUTPUT_DIR, extension=None):
+    """processed_data/<prefix>_<LABEL>_<YYYYmmdd_HHMM>.<parquet|csv>"""
+    timestamp = timestamp or datetime.now().strftime('%Y%m%d_%H%M')
+    return os.path.join(output_dir, f"{prefix}_{label}_{timestamp}.{extension or DATASET_FORMAT}")
+
+def save_dataset(df, label, timestamp=None, output_dir=OUTPUT_DIR):
+    """Write a stage output in the typed schema and return its path"""
+    path = dataset_path(label, timestamp, output_dir=output_dir)
+    if path.endswith('.parquet'):
+        apply_schema(df).to_parquet(path, index=False)
+    else:
+        export_csv(df, path)
+    return path
+
+def _write_temp(df, path):
+    """Write df next to `path` in path's format and return the temp file's path"""
+    directory = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(prefix='.tmp_', suffix=os.path.splitext(path)[1], dir=directory)
+    os.close(fd)
+    try:
+        if path.endswith('.parquet'):
+            apply_schema(df).to_parquet(temp_path, index=False)
+        else:
+            export_csv(df, temp_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+def replace_dataset(df, path):
+    """Write a dataset (Parquet or CSV, by extension) to a temp file and rename it over `path`
+
+    os.replace is atomic, so a dashboard refreshing from `path` sees
+    either the old file or the new one, never a half-written one.
+    """
+    temp_path = _write_temp(df, path)
+    try:
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return path
+
+def save_new_dataset(df, label, output_dir=OUTPUT_DIR):
+    """Write a dataset under a name no earlier run has used and return its path
+
+    For deltas, which are the only copy of their rows once the ledger
+    has moved on: the name has seconds plus a counter when needed, and
+    os.link refuses to replace a file that is already there, so two runs
+    in the same minute (or second) never overwrite each other.
+    """
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    temp_path = _write_temp(df, dataset_path(label, timestamp, output_dir=output_dir))
+    try:
+        for attempt in itertools.count():
+            path = dataset_path(label, f"{timestamp}_{attempt}" if attempt else timestamp, output_dir=output_dir)
+            if resolve_path(path) != path:
+                continue  # taken in the other format
+            try:
+                os.link(temp_path, path)
+                return path
+            except FileExistsError:
+                continue
+    finally:
+        os.remove(temp_path)
+
+def export_csv(df, path):
+    """CSV for Power BI and spreadsheets, with timestamps in the extractor's format"""
+    df.to_csv(path, index=False, date_format=TIMESTAMP_FORMAT)
+    return path
+
+def resolve_path(path):
+    """The path itself, or the same dataset saved in the other format"""
+    if os.path.exists(path):
+        return path
+    stem, extension = os.path.splitext(path)
+    for other in ('.parquet', '.csv'):
+        if other != extension and os.path.exists(stem + other):
+            return stem + other
+    return path
+
+def load_dataset(path, columns=None):
+    """Load a dataset with schema types applied, reading only `columns` when given
+
+    Parquet files carry their types and are read column by column; CSV
+    files (older outputs) are parsed and then cast to the same schema,
+    with a report of the memory that saves.
+    """
+    path = resolve_path(path)
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=columns)
+    return normalize(pd.read_csv(path, usecols=columns), os.path.basename(path))
+
+def datasets(label, prefix='job_emails', output_dir=OUTPUT_DIR):
+    """Every dataset written for a stage label, in either format, oldest first"""
+    paths = []
+    for extension in ('parquet', 'csv'):
+        # The timestamp starts with a digit, so EXTRACTED does not also pick up EXTRACTED_DELTA files
+        paths += glob.glob(os.path.join(output_dir, f"{prefix}_{label}_[0-9]*.{extension}"))
+    return sorted(paths, key=os.path.getmtime)
+
+def latest_dataset(label, prefix='job_emails', output_dir=OUTPUT_DIR):
+    """Most recent dataset written for a stage label, in either format (None if there is none)"""
+    paths = datasets(label, prefix, output_dir)
+    return paths[-1] if paths else None
\ No newline at end of file
@@ -1,6 +1,11 @@
 import pandas as pd
 import re
+import sys
 from difflib import SequenceMatcher
+from dataset_store import load_dataset, save_dataset
+from header_threading import build_header_threads, has_header_columns
+from instrumentation import stage, write_report
+from thread_matcher import ThreadMatcher
 
 def normalize_subject(subject):
     """Normalize subject for thread matching"""
@@ -31,12 +36,23 @@ def calculate_similarity(text1, text2):
         return 0.0
     return SequenceMatcher(None, text1, text2).ratio()
 
-def group_email_threads(df):
-    """Group emails into conversation threads"""
+def group_email_threads(df, statuses=('interview_scheduled',)):
+    """Group emails into conversation threads
+
+    Only rows whose status is in `statuses` are threaded (None threads every
+    row). When the extraction kept threading headers, emails are grouped by
+    those first; the rest are matched by subject with the indexed
+    ThreadMatcher, which gives the same groups as comparing each email
+    against every earlier subject.
+    """
     print("🧵 Grouping email threads...")
     
     # Focus on interviews first
-    interviews = df[df['status'] == 'interview_scheduled'].copy()
+    if statuses is None:
+        thread_mask = pd.Series(True, index=df.index)
+    else:
+        thread_mask = df['status'].isin(list(statuses))
+    interviews = df[thread_mask].copy()
     
     if len(interviews) == 0:
         print("No interviews found to group")
@@ -46,154 +62,134 @@ def group_email_threads(df):
     interviews['company_name'] = interviews['company_name'].fillna('Unknown')
     interviews['normalized_subject'] = interviews['subject_line'].apply(normalize_subject)
     
-    print(f"Processing {len(interviews)} interview emails...")
-    
-    # Group by normalized subject and company
-    thread_groups = {}
-    thread_id = 0
-    
-    for idx, row in interviews.iterrows():
-        subject_norm = row['normalized_subject']
-        company = safe_lower(row['company_name'])
-        
-        # Look for existing thread
-        found_thread = False
-        
-        for existing_thread_id, thread_info in thread_groups.items():
-            # Check if this email belongs to an existing thread
-            for existing_subject, existing_company in thread_info['subjects']:
-                subject_sim = calculate_similarity(subject_norm, existing_subject)
-                company_match = (company == existing_company)
-                
-                if subject_sim > 0.8 and company_match:
-                    thread_groups[existing_thread_id]['emails'].append(idx)
-                    thread_groups[existing_thread_id]['subjects'].append((subject_norm, company))
-                    found_thread = True
-                    break
-            
-            if found_thread:
-                break
-        
-        # If no existing thread found, create new one
-        if not found_thread:
-            thread_groups[thread_id] = {
-                'emails': [idx],
-                'subjects': [(subject_norm, company)]
-            }
-            thread_id += 1
-    
-    print(f"Found {len(thread_groups)} interview threads")
-    
-    # Create consolidated interview records
-    consolidated_interviews = []
-    
-    for thread_id, thread_info in thread_groups.items():
-        email_indices = thread_info['emails']
-        thread_emails = interviews.loc[email_indices]
-        
-        # Get the most recent email as primary
-        if len(thread_emails) > 0:
-            # Sort by date if available, otherwise use first
-            thread_emails_with_dates = thread_emails[thread_emails['email_date'].notna()]
-            
-            if len(thread_emails_with_dates) > 0:
-                # Convert email_date to datetime for proper sorting
-                thread_emails_with_dates['email_date_dt'] = pd.to_datetime(thread_emails_with_dates['email_date'], errors='coerce')
-                valid_dates = thread_emails_with_dates[thread_emails_with_dates['email_date_dt'].notna()]
-                
-                if len(valid_dates) > 0:
-                    primary_email = valid_dates.loc[valid_dates['email_date_dt'].idxmax()]
-                else:
-                    primary_email = thread_emails.iloc[0]
+    print(f"Processing {len(interviews)} emails...")
+    
+    # Assign every email to a thread, bucketed by company
+    with stage('Thread assignment', interviews):
+        matcher = ThreadMatcher()
+        companies = interviews['company_name'].apply(safe_lower)
+    
+        if has_header_columns(interviews):
+            # Message-ID / References / X-GM-THRID give exact threads; subject
+            # matching is only the fallback for orphans without those headers
+            header_threads = build_header_threads(interviews)
+            print(f"Header-threaded emails: {sum(label >= 0 for label in header_threads)}")
+        else:
+            header_threads = [-1] * len(interviews)
+    
+        thread_numbers = []
+        threads_for_components = {}
+        for subject_norm, company, component in zip(interviews['normalized_subject'], companies, header_threads):
+            if component >= 0:
+                if component not in threads_for_components:
+                    threads_for_components[component] = matcher.new_thread()
+                thread_number = threads_for_components[component]
+                matcher.add(subject_norm, company, thread_number)
             else:
-                primary_email = thread_emails.iloc[0]
-            
-            # Create consolidated record
-            consolidated = primary_email.copy()
-            consolidated['thread_id'] = f"thread_{thread_id:03d}"
-            consolidated['thread_email_count'] = len(email_indices)
-            
-            # Create thread summary
-            thread_summary = []
-            for _, row in thread_emails.iterrows():
-                date_str = row['email_date'][:10] if pd.notna(row['email_date']) and len(str(row['email_date'])) >= 10 else "No date"
-                subject_str = str(row['subject_line'])[:50] if pd.notna(row['subject_line']) else "No subject"
-                thread_summary.append(f"{date_str}: {subject_str}")
-            
-            consolidated['thread_emails'] = "; ".join(thread_summary)
-            
-            # Use highest confidence values from thread
-            consolidated['status_confidence'] = thread_emails['status_confidence'].max()
-            consolidated['company_confidence'] = thread_emails['company_confidence'].max()
-            consolidated['role_confidence'] = thread_emails['role_confidence'].max()
-            
-            # Add thread statistics
-            consolidated['first_email_date'] = thread_emails['email_date'].min()
-            consolidated['last_email_date'] = thread_emails['email_date'].max()
-            
-            consolidated_interviews.append(consolidated)
-    
-    # Convert back to DataFrame
-    if consolidated_interviews:
-        interviews_df = pd.DataFrame(consolidated_interviews)
-        
-        # Remove original interview records from main df
-        df_no_interviews = df[df['status'] != 'interview_scheduled']
-        
-        # Combine with consolidated interviews
-        result_df = pd.concat([df_no_interviews, interviews_df], ignore_index=True)
-        
-        print(f"Consolidated {len(interviews)} interview emails into {len(interviews_df)} threads")
-    else:
-        result_df = df
-        print("No threads could be consolidated")
+                thread_number = matcher.assign(subject_norm, company)
+            thread_numbers.append(thread_number)
+        interviews['thread_number'] = thread_numbers
+    
+    print(f"Found {matcher.thread_count} threads ({matcher.comparisons} similarity checks)")
+    
+    # Primary email is the most recent dated one, otherwise the first in the thread
+    email_dates = pd.to_datetime(interviews['email_date'], errors='coerce')
+    dated = interviews[email_dates.notna()]
+    primary_index = interviews.groupby('thread_number', sort=True).head(1)
+    primary_index = pd.Series(primary_index.index, index=primary_index['thread_number']).sort_index()
+    if len(dated) > 0:
+        latest = email_dates[dated.index].groupby(dated['thread_number']).idxmax()
+        primary_index.loc[latest.index] = latest.values
+    
+    # Create consolidated records
+    with stage('Thread summaries', interviews):
+        interviews_df = interviews.loc[primary_index.values].drop(columns='thread_number')
+        if len(dated) > 0:
+            # Parsed date of the primary email, kept for parity with earlier outputs
+            interviews_df['email_date_dt'] = email_dates[interviews_df.index].where(interviews_df.index.isin(latest.values))
+        grouped = interviews.groupby('thread_number', sort=True)
+        thread_ids = primary_index.index
+    
+        interviews_df['thread_id'] = [f"thread_{thread_id:03d}" for thread_id in thread_ids]
+        interviews_df['thread_email_count'] = grouped.size().values
+    
+        # Create thread summary
+        email_date_str = interviews['email_date'].astype(str)
+        date_str = email_date_str.str[:10].where(interviews['email_date'].notna() & (email_date_str.str.len() >= 10), "No date")
+        subject_str = interviews['subject_line'].astype(str).str[:50].where(interviews['subject_line'].notna(), "No subject")
+        summaries = [[] for _ in range(matcher.thread_count)]
+        for thread_number, line in zip(thread_numbers, date_str + ": " + subject_str):
+            summaries[thread_number].append(line)
+        interviews_df['thread_emails'] = ["; ".join(summaries[thread_id]) for thread_id in thread_ids]
+    
+        # Use highest confidence values from thread
+        for column in ['status_confidence', 'company_confidence', 'role_confidence']:
+            interviews_df[column] = grouped[column].max().values
+    
+        # Add thread statistics
+        # (sorting once is much cheaper than a min/max aggregation over strings)
+        sorted_dates = interviews['email_date'].dropna().sort_values(kind='stable')
+        dates_by_thread = sorted_dates.groupby(interviews.loc[sorted_dates.index, 'thread_number'])
+        interviews_df['first_email_date'] = dates_by_thread.first().reindex(thread_ids).values
+        interviews_df['last_email_date'] = dates_by_thread.last().reindex(thread_ids).values
+    
+    # Remove original records from main df
+    df_no_interviews = df[~thread_mask]
+    
+    # Combine with consolidated threads
+    result_df = pd.concat([df_no_interviews, interviews_df], ignore_index=True)
+    
+    print(f"Consolidated {len(interviews)} emails into {len(interviews_df)} threads")
     
     return result_df
 
-# Load the improved dataset
-print("📊 Loading improved dataset...")
-df = pd.read_csv('processed_data/job_emails_IMPROVED_20250613_1034.csv')
+if __name__ == '__main__':
+    # Load the improved dataset
+    print("📊 Loading improved dataset...")
+    with stage('Loading dataset') as timer:
+        df = timer.done(load_dataset('processed_data/job_emails_IMPROVED_20250613_1034.csv'))
 
-print(f"Original interviews: {len(df[df['status'] == 'interview_scheduled'])}")
+    print(f"Original interviews: {len(df[df['status'] == 'interview_scheduled'])}")
 
-# Group threads
-df_consolidated = group_email_threads(df)
+    # Group threads (python deduplicate_threads.py --all-statuses threads every email)
+    statuses = None if '--all-statuses' in sys.argv else ('interview_scheduled',)
+    df_consolidated = group_email_threads(df, statuses)
 
-print(f"Consolidated interviews: {len(df_consolidated[df_consolidated['status'] == 'interview_scheduled'])}")
+    print(f"Consolidated interviews: {len(df_consolidated[df_consolidated['status'] == 'interview_scheduled'])}")
 
-# Save consolidated dataset
-output_file = f"processed_data/job_emails_CONSOLIDATED_{pd.Timestamp.now().strftime('%Y%m%d_%H%M')}.csv"
-df_consolidated.to_csv(output_file, index=False)
+    # Save consolidated dataset
+    output_file = save_dataset(df_consolidated, 'CONSOLIDATED')
 
-print(f"\n📈 CONSOLIDATED RESULTS:")
-print(f"Total emails: {len(df_consolidated)}")
+    print(f"\n📈 CONSOLIDATED RESULTS:")
+    print(f"Total emails: {len(df_consolidated)}")
 
-# Interview analysis
-interviews = df_consolidated[df_consolidated['status'] == 'interview_scheduled']
-high_conf_interviews = interviews[interviews['status_confidence'] >= 70]
+    # Interview analysis
+    interviews = df_consolidated[df_consolidated['status'] == 'interview_scheduled']
+    high_conf_interviews = interviews[interviews['status_confidence'] >= 70]
 
-print(f"\nConsolidated interview analysis:")
-print(f"  Total interview threads: {len(interviews)}")
-print(f"  High confidence threads: {len(high_conf_interviews)}")
+    print(f"\nConsolidated interview analysis:")
+    print(f"  Total interview threads: {len(interviews)}")
+    print(f"  High confidence threads: {len(high_conf_interviews)}")
 
-if len(high_conf_interviews) > 0:
-    print(f"\nHigh confidence interview threads:")
-    for _, row in high_conf_interviews.head(15).iterrows():
+    if len(high_conf_interviews) > 0:
+        print(f"\nHigh confidence interview threads:")
+        for _, row in high_conf_interviews.head(15).iterrows():
+            count = row.get('thread_email_count', 1)
+            company = row.get('company_name', 'Unknown')[:20]
+            role = str(row.get('role_title', 'Unknown'))[:30]
+            print(f"  • {company} - {role} ({count} emails)")
+
+    # Show thread consolidation examples
+    print(f"\nThread consolidation examples:")
+    multi_email_threads = interviews[interviews.get('thread_email_count', 1) > 1]
+    for _, row in multi_email_threads.head(5).iterrows():
         count = row.get('thread_email_count', 1)
-        company = row.get('company_name', 'Unknown')[:20]
-        role = str(row.get('role_title', 'Unknown'))[:30]
-        print(f"  • {company} - {role} ({count} emails)")
-
-# Show thread consolidation examples
-print(f"\nThread consolidation examples:")
-multi_email_threads = interviews[interviews.get('thread_email_count', 1) > 1]
-for _, row in multi_email_threads.head(5).iterrows():
-    count = row.get('thread_email_count', 1)
-    print(f"\n{count} emails consolidated for: {row['company_name']} - {row['subject_line'][:60]}")
-    if 'thread_emails' in row and pd.notna(row['thread_emails']):
-        thread_details = str(row['thread_emails']).split(';')
-        for detail in thread_details[:3]:  # Show first 3
-            print(f"    {detail.strip()}")
-
-print(f"\n🎯 Consolidated dataset: {output_file}")
-print(f"🏁 Thread consolidation completed!")
\ No newline at end of file
+        print(f"\n{count} emails consolidated for: {row['company_name']} - {row['subject_line'][:60]}")
+        if 'thread_emails' in row and pd.notna(row['thread_emails']):
+            thread_details = str(row['thread_emails']).split(';')
+            for detail in thread_details[:3]:  # Show first 3
+                print(f"    {detail.strip()}")
+
+    print(f"\n🎯 Consolidated dataset: {output_file}")
+    write_report()
+    print(f"🏁 Thread consolidation completed!")
\ No newline at end of file
@@ -0,0 +1,134 @@
+import os
+import sys
+import pandas as pd
+from functools import lru_cache
+
+DEFAULT_TABLE_PATH = 'processed_data/domain_table.csv'
+TABLE_PATH = os.environ.get('DOMAIN_TABLE_PATH', DEFAULT_TABLE_PATH)  # empty string learns the table every run
+
+# Sender domains of the ATS platforms - the company is in the content, not the domain
+ATS_DOMAINS = {
+    'greenhouse': ['greenhouse-mail.io', 'greenhouse.io'],
+    'lever': ['lever.co'],
+    'workday': ['myworkday.com', 'workday.com'],
+    'icims': ['icims.com'],
+    'bamboohr': ['bamboohr.com'],
+    'ashby': ['ashbyhq.com'],
+}
+
+# First domain labels that never name a company
+GENERIC_MAILBOXES = ['no-reply', 'noreply', 'mail', 'email', 'info', 'contact', 'support']
+
+# A domain takes the company its past emails were mostly assigned to
+MIN_DOMAIN_EMAILS = 2
+MIN_DOMAIN_SHARE = 0.6
+
+TABLE_COLUMNS = ['sender_domain', 'route', 'ats_platform', 'domain_company', 'emails']
+
+@lru_cache(maxsize=None)
+def ats_platform(domain):
+    """ATS platform a sender domain belongs to ('' for everything else)"""
+    domain = str(domain).lower()
+    for platform, suffixes in ATS_DOMAINS.items():
+        for suffix in suffixes:
+            if domain == suffix or domain.endswith('.' + suffix):
+                return platform
+    return ''
+
+def company_from_domain(domain):
+    """Company named by the domain itself ("acme.com" -> "Acme"), or None for generic mailboxes"""
+    domain_parts = str(domain).lower().split('.')
+    if len(domain_parts) >= 2 and domain_parts[0] not in GENERIC_MAILBOXES:
+        return domain_parts[0].title()
+    return None
+
+@lru_cache(maxsize=None)
+def route_domain(domain):
+    """(route, ats_platform, company) for one domain without any history
+
+    Routes: 'ats' - use that platform's content extractor, 'company' - the
+    domain names the company, 'content' - nothing to learn from the domain.
+    """
+    platform = ats_platform(domain)
+    if platform:
+        return 'ats', platform, None
+    company = company_from_domain(domain)
+    if company:
+        return 'company', '', company
+    return 'content', '', None
+
+def build_domain_table(df):
+    """One row per sender domain, built from a processed dataset
+
+    Domains whose known companies mostly agree map to that company; the
+    rest fall back to route_domain().
+    """
+    domains = df['sender_domain'].dropna().astype(str).str.lower()
+    domains = domains[(domains != '') & (domains != 'nan')]
+    counts = domains.value_counts()
+
+    companies = df.loc[domains.index, 'company_name']
+    known = companies.notna() & (companies != 'Unknown Company') & (companies.astype(str).str.strip() != '')
+    history = pd.DataFrame({'sender_domain': domains[known], 'company_name': companies[known].astype(str)})
+    votes = history.groupby(['sender_domain', 'company_name']).size().reset_index(name='votes')
+    votes = votes.sort_values(['sender_domain', 'votes', 'company_name'], ascending=[True, False, True], kind='stable')
+    top = votes.drop_duplicates('sender_domain').set_index('sender_domain')
+    totals = votes.groupby('sender_domain')['votes'].sum()
+
+    rows = []
+    for domain, emails in counts.items():
+        route, platform, company = route_domain(domain)
+        if route != 'ats' and domain in top.index:
+            votes_for_top = top.at[domain, 'votes']
+            if votes_for_top >= MIN_DOMAIN_EMAILS and votes_for_top >= MIN_DOMAIN_SHARE * totals[domain]:
+                route, company = 'company', top.at[domain, 'company_name']
+        rows.append((domain, route, platform, company, int(emails)))
+    return pd.DataFrame(rows, columns=TABLE_COLUMNS)
+
+def load_domain_table(df=None, path=TABLE_PATH):
+    """The saved domain table, or one learned from `df` for this run when none is saved
+
+    Nothing is written here - the saved table only changes through
+    `python domain_intelligence.py <dataset>`, so a stage never leaves
+    behind a table learned from a partial dataset.
+    """
+    if path and os.path.exists(path):
+        return pd.read_csv(path, dtype={'sender_domain': str, 'route': str, 'ats_platform': str,
+                                        'domain_company': str}, keep_default_na=False)
+    return build_domain_table(df)
+
+def save_domain_table(table, path=TABLE_PATH or DEFAULT_TABLE_PATH):
+    """Write the table where load_domain_table() finds it and return the path"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    table.to_csv(path, index=False)
+    return path
+
+def route_rows(df, table):
+    """route / ats_platform / domain_company for every row, by one join on sender_domain
+
+    Domains missing from the table are routed by route_domain() once each.
+    """
+    domains = df['sender_domain'].astype(str).str.lower()
+    routed = pd.DataFrame({'sender_domain': domains}).merge(
+        table[['sender_domain', 'route', 'ats_platform', 'domain_company']], on='sender_domain', how='left')
+    routed.index = df.index
+
+    missing = routed['route'].isna()
+    if missing.any():
+        new_routes = {domain: route_domain(domain) for domain in pd.unique(domains[missing])}
+        for i, column in enumerate(['route', 'ats_platform', 'domain_company']):
+            routed.loc[missing, column] = domains[missing].map(lambda domain: new_routes[domain][i])
+    routed.loc[domains.isin(['', 'nan', 'none']), 'route'] = 'content'
+    routed['ats_platform'] = routed['ats_platform'].fillna('')
+    routed['domain_company'] = routed['domain_company'].replace('', None)
+    return routed
+
+if __name__ == '__main__':
+    # Usage: python domain_intelligence.py <processed dataset> - rebuilds the saved table
+    from dataset_store import load_dataset
+    source = sys.argv[1] if len(sys.argv) > 1 else 'processed_data/job_emails_SUPER_CLEAN_20250613_1141.csv'
+    table = build_domain_table(load_dataset(source, columns=['sender_domain', 'company_name']))
+    print(f"🌐 Domain table: {len(table)} domains → {save_domain_table(table)}")
+    print(table['route'].value_counts().to_string())
\ No newline at end of file
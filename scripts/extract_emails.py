@@ -0,0 +1,195 @@
+import json
+import os
+import sys
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from email.header import decode_header, make_header
+from email.utils import parseaddr, parsedate_to_datetime
+from body_extraction import scan_message
+from dataset_store import latest_dataset, load_dataset, save_dataset, save_new_dataset
+from ingestion_ledger import IngestionLedger, merge_into_dataset
+from instrumentation import stage, write_report
+from mbox_reader import MboxReader, find_shard_ranges
+from message_index import INDEX_PATH, MessageIndex
+
+PREVIEW_LENGTH = 200
+
+# More shards than workers keeps the pool busy when message sizes are uneven
+SHARDS_PER_WORKER = 4
+
+def decode_header_value(value):
+    """Decode RFC 2047 encoded headers into plain text"""
+    if value is None:
+        return ""
+    try:
+        return str(make_header(decode_header(str(value))))
+    except Exception:
+        return str(value)
+
+def normalize_email_date(value):
+    """Parse a Date header into a UTC 'YYYY-MM-DD HH:MM:SS' string"""
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(str(value))
+    except Exception:
+        return None
+    if parsed is None:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+def extract_record(raw, offset=0):
+    """Turn one raw mbox message (starting at `offset` in the file) into a row of the extraction output
+
+    Attachments are listed by metadata only - filename, content type,
+    size and mbox offset - and can be decoded later with
+    body_extraction.load_attachment().
+    """
+    message, body, attachments = scan_message(raw, offset)
+    return message_record(message, body, attachments)
+
+def message_record(message, body, attachments):
+    """Row of the extraction output from a message's headers, body text and attachment list
+
+    Shared by every source (mbox files, IMAP) so they produce the same columns.
+    """
+    sender_email = parseaddr(decode_header_value(message.get('From')))[1].lower()
+    sender_domain = sender_email.split('@', 1)[1] if '@' in sender_email else ""
+
+    return {
+        'message_id': str(message.get('Message-ID', '')).strip(),
+        'in_reply_to': str(message.get('In-Reply-To', '')).strip(),
+        'references': ' '.join(str(message.get('References', '')).split()),
+        'gmail_thread_id': str(message.get('X-GM-THRID', '')).strip(),
+        'subject_line': decode_header_value(message.get('Subject')),
+        'sender_email': sender_email,
+        'sender_domain': sender_domain,
+        'email_date': normalize_email_date(message.get('Date')),
+        'body_preview': ' '.join(body.split())[:PREVIEW_LENGTH],
+        'body_length': len(body),
+        'attachment_count': len(attachments),
+        'attachments': json.dumps(attachments),
+    }
+
+def extract_shard(shard):
+    """Extract every message in one (mbox_path, start, end) byte range"""
+    mbox_path, start, end = shard
+    reader = MboxReader(mbox_path, start, end)
+
+    records = []
+    for offset, raw in reader.iter_raw():
+        record = extract_record(raw, offset)
+        record['mbox_offset'] = offset
+        record['mbox_length'] = len(raw)
+        records.append(record)
+    return records
+
+def extract_mbox(mbox_path, workers=None):
+    """Extract all messages from one mbox, sharded across a process pool"""
+    workers = workers or os.cpu_count() or 1
+    ranges = find_shard_ranges(mbox_path, workers * SHARDS_PER_WORKER if workers > 1 else 1)
+    shards = [(mbox_path, start, end) for start, end in ranges]
+
+    if workers == 1 or len(shards) <= 1:
+        results = [extract_shard(shard) for shard in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() returns shards in submission order, so the merge is deterministic
+            results = list(pool.map(extract_shard, shards))
+
+    records = []
+    for shard_records in results:
+        for record in shard_records:
+            record['mbox_path'] = mbox_path
+            records.append(record)
+    return records
+
+def extract_mailboxes(mbox_paths, workers=None):
+    """Extract several mbox files into one DataFrame with sequential email ids"""
+    records = []
+    for mbox_path in mbox_paths:
+        if not os.path.exists(mbox_path):
+            print(f"❌ File not found: {mbox_path}")
+            continue
+        print(f"📧 Extracting: {mbox_path}")
+        mbox_records = extract_mbox(mbox_path, workers)
+        print(f"  ✅ {len(mbox_records)} emails")
+        records.extend(mbox_records)
+
+    df = pd.DataFrame(records)
+    if len(df) > 0:
+        df.insert(0, 'email_id', [f"email_{i:05d}" for i in range(1, len(df) + 1)])
+        df['extraction_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return df
+
+def store_incremental(df, ledger):
+    """Save the new or changed rows of an extraction and fold them into the EXTRACTED dataset
+
+    The rows go to an EXTRACTED_DELTA file and are merged into the latest
+    EXTRACTED dataset, which is saved again. Only then does the ledger
+    mark them processed, so a run that fails part way leaves the ledger
+    where it was and the same mail is picked up next time. Returns
+    (delta, delta path, dataset path); nothing is written when there is
+    no new mail. `python run_pipeline.py --delta` then takes the delta
+    through the cleanup stages.
+    """
+    base_path = latest_dataset('EXTRACTED')
+    if base_path and ledger.is_empty():
+        # A new ledger starts from the dataset already built, so new messages never reuse its ids
+        ledger.mark_processed(ledger.annotate(load_dataset(base_path)))
+
+    delta = ledger.select_new(df) if len(df) > 0 else df
+    if len(delta) == 0:
+        return delta, None, base_path
+
+    delta_file = save_new_dataset(delta, 'EXTRACTED_DELTA')
+    base = load_dataset(base_path) if base_path else None
+    merged = merge_into_dataset(base, delta.drop(columns=['ledger_key', 'content_hash']))
+    output_file = save_dataset(merged, 'EXTRACTED')
+    print(f"🔄 Merged {len(delta)} emails into {output_file}: {len(merged)} records")
+    ledger.mark_processed(delta)
+    return delta, delta_file, output_file
+
+if __name__ == '__main__':
+    print("📬 Starting email extraction...")
+    print(f"Started at: {datetime.now()}")
+
+    # Update these paths to match your extracted files
+    mbox_paths = [
+        'extracted_emails/Takeout/Mail/applications.mbox',
+    ]
+
+    # Usage: python extract_emails.py [--incremental] [workers]
+    args = sys.argv[1:]
+    incremental = '--incremental' in args
+    numbers = [arg for arg in args if arg.isdigit()]
+    workers = int(numbers[0]) if numbers else None
+    print(f"Workers: {workers or os.cpu_count()}")
+
+    with stage('Extraction') as timer:
+        df = timer.done(extract_mailboxes(mbox_paths, workers))
+
+    if incremental:
+        # Only messages the ledger has not seen (or whose content changed) move on
+        with IngestionLedger() as ledger:
+            total = len(df)
+            df, delta_file, output_file = store_incremental(df, ledger)
+            print(f"🆕 New or changed emails: {len(df)} of {total}")
+            if delta_file:
+                print(f"Delta: {delta_file}")
+    else:
+        output_file = save_dataset(df, 'EXTRACTED')
+
+    # email_id -> mbox location, so review tools can open the raw message directly
+    if INDEX_PATH and len(df) > 0:
+        with MessageIndex() as index:
+            print(f"🗂️  Indexed {index.add(df)} messages → {INDEX_PATH}")
+
+    if output_file:
+        print(f"\n🎯 Extracted dataset: {output_file}")
+    print(f"Total emails: {len(df)}")
+    write_report()
+    print(f"\n🏁 Extraction completed at: {datetime.now()}")
\ No newline at end of file
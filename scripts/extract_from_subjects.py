@@ -1,19 +1,16 @@
 import pandas as pd
-import re
-import spacy
+import ner_service
+from content_dedup import once_per_fingerprint
+from instrumentation import stage, write_report
+from company_index import resolve_companies
+from dataset_store import dataset_path, export_csv, load_dataset, save_dataset
+from schema import observed_counts
+from pattern_registry import (WRONG_COMPANY_MATCHER, WRONG_COMPANY_ARTIFACTS, SUBJECT_THANK_PATTERNS,
+                              SUBJECT_COMPANY_SUFFIX, SUBJECT_POSITION_PATTERNS, SUBJECT_DASH_PATTERN,
+                              SUBJECT_FROM_PATTERNS, PLATFORM_FIXES, PLATFORM_FIX_MATCHER, PLATFORM_SUFFIXES,
+                              SUBJECT_FALSE_POSITIVES, LETTER_RUN)
 from datetime import datetime
 
-print("🎯 Starting targeted subject extraction and artifact removal...")
-print(f"Started at: {datetime.now()}")
-
-# Load spaCy
-try:
-    nlp = spacy.load("en_core_web_sm")
-    print("✅ spaCy language model loaded")
-except:
-    print("❌ spaCy model not found")
-    nlp = None
-
 def is_obviously_wrong_company(company_name):
     """Identify companies that are clearly extraction artifacts"""
     if pd.isna(company_name) or not company_name:
@@ -21,111 +18,84 @@ def is_obviously_wrong_company(company_name):
     
     company_lower = str(company_name).lower().strip()
     
-    # Obviously wrong "companies"
-    wrong_companies = [
-        'jennifer touchton', 'jennifer', 'touchton',  # User's own name
-        'email', 'emails', 'gmail', 'outlook', 'yahoo',  # Email platforms
-        'noreply', 'no-reply', 'donotreply', 'do-not-reply',  # Email artifacts
-        'candidates', 'candidate', 'applicant', 'applicants',  # Generic terms
-        'dear', 'hello', 'hi', 'thanks', 'thank', 'notification',  # Greetings
-        'team', 'recruiting', 'talent', 'hr', 'human resources',  # Generic roles
-        'divthank', 'div', 'span', 'img', 'src',  # HTML artifacts
-        'schemas-microsoft-com', 'xmlns', 'http', 'www',  # XML/HTML
-        'tion powered by icims, the', 'powered by', 'icims',  # ATS artifacts
-        'application', 'apply', 'job', 'position', 'role',  # Job terms
-        'update', 'reminder', 'confirmation', 'receipt'  # Email types
-    ]
-    
-    # Check for exact matches or if the company name is mostly one of these terms
-    for wrong in wrong_companies:
-        if (company_lower == wrong or 
-            wrong in company_lower and len(wrong) > len(company_lower) * 0.6):
-            return True
+    # Check for exact matches or if the company name is mostly one of the
+    # wrong terms (an exact match is the longest possible hit)
+    if WRONG_COMPANY_MATCHER.longest_hit(company_lower) > len(company_lower) * 0.6:
+        return True
     
     # Check for patterns that indicate artifacts
-    artifact_patterns = [
-        r'^(re|fw|fwd):\s*',  # Email prefixes
-        r'^\d+$',  # Just numbers
-        r'^[^a-zA-Z]*$',  # No letters
-        r'^\s*$',  # Just whitespace
-    ]
-    
-    for pattern in artifact_patterns:
-        if re.search(pattern, company_lower):
-            return True
+    if WRONG_COMPANY_ARTIFACTS.search(company_lower):
+        return True
     
     return False
 
-def extract_company_from_subject_advanced(subject, body_preview=""):
-    """Advanced company extraction from subjects"""
+def extract_company_from_subject_rules(subject):
+    """Patterns 1-4 of the advanced subject extraction (None if unresolved)"""
     if not subject:
         return ""
     
     subject = str(subject).strip()
     
     # Pattern 1: "Thank you for your interest in [COMPANY]"
-    thank_patterns = [
-        r'(?:thank you for your interest in|interest in)\s+([^,\n!\.]+?)(?:\s*[,!\.]\s*|$)',
-        r'(?:thank you for applying to|applying to)\s+([^,\n!\.]+?)(?:\s*[,!\.]\s*|$)',
-        r'(?:your application to|application to)\s+([^,\n!\.]+?)(?:\s*[,!\.]\s*|$)',
-        r'(?:regarding your|your)\s+([A-Z][a-zA-Z\s&,\.]+?)\s+(?:employment\s+)?application',
-    ]
-    
-    for pattern in thank_patterns:
-        match = re.search(pattern, subject, re.IGNORECASE)
-        if match:
-            candidate = match.group(1).strip()
-            candidate = re.sub(r'\s*(inc|llc|corp|corporation|company|co\.?)\s*$', '', candidate, flags=re.IGNORECASE)
-            if validate_extracted_company(candidate):
-                return candidate.title()
+    for match in SUBJECT_THANK_PATTERNS.matches(subject):
+        candidate = match.group(1).strip()
+        candidate = SUBJECT_COMPANY_SUFFIX.sub('', candidate)
+        if validate_extracted_company(candidate):
+            return candidate.title()
     
     # Pattern 2: Position at [COMPANY] format
-    position_patterns = [
-        r'(?:position|role|opportunity|job)\s+(?:at|with|for)\s+([A-Z][a-zA-Z\s&,\.]+?)(?:\s|$|[,\.])',
-        r'([A-Z][a-zA-Z\s&,\.]+?)\s+(?:position|role|opportunity|job|interview)',
-        r'(?:@|at)\s+([A-Z][a-zA-Z\s&,\.]+?)(?:\s|$|[,\.])',
-    ]
-    
-    for pattern in position_patterns:
-        match = re.search(pattern, subject, re.IGNORECASE)
-        if match:
-            candidate = match.group(1).strip()
-            if validate_extracted_company(candidate):
-                return candidate.title()
+    for match in SUBJECT_POSITION_PATTERNS.matches(subject):
+        candidate = match.group(1).strip()
+        if validate_extracted_company(candidate):
+            return candidate.title()
     
     # Pattern 3: Company - Position format
-    dash_pattern = r'^([A-Z][a-zA-Z\s&,\.]+?)\s*[-–—]\s*'
-    match = re.search(dash_pattern, subject)
+    match = SUBJECT_DASH_PATTERN.search(subject)
     if match:
         candidate = match.group(1).strip()
         if validate_extracted_company(candidate):
             return candidate.title()
     
     # Pattern 4: From [COMPANY] format
-    from_patterns = [
-        r'(?:from|by)\s+([A-Z][a-zA-Z\s&,\.]+?)(?:\s|$|[,\.])',
-        r'^([A-Z][a-zA-Z\s&,\.]+?)\s+(?:team|recruiting|talent|hiring)',
-    ]
-    
-    for pattern in from_patterns:
-        match = re.search(pattern, subject, re.IGNORECASE)
-        if match:
-            candidate = match.group(1).strip()
-            if validate_extracted_company(candidate):
-                return candidate.title()
-    
-    # Pattern 5: spaCy extraction from subject + body
-    if nlp:
-        text = f"{subject} {body_preview[:100]}"
-        doc = nlp(text)
-        for ent in doc.ents:
-            if ent.label_ == "ORG":
-                candidate = ent.text.strip()
-                if validate_extracted_company(candidate):
-                    return candidate.title()
+    for match in SUBJECT_FROM_PATTERNS.matches(subject):
+        candidate = match.group(1).strip()
+        if validate_extracted_company(candidate):
+            return candidate.title()
+    
+    return None
+
+def subject_ner_text(item):
+    """Text the NER fallback reads for a (subject, body_preview) pair"""
+    subject, body_preview = item
+    return f"{str(subject).strip()} {body_preview[:100]}"
+
+def company_from_subject_orgs(item, orgs):
+    """Pattern 5: first valid spaCy ORG entity from subject + body"""
+    for org in orgs:
+        candidate = org.strip()
+        if validate_extracted_company(candidate):
+            return candidate.title()
     
     return ""
 
+def extract_companies_from_subjects(items):
+    """Resolve many (subject, body_preview) pairs: regex first, then one batched NER pass"""
+    return ner_service.batch_resolve(items, lambda item: extract_company_from_subject_rules(item[0]),
+                                     subject_ner_text, company_from_subject_orgs)
+
+def extract_companies_from_records(records):
+    """extract_companies_from_subjects() over the (subject, body_preview) of each row"""
+    subject_items = []
+    for _, row in records.iterrows():
+        subject = str(row.get('subject_line', ''))
+        body = str(row.get('body_preview', ''))
+        subject_items.append((subject, body))
+    return extract_companies_from_subjects(subject_items)
+
+def extract_company_from_subject_advanced(subject, body_preview=""):
+    """Advanced company extraction from subjects"""
+    return extract_companies_from_subjects([(subject, body_preview)])[0]
+
 def validate_extracted_company(name):
     """Validate if extracted text is a real company name"""
     if not name or len(name.strip()) < 2:
@@ -135,16 +105,7 @@ def validate_extracted_company(name):
     name_lower = name.lower()
     
     # Filter out common false positives
-    false_positives = [
-        'thank', 'thanks', 'your', 'our', 'the', 'this', 'that', 'with', 'from',
-        'application', 'position', 'role', 'job', 'opportunity', 'interview',
-        'team', 'hiring', 'recruiting', 'talent', 'employment', 'career',
-        'dear', 'hello', 'hi', 'jennifer', 'regards', 'best', 'sincerely',
-        'email', 'message', 'notification', 'update', 'reminder', 'confirmation',
-        'time', 'work', 'new', 'great', 'excited', 'pleased', 'happy'
-    ]
-    
-    if name_lower in false_positives:
+    if name_lower in SUBJECT_FALSE_POSITIVES:
         return False
     
     # Must be reasonable length
@@ -152,7 +113,7 @@ def validate_extracted_company(name):
         return False
     
     # Should contain letters
-    if not re.search(r'[a-zA-Z]{2,}', name):
+    if not LETTER_RUN.search(name):
         return False
     
     # Should not be mostly punctuation
@@ -170,159 +131,155 @@ def fix_platform_artifacts(company_name):
     company = str(company_name).strip()
     
     # Known fixes for platform artifacts
-    fixes = {
-        'schemas-microsoft-com': 'Microsoft',
-        'ziprecruiter phil': 'ZipRecruiter',
-        'ziprecruiter': 'ZipRecruiter',
-        'applytojob': 'ApplyToJob',
-        'ashbyhq': 'Ashby',
-        'marriotthiring': 'Marriott',
-        'pyramidci': 'Pyramid Consulting',
-        'hiretalent': 'HireTalent',
-        'cdi-careers': 'CDI',
-        'divthank': '',  # Remove this artifact
-    }
-    
-    company_lower = company.lower()
-    for artifact, fix in fixes.items():
-        if artifact in company_lower:
-            return fix
+    artifact = PLATFORM_FIX_MATCHER.first_keyword(company.lower())
+    if artifact is not None:
+        return PLATFORM_FIXES[artifact]
     
     # Clean up common platform suffixes
-    platform_suffixes = [
-        r'\s+phil$',  # ZipRecruiter Phil -> ZipRecruiter
-        r'\s+hiring$',  # Company Hiring -> Company
-        r'\s+careers?$',  # Company Careers -> Company
-        r'\s+jobs?$',  # Company Jobs -> Company
-        r'\s+talent$',  # Company Talent -> Company
-    ]
-    
-    for pattern in platform_suffixes:
-        company = re.sub(pattern, '', company, flags=re.IGNORECASE)
+    company = PLATFORM_SUFFIXES.apply(company)
     
     return company.title() if company else ''
 
-# Load the dataset
-print("📊 Loading dataset...")
-df = pd.read_csv('processed_data/job_emails_FINAL_CLEANED_20250613_1137.csv')
-
-print(f"Original records: {len(df)}")
-print(f"Companies before cleanup: {df['company_name'].nunique()}")
+def super_clean_companies(df, company_index=None):
+    """Pipeline stage: drop wrong companies, fix platform artifacts, re-extract unknowns and resolve company ids
 
-# Backup original company names
-df['company_before_cleanup'] = df['company_name']
-
-# Step 1: Remove obviously wrong companies
-print(f"\n🚨 Step 1: Removing obviously wrong companies...")
-wrong_company_mask = df['company_name'].apply(is_obviously_wrong_company)
-wrong_companies = df[wrong_company_mask]['company_name'].value_counts()
-
-if len(wrong_companies) > 0:
-    print(f"Removing {len(wrong_companies)} types of wrong companies:")
-    for company, count in wrong_companies.head(10).items():
-        print(f"  '{company}': {count} emails")
-
-df.loc[wrong_company_mask, 'company_name'] = 'Unknown Company'
-
-# Step 2: Fix platform artifacts
-print(f"\n🔧 Step 2: Fixing platform artifacts...")
-df['company_name'] = df['company_name'].apply(fix_platform_artifacts)
-
-# Step 3: Extract from Unknown Company records using advanced subject parsing
-print(f"\n🔍 Step 3: Advanced extraction from subjects...")
-unknown_mask = df['company_name'] == 'Unknown Company'
-unknown_records = df[unknown_mask]
-
-print(f"Processing {len(unknown_records)} unknown company records...")
-
-extracted_companies = []
-for _, row in unknown_records.iterrows():
-    subject = str(row.get('subject_line', ''))
-    body = str(row.get('body_preview', ''))
-    
-    extracted = extract_company_from_subject_advanced(subject, body)
-    if not extracted:
-        extracted = 'Unknown Company'
-    
-    extracted_companies.append(extracted)
+    A long-running caller can pass its loaded CompanyIndex (and save it
+    itself); otherwise the saved index is loaded and written back.
+    """
+    # Backup original company names
+    df['company_before_cleanup'] = df['company_name']
+    
+    # Step 1: Remove obviously wrong companies
+    with stage('Step 1: Removing obviously wrong companies', df):
+        print(f"\n🚨 Step 1: Removing obviously wrong companies...")
+        wrong_company_mask = df['company_name'].apply(is_obviously_wrong_company)
+        wrong_companies = df[wrong_company_mask]['company_name'].value_counts()
+    
+        if len(wrong_companies) > 0:
+            print(f"Removing {len(wrong_companies)} types of wrong companies:")
+            for company, count in wrong_companies.head(10).items():
+                print(f"  '{company}': {count} emails")
+    
+        df.loc[wrong_company_mask, 'company_name'] = 'Unknown Company'
+    
+    # Step 2: Fix platform artifacts
+    with stage('Step 2: Fixing platform artifacts', df):
+        print(f"\n🔧 Step 2: Fixing platform artifacts...")
+        df['company_name'] = df['company_name'].apply(fix_platform_artifacts)
+    
+    # Step 3: Extract from Unknown Company records using advanced subject parsing
+    with stage('Step 3: Advanced extraction from subjects', df):
+        print(f"\n🔍 Step 3: Advanced extraction from subjects...")
+        unknown_mask = df['company_name'] == 'Unknown Company'
+        unknown_records = df[unknown_mask]
+    
+        print(f"Processing {len(unknown_records)} unknown company records...")
+    
+        # Regex patterns per row, then spaCy once over every row they left unresolved
+        # (one row per duplicate group - the copies get its result)
+        extracted_companies = [extracted if extracted else 'Unknown Company'
+                               for extracted in once_per_fingerprint(unknown_records, extract_companies_from_records)]
+    
+        df.loc[unknown_mask, 'company_name'] = extracted_companies
+    
+    # Step 4: Final cleanup pass
+    with stage('Step 4: Final cleanup pass', df):
+        print(f"\n🧹 Step 4: Final cleanup pass...")
+        # Remove empty companies
+        df.loc[df['company_name'] == '', 'company_name'] = 'Unknown Company'
+    
+        # Update confidence scores for newly extracted companies
+        newly_extracted_mask = (df['company_name'] != df['company_before_cleanup']) & (df['company_name'] != 'Unknown Company')
+        df.loc[newly_extracted_mask, 'company_confidence'] = 65
+    
+    # Step 5: One canonical name and company_id per company
+    with stage('Step 5: Resolving company name variants', df):
+        print(f"\n🏢 Step 5: Resolving company name variants...")
+        df = resolve_companies(df, company_index)
+    
+    # Remove temporary column
+    return df.drop('company_before_cleanup', axis=1)
 
-df.loc[unknown_mask, 'company_name'] = extracted_companies
+if __name__ == '__main__':
+    print("🎯 Starting targeted subject extraction and artifact removal...")
+    print(f"Started at: {datetime.now()}")
 
-# Step 4: Final cleanup pass
-print(f"\n🧹 Step 4: Final cleanup pass...")
-# Remove empty companies
-df.loc[df['company_name'] == '', 'company_name'] = 'Unknown Company'
+    # Load the dataset
+    print("📊 Loading dataset...")
+    with stage('Loading dataset') as timer:
+        df = timer.done(load_dataset('processed_data/job_emails_FINAL_CLEANED_20250613_1137.csv'))
 
-# Update confidence scores for newly extracted companies
-newly_extracted_mask = (df['company_name'] != df['company_before_cleanup']) & (df['company_name'] != 'Unknown Company')
-df.loc[newly_extracted_mask, 'company_confidence'] = 65
+    print(f"Original records: {len(df)}")
+    print(f"Companies before cleanup: {df['company_name'].nunique()}")
 
-# Calculate results
-companies_before = df['company_before_cleanup'].nunique()
-companies_after = df['company_name'].nunique()
-unknown_after = len(df[df['company_name'] == 'Unknown Company'])
-total_extracted = len(df[newly_extracted_mask])
+    # Steps 1-5 (the original names are kept for the report below)
+    company_before_cleanup = df['company_name'].copy()
+    df = super_clean_companies(df)
+    newly_extracted_mask = (df['company_name'] != company_before_cleanup) & (df['company_name'] != 'Unknown Company')
 
-print(f"\n📈 CLEANUP RESULTS:")
-print(f"Companies before: {companies_before}")
-print(f"Companies after: {companies_after}")
-print(f"Newly extracted companies: {total_extracted}")
-print(f"Unknown companies remaining: {unknown_after}")
+    # Calculate results
+    companies_before = company_before_cleanup.nunique()
+    companies_after = df['company_name'].nunique()
+    unknown_after = len(df[df['company_name'] == 'Unknown Company'])
+    total_extracted = len(df[newly_extracted_mask])
 
-# Show examples of what was cleaned
-print(f"\n🎯 EXAMPLES OF IMPROVEMENTS:")
-changes = df[df['company_name'] != df['company_before_cleanup']].copy()
+    print(f"\n📈 CLEANUP RESULTS:")
+    print(f"Companies before: {companies_before}")
+    print(f"Companies after: {companies_after}")
+    print(f"Newly extracted companies: {total_extracted}")
+    print(f"Unknown companies remaining: {unknown_after}")
 
-if len(changes) > 0:
-    print("Company name changes:")
-    change_examples = changes[['company_before_cleanup', 'company_name', 'subject_line']].drop_duplicates('company_name')
-    
-    for _, row in change_examples.head(15).iterrows():
-        before = row['company_before_cleanup']
-        after = row['company_name']
-        subject = str(row['subject_line'])[:50]
-        print(f"  '{before}' → '{after}' (from: '{subject}...')")
+    # Show examples of what was cleaned
+    print(f"\n🎯 EXAMPLES OF IMPROVEMENTS:")
+    changes = df[df['company_name'] != company_before_cleanup].copy()
 
-# Show top companies after cleanup
-print(f"\n📊 TOP COMPANIES AFTER CLEANUP:")
-legitimate_companies = df[df['company_name'] != 'Unknown Company']['company_name'].value_counts().head(20)
-for company, count in legitimate_companies.items():
-    print(f"  {company}: {count} emails")
+    if len(changes) > 0:
+        print("Company name changes:")
+        changes['company_before_cleanup'] = company_before_cleanup[changes.index]
+        change_examples = changes[['company_before_cleanup', 'company_name', 'subject_line']].drop_duplicates('company_name')
+    
+        for _, row in change_examples.head(15).iterrows():
+            before = row['company_before_cleanup']
+            after = row['company_name']
+            subject = str(row['subject_line'])[:50]
+            print(f"  '{before}' → '{after}' (from: '{subject}...')")
 
-# Analyze remaining unknowns
-remaining_unknowns = df[df['company_name'] == 'Unknown Company']
-if len(remaining_unknowns) > 0:
-    print(f"\n🔍 REMAINING {len(remaining_unknowns)} UNKNOWN RECORDS:")
-    print("Sample subjects:")
-    for subject in remaining_unknowns['subject_line'].head(5):
-        print(f"  '{str(subject)[:70]}...'")
-    
-    print("Sender domains:")
-    domain_counts = remaining_unknowns['sender_domain'].value_counts().head(5)
-    for domain, count in domain_counts.items():
-        print(f"  {domain}: {count}")
+    # Show top companies after cleanup
+    print(f"\n📊 TOP COMPANIES AFTER CLEANUP:")
+    legitimate_companies = df[df['company_name'] != 'Unknown Company']['company_name'].value_counts().head(20)
+    for company, count in legitimate_companies.items():
+        print(f"  {company}: {count} emails")
 
-# Remove temporary column
-df = df.drop('company_before_cleanup', axis=1)
+    # Analyze remaining unknowns
+    remaining_unknowns = df[df['company_name'] == 'Unknown Company']
+    if len(remaining_unknowns) > 0:
+        print(f"\n🔍 REMAINING {len(remaining_unknowns)} UNKNOWN RECORDS:")
+        print("Sample subjects:")
+        for subject in remaining_unknowns['subject_line'].head(5):
+            print(f"  '{str(subject)[:70]}...'")
+    
+        print("Sender domains:")
+        domain_counts = observed_counts(remaining_unknowns['sender_domain']).head(5)
+        for domain, count in domain_counts.items():
+            print(f"  {domain}: {count}")
 
-# Save final cleaned dataset
-output_file = f"processed_data/job_emails_SUPER_CLEAN_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
-df.to_csv(output_file, index=False)
+    # Save final cleaned dataset
+    output_file = save_dataset(df, 'SUPER_CLEAN')
 
-# Create Power BI version
-powerbi_clean = df[df['company_name'] != 'Unknown Company'].copy()
-powerbi_file = f"processed_data/POWERBI_SUPER_CLEAN_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
-powerbi_clean.to_csv(powerbi_file, index=False)
+    # Create Power BI version
+    powerbi_clean = df[df['company_name'] != 'Unknown Company'].copy()
+    powerbi_file = export_csv(powerbi_clean, dataset_path('SUPER_CLEAN', prefix='POWERBI', extension='csv'))
 
-print(f"\n🎯 SUPER CLEAN DATASETS SAVED:")
-print(f"Complete dataset: {output_file}")
-print(f"  - Total records: {len(df)}")
-print(f"  - Unique companies: {companies_after}")
-print(f"  - Unknown companies: {unknown_after}")
+    print(f"\n🎯 SUPER CLEAN DATASETS SAVED:")
+    print(f"Complete dataset: {output_file}")
+    print(f"  - Total records: {len(df)}")
+    print(f"  - Unique companies: {companies_after}")
+    print(f"  - Unknown companies: {unknown_after}")
 
-print(f"Power BI ready: {powerbi_file}")
-print(f"  - Clean records: {len(powerbi_clean)}")
-print(f"  - Unique companies: {powerbi_clean['company_name'].nunique()}")
+    print(f"Power BI ready: {powerbi_file}")
+    print(f"  - Clean records: {len(powerbi_clean)}")
+    print(f"  - Unique companies: {powerbi_clean['company_name'].nunique()}")
 
-print(f"\n🏁 Super cleanup completed at: {datetime.now()}")
-print(f"\n🚀 READY FOR POWER BI DASHBOARD!")
\ No newline at end of file
+    write_report()
+    print(f"\n🏁 Super cleanup completed at: {datetime.now()}")
+    print(f"\n🚀 READY FOR POWER BI DASHBOARD!")
\ No newline at end of file
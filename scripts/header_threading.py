@@ -0,0 +1,88 @@
+import re
+import pandas as pd
+
+HEADER_COLUMNS = ['message_id', 'in_reply_to', 'references', 'gmail_thread_id']
+
+MESSAGE_ID_PATTERN = re.compile(r'<[^<>\s]+>')
+
+def clean_header(value):
+    """Return a header value as a stripped string ('' for missing)"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return str(value).strip()
+
+def parse_message_ids(value):
+    """Extract the <...> message ids from an In-Reply-To/References header"""
+    return MESSAGE_ID_PATTERN.findall(clean_header(value))
+
+def has_header_columns(df):
+    """True when the dataset carries threading headers from extraction"""
+    return any(column in df.columns for column in HEADER_COLUMNS)
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with path halving and union by size"""
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return root_a
+
+def build_header_threads(df):
+    """Label each row with a header-based thread component, or -1 for orphans
+
+    Rows are joined when they share an X-GM-THRID, or when one's
+    Message-ID appears in another's In-Reply-To/References (two replies to
+    the same missing parent are joined too). Labels are numbered in order
+    of first appearance. A row is an orphan when nothing links it to any
+    other row and it carries no Gmail thread id - those are left for
+    subject matching.
+    """
+    n = len(df)
+    columns = {column: (df[column].tolist() if column in df.columns else [None] * n)
+               for column in HEADER_COLUMNS}
+
+    sets = UnionFind(n)
+    first_row_for_id = {}
+    first_row_for_gmail_thread = {}
+    has_gmail_thread = [False] * n
+
+    for row in range(n):
+        gmail_thread = clean_header(columns['gmail_thread_id'][row])
+        if gmail_thread:
+            has_gmail_thread[row] = True
+            first = first_row_for_gmail_thread.setdefault(gmail_thread, row)
+            if first != row:
+                sets.union(first, row)
+
+        message_id = clean_header(columns['message_id'][row])
+        linked_ids = parse_message_ids(columns['in_reply_to'][row]) + parse_message_ids(columns['references'][row])
+        for header_id in ([message_id] if message_id else []) + linked_ids:
+            first = first_row_for_id.setdefault(header_id, row)
+            if first != row:
+                sets.union(first, row)
+
+    labels = []
+    component_labels = {}
+    for row in range(n):
+        root = sets.find(row)
+        if sets.size[root] == 1 and not has_gmail_thread[row]:
+            labels.append(-1)
+        else:
+            labels.append(component_labels.setdefault(root, len(component_labels)))
+    return labels
\ No newline at end of file
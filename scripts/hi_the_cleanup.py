@@ -1,19 +1,16 @@
 import pandas as pd
-import re
-import spacy
+import ner_service
+from content_dedup import once_per_fingerprint
+from instrumentation import stage, write_report
+from ats_extractors import ATS_EXTRACTORS
+from domain_intelligence import load_domain_table, route_domain, route_rows
+from dataset_store import dataset_path, export_csv, load_dataset, save_dataset
+from schema import observed_counts
+from pattern_registry import (COMPANY_NAME_ARTIFACTS, COMPANY_NAME_GREETINGS,
+                              UNKNOWN_SUBJECT_PATTERNS, UNKNOWN_BODY_PATTERNS,
+                              UNKNOWN_FALSE_POSITIVES, HAS_LETTER)
 from datetime import datetime
 
-print("🧹 Starting comprehensive final cleanup...")
-print(f"Started at: {datetime.now()}")
-
-# Load spaCy for better company extraction
-try:
-    nlp = spacy.load("en_core_web_sm")
-    print("✅ spaCy language model loaded")
-except:
-    print("❌ spaCy model not found - using pattern matching only")
-    nlp = None
-
 def clean_company_name_artifacts(company_name):
     """Remove common artifacts from company names"""
     if pd.isna(company_name) or not company_name:
@@ -22,30 +19,13 @@ def clean_company_name_artifacts(company_name):
     company = str(company_name).strip()
     
     # Remove common email artifacts
-    artifacts_to_remove = [
-        r'\s*(logo|hi|dear|hello)\s+jennifer\s*',
-        r'\s*jennifer\s*$',
-        r'\s*hi\s+jennifer\s*$',
-        r'\s*dear\s+jennifer\s*$',
-        r'\s*logo\s*$',
-        r'\s*notification\s*$',
-        r'^\s*(gdpr|thank|thanks|update)\s+',
-        r'\s*team\s*$',
-        r'\s*recruiting\s*$',
-        r'^\s*(the|a|an)\s+',
-        r'\s+(inc|llc|corp|corporation|company|co)\s*$'
-    ]
-    
     original = company
-    for pattern in artifacts_to_remove:
-        company = re.sub(pattern, '', company, flags=re.IGNORECASE).strip()
+    company = COMPANY_NAME_ARTIFACTS.apply(company)
     
     # If we removed too much, try a simpler approach
     if len(company) < 2:
         # Try just removing the greeting parts
-        company = re.sub(r'\s*(hi|dear|hello)\s+jennifer\s*', '', original, flags=re.IGNORECASE).strip()
-        company = re.sub(r'\s*jennifer\s*$', '', company, flags=re.IGNORECASE).strip()
-        company = re.sub(r'\s*logo\s*$', '', company, flags=re.IGNORECASE).strip()
+        company = COMPANY_NAME_GREETINGS.apply(original)
     
     # Capitalize properly
     if len(company) >= 2:
@@ -57,90 +37,99 @@ def clean_company_name_artifacts(company_name):
     
     return ""
 
-def extract_company_from_unknown(row):
-    """Try to extract company from Unknown Company records using all available data"""
-    subject = str(row.get('subject_line', ''))
-    body = str(row.get('body_preview', ''))
+def extract_company_by_rules(row):
+    """Domain and regex passes for Unknown Company records (None if unresolved)"""
     sender_email = str(row.get('sender_email', ''))
     sender_domain = str(row.get('sender_domain', ''))
     
-    # Method 1: Email domain analysis (but smarter this time)
+    # Method 1: Email domain analysis - ATS platforms are read from the content instead
     if '@' in sender_email and sender_domain:
-        # Known ATS platforms - extract from content instead
-        ats_domains = ['greenhouse-mail.io', 'lever.co', 'workday.com', 'icims.com', 'bamboohr.com']
-        
-        if not any(ats in sender_domain for ats in ats_domains):
-            # Regular company email - extract from domain
-            domain_parts = sender_domain.lower().split('.')
-            if len(domain_parts) >= 2:
-                company_part = domain_parts[0]
-                # Filter out generic domains
-                if company_part not in ['no-reply', 'noreply', 'mail', 'email', 'info', 'contact', 'support']:
-                    return company_part.title()
+        route, platform, company = route_domain(sender_domain.lower())
+        if route == 'company':
+            return company
+        row = dict(row, ats_platform=platform)
     
-    # Method 2: Subject line patterns for unknown companies
-    subject_patterns = [
-        r'(?:from|at|with|@)\s+([A-Z][a-zA-Z\s&,\.]{2,30}?)(?:\s|$|[,\.])',
-        r'([A-Z][a-zA-Z\s&,\.]{2,30}?)\s+(?:team|opportunity|position|role|job)',
-        r'(?:application|interview|position)\s+(?:at|with|for)\s+([A-Z][a-zA-Z\s&,\.]{2,30}?)(?:\s|$)',
-        r'^([A-Z][a-zA-Z\s&,\.]{2,30}?)\s+[-–—]',  # Company - Job Title format
-        r'([A-Z][a-zA-Z\s&,\.]{2,30}?)\s+(?:is\s+)?(?:hiring|looking|seeking)',
-    ]
+    return extract_company_by_content(row)
+
+def extract_company_by_content(row):
+    """ATS and regex passes over subject and body (None if unresolved)"""
+    subject = str(row.get('subject_line', ''))
+    body = str(row.get('body_preview', ''))
     
-    for pattern in subject_patterns:
-        match = re.search(pattern, subject)
-        if match:
-            candidate = match.group(1).strip()
-            if validate_company_name(candidate):
-                return candidate.title()
+    # ATS notifications: the platform's own extractor
+    extract_ats_company = ATS_EXTRACTORS.get(row.get('ats_platform') or '')
+    if extract_ats_company is not None:
+        company = extract_ats_company(f"{subject} {body}")
+        if company:
+            return company
     
-    # Method 3: Body content analysis
-    body_patterns = [
-        r'(?:work|join|at)\s+([A-Z][a-zA-Z\s&,\.]{2,30}?)(?:\s|$|[,\.])',
-        r'([A-Z][a-zA-Z\s&,\.]{2,30}?)\s+(?:is\s+)?(?:excited|pleased|happy)\s+to',
-        r'(?:team\s+at|opportunity\s+at)\s+([A-Z][a-zA-Z\s&,\.]{2,30}?)(?:\s|$)',
-    ]
+    # Method 2: Subject line patterns for unknown companies
+    for match in UNKNOWN_SUBJECT_PATTERNS.matches(subject):
+        candidate = match.group(1).strip()
+        if validate_company_name(candidate):
+            return candidate.title()
     
-    for pattern in body_patterns:
-        match = re.search(pattern, body)
-        if match:
-            candidate = match.group(1).strip()
-            if validate_company_name(candidate):
-                return candidate.title()
+    # Method 3: Body content analysis
+    for match in UNKNOWN_BODY_PATTERNS.matches(body):
+        candidate = match.group(1).strip()
+        if validate_company_name(candidate):
+            return candidate.title()
     
-    # Method 4: spaCy entity recognition
-    if nlp:
-        search_text = f"{subject} {body[:200]}"
-        doc = nlp(search_text)
-        
-        for ent in doc.ents:
-            if ent.label_ == "ORG":
-                candidate = ent.text.strip()
-                if validate_company_name(candidate):
-                    return candidate.title()
+    return None
+
+def unknown_ner_text(row):
+    """Text the NER fallback reads for an Unknown Company record"""
+    subject = str(row.get('subject_line', ''))
+    body = str(row.get('body_preview', ''))
+    return f"{subject} {body[:200]}"
+
+def company_from_orgs(row, orgs):
+    """Method 4: first valid spaCy ORG entity, else Unknown Company"""
+    for org in orgs:
+        candidate = org.strip()
+        if validate_company_name(candidate):
+            return candidate.title()
     
     return "Unknown Company"
 
+def extract_companies_from_unknown(records):
+    """Resolve many records: regex passes per row, then one batched NER pass"""
+    return ner_service.batch_resolve(records, extract_company_by_rules, unknown_ner_text, company_from_orgs)
+
+def extract_companies_by_domain(records, domain_table):
+    """Resolve many Unknown Company records, routed by a join against the domain table
+
+    Rows whose domain names the company are resolved straight from the
+    table; ATS and generic domains go through the content rules and one
+    batched NER pass.
+    """
+    routed = route_rows(records, domain_table)
+    by_domain = (routed['route'] == 'company') & records['sender_email'].astype(str).str.contains('@', regex=False)
+    companies = routed['domain_company'].where(by_domain)
+    
+    content_records = records[~by_domain].assign(ats_platform=routed.loc[~by_domain, 'ats_platform'])
+    print(f"Resolved {by_domain.sum()} records by sender domain, {len(content_records)} from content "
+          f"({(content_records['ats_platform'] != '').sum()} ATS notifications)")
+    companies[~by_domain] = ner_service.batch_resolve(content_records.to_dict('records'), extract_company_by_content,
+                                                      unknown_ner_text, company_from_orgs)
+    return companies.tolist()
+
+def extract_company_from_unknown(row):
+    """Try to extract company from Unknown Company records using all available data"""
+    return extract_companies_from_unknown([row])[0]
+
 def validate_company_name(name):
     """Validate if a string looks like a real company name"""
     if not name or len(name) < 2 or len(name) > 50:
         return False
     
     # Filter out common false positives
-    false_positives = [
-        'thank', 'thanks', 'application', 'position', 'role', 'job', 'opportunity',
-        'team', 'interview', 'hiring', 'looking', 'seeking', 'excited', 'pleased',
-        'happy', 'interested', 'received', 'update', 'notification', 'jennifer',
-        'your', 'our', 'the', 'this', 'that', 'with', 'from', 'dear', 'hello',
-        'hi', 'email', 'message', 'sent', 'time', 'work', 'new', 'great'
-    ]
-    
     name_lower = name.lower().strip()
-    if name_lower in false_positives:
+    if name_lower in UNKNOWN_FALSE_POSITIVES:
         return False
     
     # Must contain at least one letter
-    if not re.search(r'[a-zA-Z]', name):
+    if not HAS_LETTER.search(name):
         return False
     
     # Should not be mostly numbers or symbols
@@ -158,7 +147,7 @@ def analyze_unknown_companies(df):
     
     # Sender domain analysis
     print(f"\nTop sender domains for unknowns:")
-    domain_counts = unknown_records['sender_domain'].value_counts().head(10)
+    domain_counts = observed_counts(unknown_records['sender_domain']).head(10)
     for domain, count in domain_counts.items():
         print(f"  {domain}: {count}")
     
@@ -169,112 +158,135 @@ def analyze_unknown_companies(df):
     
     return unknown_records
 
-# Load the dataset
-print("📊 Loading dataset...")
-df = pd.read_csv('processed_data/job_emails_FINAL_CLEAN_20250613_1132.csv')
-
-print(f"Original records: {len(df)}")
-print(f"Companies before cleanup: {df['company_name'].nunique()}")
-
-# Analyze unknowns before cleanup
-unknown_before = len(df[df['company_name'] == 'Unknown Company'])
-print(f"Unknown companies before: {unknown_before}")
-
-if unknown_before > 0:
-    analyze_unknown_companies(df)
-
-# Step 1: Clean existing company names of artifacts
-print(f"\n🧹 Step 1: Cleaning existing company name artifacts...")
-df['company_name_original'] = df['company_name']  # Backup
-df['company_name_cleaned'] = df['company_name'].apply(clean_company_name_artifacts)
+def cleanup_company_names(df, domain_table=None):
+    """Pipeline stage: strip artifacts from company names and re-extract unknowns
 
-# Step 2: Try to extract companies from Unknown Company records
-print(f"\n🔍 Step 2: Extracting companies from Unknown Company records...")
-unknown_mask = (df['company_name_cleaned'] == '') | (df['company_name'] == 'Unknown Company')
-unknown_records = df[unknown_mask].copy()
+    domain_table is the routing table to use; by default the saved one is
+    loaded, or one is learned from this dataset without being saved.
+    """
+    # Step 1: Clean existing company names of artifacts
+    with stage('Step 1: Cleaning existing company name artifacts', df):
+        print(f"\n🧹 Step 1: Cleaning existing company name artifacts...")
+        df['company_name_original'] = df['company_name']  # Backup
+        df['company_name_cleaned'] = df['company_name'].apply(clean_company_name_artifacts)
+    
+    # Step 2: Try to extract companies from Unknown Company records
+    with stage('Step 2: Extracting companies from Unknown Company records', df):
+        print(f"\n🔍 Step 2: Extracting companies from Unknown Company records...")
+        unknown_mask = (df['company_name_cleaned'] == '') | (df['company_name'] == 'Unknown Company')
+        unknown_records = df[unknown_mask].copy()
+    
+        print(f"Processing {len(unknown_records)} unknown/empty company records...")
+    
+        # Extract companies for unknown records (NER only runs on rows the domain and regex passes leave unresolved)
+        # (a saved domain table is reused; otherwise one is learned from the names cleaned in Step 1)
+        if domain_table is None:
+            history = df.assign(company_name=df['company_name_cleaned'].where(~unknown_mask, 'Unknown Company'))
+            domain_table = load_domain_table(history)
+        # (copies of one notification are resolved once, through their content_fingerprint)
+        extracted_companies = once_per_fingerprint(unknown_records,
+                                                   lambda records: extract_companies_by_domain(records, domain_table))
+        df.loc[unknown_mask, 'company_name_cleaned'] = extracted_companies
+    
+    # Step 3: Final cleanup - use cleaned names, fall back to original if cleaning failed
+    with stage('Step 3: Final cleanup', df):
+        df['company_name_final'] = df.apply(lambda row: 
+            row['company_name_cleaned'] if row['company_name_cleaned'] and row['company_name_cleaned'] != '' 
+            else row['company_name'], axis=1)
+    
+        # Update the main company_name column
+        df['company_name'] = df['company_name_final']
+    
+        # Update confidence scores
+        cleaned_mask = df['company_name'] != df['company_name_original']
+        df.loc[cleaned_mask, 'company_confidence'] = 70  # Medium confidence for cleaned names
+    
+    # Remove temporary columns
+    return df.drop(['company_name_original', 'company_name_cleaned', 'company_name_final'], axis=1)
 
-print(f"Processing {len(unknown_records)} unknown/empty company records...")
+if __name__ == '__main__':
+    print("🧹 Starting comprehensive final cleanup...")
+    print(f"Started at: {datetime.now()}")
 
-# Extract companies for unknown records
-extracted_companies = unknown_records.apply(extract_company_from_unknown, axis=1)
-df.loc[unknown_mask, 'company_name_cleaned'] = extracted_companies
+    # Load the dataset
+    print("📊 Loading dataset...")
+    with stage('Loading dataset') as timer:
+        df = timer.done(load_dataset('processed_data/job_emails_FINAL_CLEAN_20250613_1132.csv'))
 
-# Step 3: Final cleanup - use cleaned names, fall back to original if cleaning failed
-df['company_name_final'] = df.apply(lambda row: 
-    row['company_name_cleaned'] if row['company_name_cleaned'] and row['company_name_cleaned'] != '' 
-    else row['company_name'], axis=1)
+    print(f"Original records: {len(df)}")
+    print(f"Companies before cleanup: {df['company_name'].nunique()}")
 
-# Update the main company_name column
-df['company_name'] = df['company_name_final']
+    # Analyze unknowns before cleanup
+    unknown_before = len(df[df['company_name'] == 'Unknown Company'])
+    print(f"Unknown companies before: {unknown_before}")
 
-# Update confidence scores
-cleaned_mask = df['company_name'] != df['company_name_original']
-df.loc[cleaned_mask, 'company_confidence'] = 70  # Medium confidence for cleaned names
+    if unknown_before > 0:
+        analyze_unknown_companies(df)
 
-# Calculate results
-unknown_after = len(df[df['company_name'] == 'Unknown Company'])
-companies_after = df['company_name'].nunique()
-extracted_count = unknown_before - unknown_after
+    # Steps 1-3 (the original names are kept for the examples below)
+    company_names_before = df['company_name'].copy()
+    df = cleanup_company_names(df)
 
-print(f"\n📈 CLEANUP RESULTS:")
-print(f"Unknown companies before: {unknown_before}")
-print(f"Unknown companies after: {unknown_after}")
-print(f"Successfully extracted: {extracted_count}")
-print(f"Total unique companies after cleanup: {companies_after}")
+    # Calculate results
+    unknown_after = len(df[df['company_name'] == 'Unknown Company'])
+    companies_after = df['company_name'].nunique()
+    extracted_count = unknown_before - unknown_after
 
-# Show examples of what was cleaned
-print(f"\n🎯 EXAMPLES OF CLEANING:")
-cleaned_examples = df[df['company_name'] != df['company_name_original']].copy()
+    print(f"\n📈 CLEANUP RESULTS:")
+    print(f"Unknown companies before: {unknown_before}")
+    print(f"Unknown companies after: {unknown_after}")
+    print(f"Successfully extracted: {extracted_count}")
+    print(f"Total unique companies after cleanup: {companies_after}")
 
-if len(cleaned_examples) > 0:
-    print("Company name improvements:")
-    for _, row in cleaned_examples.head(10).iterrows():
-        original = row['company_name_original']
-        cleaned = row['company_name']
-        if original != cleaned:
-            print(f"  '{original}' → '{cleaned}'")
+    # Show examples of what was cleaned
+    print(f"\n🎯 EXAMPLES OF CLEANING:")
+    cleaned_examples = df[df['company_name'] != company_names_before].copy()
 
-# Show top companies after cleanup
-print(f"\n📊 TOP COMPANIES AFTER CLEANUP:")
-top_companies = df[df['company_name'] != 'Unknown Company']['company_name'].value_counts().head(20)
-for company, count in top_companies.items():
-    print(f"  {company}: {count} emails")
+    if len(cleaned_examples) > 0:
+        print("Company name improvements:")
+        for index, row in cleaned_examples.head(10).iterrows():
+            original = company_names_before[index]
+            cleaned = row['company_name']
+            if original != cleaned:
+                print(f"  '{original}' → '{cleaned}'")
 
-# Remove temporary columns
-df = df.drop(['company_name_original', 'company_name_cleaned', 'company_name_final'], axis=1)
+    # Show top companies after cleanup
+    print(f"\n📊 TOP COMPANIES AFTER CLEANUP:")
+    top_companies = df[df['company_name'] != 'Unknown Company']['company_name'].value_counts().head(20)
+    for company, count in top_companies.items():
+        print(f"  {company}: {count} emails")
 
-# Save final cleaned dataset
-output_file = f"processed_data/job_emails_FINAL_CLEANED_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
-df.to_csv(output_file, index=False)
+    # Save final cleaned dataset
+    output_file = save_dataset(df, 'FINAL_CLEANED')
 
-# Create new Power BI optimized version
-powerbi_clean = df[df['company_name'] != 'Unknown Company'].copy()
-powerbi_file = f"processed_data/POWERBI_FINAL_CLEANED_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
-powerbi_clean.to_csv(powerbi_file, index=False)
+    # Create new Power BI optimized version
+    powerbi_clean = df[df['company_name'] != 'Unknown Company'].copy()
+    powerbi_file = export_csv(powerbi_clean, dataset_path('FINAL_CLEANED', prefix='POWERBI', extension='csv'))
 
-print(f"\n🎯 FINAL CLEANED DATASETS:")
-print(f"Complete dataset: {output_file}")
-print(f"  - Total records: {len(df)}")
-print(f"  - Unique companies: {companies_after}")
-print(f"  - Unknown companies: {unknown_after}")
+    print(f"\n🎯 FINAL CLEANED DATASETS:")
+    print(f"Complete dataset: {output_file}")
+    print(f"  - Total records: {len(df)}")
+    print(f"  - Unique companies: {companies_after}")
+    print(f"  - Unknown companies: {unknown_after}")
 
-print(f"Power BI optimized: {powerbi_file}")
-print(f"  - Clean records: {len(powerbi_clean)}")
-print(f"  - Unique companies: {powerbi_clean['company_name'].nunique()}")
+    print(f"Power BI optimized: {powerbi_file}")
+    print(f"  - Clean records: {len(powerbi_clean)}")
+    print(f"  - Unique companies: {powerbi_clean['company_name'].nunique()}")
 
-# Final unknown analysis
-if unknown_after > 0:
-    print(f"\n🔍 REMAINING UNKNOWN COMPANY ANALYSIS:")
-    remaining_unknowns = df[df['company_name'] == 'Unknown Company']
+    # Final unknown analysis
+    if unknown_after > 0:
+        print(f"\n🔍 REMAINING UNKNOWN COMPANY ANALYSIS:")
+        remaining_unknowns = df[df['company_name'] == 'Unknown Company']
     
-    print(f"Sample subjects from remaining unknowns:")
-    for subject in remaining_unknowns['subject_line'].head(5):
-        print(f"  '{str(subject)[:70]}...'")
+        print(f"Sample subjects from remaining unknowns:")
+        for subject in remaining_unknowns['subject_line'].head(5):
+            print(f"  '{str(subject)[:70]}...'")
     
-    print(f"Top sender domains for remaining unknowns:")
-    domain_counts = remaining_unknowns['sender_domain'].value_counts().head(5)
-    for domain, count in domain_counts.items():
-        print(f"  {domain}: {count}")
+        print(f"Top sender domains for remaining unknowns:")
+        domain_counts = observed_counts(remaining_unknowns['sender_domain']).head(5)
+        for domain, count in domain_counts.items():
+            print(f"  {domain}: {count}")
 
-print(f"\n🏁 Comprehensive cleanup completed at: {datetime.now()}")
-print(f"\n💡 Ready for Power BI dashboard development!")
\ No newline at end of file
+    write_report()
+    print(f"\n🏁 Comprehensive cleanup completed at: {datetime.now()}")
+    print(f"\n💡 Ready for Power BI dashboard development!")
\ No newline at end of file
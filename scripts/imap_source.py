@@ -0,0 +1,373 @@
+import imaplib
+import itertools
+import os
+import re
+import sqlite3
+import sys
+import pandas as pd
+from datetime import datetime
+from email.message import Message
+from email.parser import BytesHeaderParser
+from body_extraction import ENCODED_BYTES_PER_BYTE, MAX_BODY_BYTES, decode_filename, payload_text
+from extract_emails import message_record, store_incremental
+from ingestion_ledger import IngestionLedger
+from instrumentation import count, stage, write_report
+
+# Connection settings (IMAP_PASSWORD should be an app password, never the account password)
+IMAP_HOST = os.environ.get('IMAP_HOST', 'imap.gmail.com')
+IMAP_PORT = int(os.environ.get('IMAP_PORT', '993'))
+IMAP_USER = os.environ.get('IMAP_USER', '')
+IMAP_PASSWORD = os.environ.get('IMAP_PASSWORD', '')
+IMAP_SSL = os.environ.get('IMAP_SSL', '1') != '0'
+IMAP_FOLDERS = [folder for folder in os.environ.get('IMAP_FOLDERS', 'INBOX').split(',') if folder]
+
+DEFAULT_CHECKPOINT_PATH = 'processed_data/imap_checkpoints.sqlite'
+CHECKPOINT_PATH = os.environ.get('IMAP_CHECKPOINT_PATH', DEFAULT_CHECKPOINT_PATH)
+
+# UIDs per FETCH command - one round trip for headers and structure, one per text section
+BATCH_SIZE = 500
+
+# Only the headers the extractor reads are fetched, never the full header block
+HEADER_FIELDS = ['MESSAGE-ID', 'IN-REPLY-TO', 'REFERENCES', 'SUBJECT', 'FROM', 'DATE', 'X-GM-THRID']
+
+# The same encoded prefix scan_message() reads from an mbox
+BODY_FETCH_BYTES = MAX_BODY_BYTES * ENCODED_BYTES_PER_BYTE
+
+# A base64 line carries 57 bytes in 76 characters plus CRLF
+BASE64_BYTES_PER_OCTET = 57 / 78
+
+RESPONSE_TOKENS = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|\{(\d+)\}$|([^\s()"\[]+(?:\[[^\]]*\](?:<\d+>)?)?))')
+
+def parse_response(data):
+    """Nested lists from imaplib response data: literals and quoted strings as bytes, NIL as None"""
+    tokens = []
+    for item in data:
+        text, literal = item if isinstance(item, tuple) else (item, None)
+        position = 0
+        while position < len(text):
+            match = RESPONSE_TOKENS.match(text, position)
+            if match is None or match.end() == position:
+                break
+            position = match.end()
+            opening, closing, quoted, literal_size, atom = match.groups()
+            if opening:
+                tokens.append('(')
+            elif closing:
+                tokens.append(')')
+            elif quoted is not None:
+                tokens.append(re.sub(rb'\\(.)', rb'\1', quoted))
+            elif literal_size is not None:
+                tokens.append(literal if literal is not None else b'')
+            else:
+                tokens.append(None if atom.upper() == b'NIL' else atom)
+
+    stack = [[]]
+    for token in tokens:
+        if token == '(':
+            stack.append([])
+        elif token == ')':
+            if len(stack) > 1:
+                done = stack.pop()
+                stack[-1].append(done)
+        else:
+            stack[-1].append(token)
+    return stack[0]
+
+def fetch_items(data):
+    """{uid: {ITEM: value}} from a UID FETCH response"""
+    messages = {}
+    response = parse_response(data)
+    for value in response:
+        if not isinstance(value, list):
+            continue
+        items = {}
+        for name, item in zip(value[::2], value[1::2]):
+            if isinstance(name, bytes):
+                items[name.decode('ascii', errors='ignore').upper()] = item
+        if 'UID' in items:
+            messages[int(items['UID'])] = items
+    return messages
+
+def text(value):
+    return value.decode('utf-8', errors='ignore') if isinstance(value, bytes) else ''
+
+def params(value):
+    """('name' 'value' ...) parameter list as a dict with lower-case names"""
+    if not isinstance(value, list):
+        return {}
+    return {text(name).lower(): text(item) for name, item in zip(value[::2], value[1::2])}
+
+def iter_structure(structure, section=''):
+    """Yield (section, content_type, params, encoding, size, disposition, disposition params)
+    for every leaf part of a BODYSTRUCTURE, like body_extraction.iter_parts() does for raw bytes"""
+    if structure and isinstance(structure[0], list):
+        # Child parts come first; the subtype and its (boundary ...) parameter list follow
+        children = list(itertools.takewhile(lambda part: isinstance(part, list), structure))
+        for number, child in enumerate(children, 1):
+            yield from iter_structure(child, f"{section}.{number}" if section else str(number))
+        return
+
+    content_type = f"{text(structure[0])}/{text(structure[1])}".lower()
+    size = int(structure[6]) if len(structure) > 6 and structure[6] else 0
+    # Extension data starts after the type-specific fields (text: lines, message/rfc822: envelope, body, lines)
+    extension = 8 if content_type.startswith('text/') else 10 if content_type == 'message/rfc822' else 7
+    disposition = structure[extension + 1] if len(structure) > extension + 1 else None
+    disposition_type, disposition_params = '', {}
+    if isinstance(disposition, list) and disposition:
+        disposition_type = text(disposition[0]).lower()
+        disposition_params = params(disposition[1] if len(disposition) > 1 else None)
+    yield (section or 'TEXT', content_type, params(structure[2]), text(structure[5]).lower(), size,
+           disposition_type, disposition_params)
+
+def structure_parts(structure):
+    """(text part, html part, attachments) of a BODYSTRUCTURE, chosen the way scan_message() chooses"""
+    text_part = html_part = None
+    attachments = []
+    for part in iter_structure(structure):
+        section, content_type, part_params, encoding, size, disposition, disposition_params = part
+        filename = disposition_params.get('filename') or part_params.get('name')
+        if disposition == 'attachment' or filename or content_type.split('/')[0] not in ('text', 'multipart', 'message'):
+            attachments.append({
+                'filename': decode_filename(filename) if filename else '',
+                'content_type': content_type,
+                'size': int(size * BASE64_BYTES_PER_OCTET) if encoding == 'base64' else size,
+                'section': section,
+                'encoding': encoding,
+            })
+        elif content_type == 'text/plain' and text_part is None:
+            text_part = part
+        elif content_type == 'text/html' and html_part is None:
+            html_part = part
+    return text_part, html_part, attachments
+
+def part_headers(part):
+    """Stand-in headers for payload_text(): content type, charset and transfer encoding"""
+    _, content_type, part_params, encoding, _, _, _ = part
+    headers = Message()
+    headers['Content-Type'] = f'{content_type}; charset="{part_params.get("charset", "utf-8")}"'
+    headers['Content-Transfer-Encoding'] = encoding or '7bit'
+    return headers
+
+def uid_set(uids):
+    """Compact IMAP sequence set: 1:3,7,9:10"""
+    ranges = []
+    for uid in sorted(uids):
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ','.join(str(low) if low == high else f"{low}:{high}" for low, high in ranges)
+
+def quote_folder(folder):
+    return '"' + folder.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def check(response):
+    status, data = response
+    if status != 'OK':
+        raise imaplib.IMAP4.error(f"{status}: {data}")
+    return data
+
+_pool = {}
+
+def connect(host=IMAP_HOST, port=IMAP_PORT, user=IMAP_USER, password=IMAP_PASSWORD, use_ssl=IMAP_SSL, slot=0):
+    """Logged-in connection for an account, reused across folders and syncs while it stays alive
+
+    A connection has one selected folder at a time, so callers reading
+    several folders at once ask for a separate `slot` each.
+    """
+    key = (host, port, user, slot)
+    conn = _pool.get(key)
+    if conn is not None:
+        try:
+            check(conn.noop())
+            return conn
+        except (imaplib.IMAP4.error, OSError):
+            _pool.pop(key, None)
+
+    conn = imaplib.IMAP4_SSL(host, port) if use_ssl else imaplib.IMAP4(host, port)
+    check(conn.login(user, password))
+    _pool[key] = conn
+    return conn
+
+def close_connections():
+    for conn in _pool.values():
+        try:
+            conn.logout()
+        except (imaplib.IMAP4.error, OSError):
+            pass
+    _pool.clear()
+
+class ImapCheckpoints:
+    """Highest UID already fetched per account and folder, with the folder's UIDVALIDITY"""
+
+    def __init__(self, path=CHECKPOINT_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS folders (
+                account TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                last_uid INTEGER NOT NULL,
+                updated TEXT,
+                PRIMARY KEY (account, folder)
+            )""")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def last_uid(self, account, folder, uidvalidity):
+        """UID to continue after (0 when the folder is new or its UIDVALIDITY changed)"""
+        row = self.conn.execute("SELECT uidvalidity, last_uid FROM folders WHERE account = ? AND folder = ?",
+                                (account, folder)).fetchone()
+        if row is None or row[0] != uidvalidity:
+            return 0
+        return row[1]
+
+    def update(self, account, folder, uidvalidity, last_uid):
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.conn.execute("""
+            INSERT INTO folders (account, folder, uidvalidity, last_uid, updated) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(account, folder) DO UPDATE SET
+                uidvalidity = excluded.uidvalidity,
+                last_uid = excluded.last_uid,
+                updated = excluded.updated""", (account, folder, uidvalidity, last_uid, now))
+        self.conn.commit()
+
+def select_folder(conn, folder):
+    """Open a folder read-only and return its UIDVALIDITY"""
+    check(conn.select(quote_folder(folder), readonly=True))
+    _, values = conn.response('UIDVALIDITY')
+    return int(values[0]) if values and values[0] else 0
+
+def new_uids(conn, since_uid):
+    """UIDs above since_uid ('n:*' also matches the highest UID when nothing is newer)"""
+    data = check(conn.uid('SEARCH', None, f"UID {since_uid + 1}:*"))
+    return sorted(uid for uid in map(int, b' '.join(data).split()) if uid > since_uid)
+
+def fetch_batch_responses(conn, uids, gmail=False):
+    """Network half of fetch_batch(): ({uid: header and structure items}, {uid: text part bytes})
+
+    One FETCH gets the selected headers and BODYSTRUCTURE of every
+    message; then one partial BODY.PEEK per distinct text section number
+    gets the start of the chosen text part. Nothing is marked as read.
+    """
+    items = f"(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({' '.join(HEADER_FIELDS)})]{' X-GM-THRID' if gmail else ''})"
+    messages = fetch_items(check(conn.uid('FETCH', uid_set(uids), items)))
+
+    sections = {}
+    for uid, message in messages.items():
+        text_part, html_part, _ = structure_parts(message.get('BODYSTRUCTURE') or [])
+        if text_part or html_part:
+            sections.setdefault((text_part or html_part)[0], []).append(uid)
+
+    payloads = {}
+    for section, section_uids in sections.items():
+        data = check(conn.uid('FETCH', uid_set(section_uids), f"(UID BODY.PEEK[{section}]<0.{BODY_FETCH_BYTES}>)"))
+        for uid, message in fetch_items(data).items():
+            payloads[uid] = next((value for name, value in message.items() if name.startswith('BODY[')), b'')
+    count('imap_fetch_batches')
+    return messages, payloads
+
+def batch_records(uids, messages, payloads, gmail=False):
+    """CPU half of fetch_batch(): extraction records from the fetched headers, structures and text parts"""
+    records = []
+    for uid in uids:
+        message = messages.get(uid)
+        if message is None:  # expunged since the search
+            continue
+        header_block = next((value for name, value in message.items() if name.startswith('BODY[HEADER')), b'')
+        headers = BytesHeaderParser().parsebytes(header_block or b'')
+        if gmail and message.get('X-GM-THRID') and 'X-GM-THRID' not in headers:
+            headers['X-GM-THRID'] = text(message['X-GM-THRID'])
+        text_part, html_part, attachments = structure_parts(message.get('BODYSTRUCTURE') or [])
+        part = text_part or html_part
+        body = payload_text(part_headers(part), payloads.get(uid) or b'') if part else ''
+        record = message_record(headers, body, attachments)
+        record['imap_uid'] = uid
+        records.append(record)
+    return records
+
+def fetch_batch(conn, uids, gmail=False):
+    """Extraction records for one batch of UIDs: headers and text sections only, attachments as metadata"""
+    messages, payloads = fetch_batch_responses(conn, uids, gmail)
+    return batch_records(uids, messages, payloads, gmail)
+
+def fetch_new(conn, since_uid=0, batch_size=BATCH_SIZE):
+    """Extraction records for the messages of the selected folder with UID above since_uid"""
+    uids = new_uids(conn, since_uid)
+    gmail = 'X-GM-EXT-1' in conn.capabilities
+    records = []
+    for i in range(0, len(uids), batch_size):
+        records.extend(fetch_batch(conn, uids[i:i + batch_size], gmail))
+    return records
+
+def sync_folders(folders=None, checkpoints=None, **account):
+    """Fetch new mail from each folder since its checkpoint
+
+    Returns (DataFrame in the extractor's columns, [(account, folder,
+    uidvalidity, last uid)]) - record the positions with
+    ImapCheckpoints.update() once the rows are safely stored.
+    """
+    folders = folders or IMAP_FOLDERS
+    conn = connect(**account)
+    account_name = f"{account.get('user', IMAP_USER)}@{account.get('host', IMAP_HOST)}"
+
+    records = []
+    positions = []
+    for folder in folders:
+        uidvalidity = select_folder(conn, folder)
+        since_uid = checkpoints.last_uid(account_name, folder, uidvalidity) if checkpoints else 0
+        folder_records = fetch_new(conn, since_uid)
+        print(f"📥 {account_name}/{folder}: {len(folder_records)} new emails (after UID {since_uid})")
+        for record in folder_records:
+            record['imap_folder'] = folder
+        records.extend(folder_records)
+        last_uid = max([since_uid] + [record['imap_uid'] for record in folder_records])
+        positions.append((account_name, folder, uidvalidity, last_uid))
+
+    df = pd.DataFrame(records)
+    if len(df) > 0:
+        df['extraction_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return df, positions
+
+if __name__ == '__main__':
+    print("📬 Starting IMAP sync...")
+    print(f"Started at: {datetime.now()}")
+
+    # Usage: python imap_source.py [folder ...] - account from IMAP_HOST / IMAP_USER / IMAP_PASSWORD
+    folders = sys.argv[1:] or IMAP_FOLDERS
+    if not IMAP_USER or not IMAP_PASSWORD:
+        raise SystemExit("❌ Set IMAP_USER and IMAP_PASSWORD (an app password) first")
+
+    with ImapCheckpoints() as checkpoints:
+        with stage('IMAP sync') as timer:
+            df, positions = sync_folders(folders, checkpoints)
+            timer.done(df)
+        close_connections()
+
+        # Same handoff as extract_emails.py --incremental: ledger ids, a delta file, the merged dataset
+        with IngestionLedger() as ledger:
+            total = len(df)
+            df, delta_file, output_file = store_incremental(df, ledger)
+            print(f"🆕 New or changed emails: {len(df)} of {total}")
+        # The delta is stored and merged, so the next sync can start after these UIDs
+        for position in positions:
+            checkpoints.update(*position)
+
+    if delta_file:
+        print(f"\n🎯 Extracted dataset: {output_file}")
+        print(f"Delta: {delta_file}")
+    print(f"Total emails: {len(df)}")
+    write_report()
+    print(f"\n🏁 IMAP sync completed at: {datetime.now()}")
\ No newline at end of file
@@ -0,0 +1,204 @@
+import asyncio
+import os
+import sys
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import imap_source
+from dataset_store import save_dataset
+from extract_emails import SHARDS_PER_WORKER, extract_shard, store_incremental
+from ingestion_ledger import IngestionLedger
+from instrumentation import count, stage, write_report
+from mbox_reader import find_shard_ranges
+from message_index import INDEX_PATH, MessageIndex
+
+# Parse jobs waiting per worker; sources stop fetching when the queue is full
+QUEUE_JOBS_PER_WORKER = 2
+
+class MboxSource:
+    """One mbox file, handed out as byte-range shards
+
+    Workers read their own range from the memory-mapped file, so disk
+    reads happen in the pool alongside other sources' parsing rather than
+    being copied through the queue.
+    """
+
+    def __init__(self, mbox_path):
+        self.mbox_path = mbox_path
+        self.name = mbox_path
+
+    async def produce(self, put, workers):
+        ranges = await asyncio.to_thread(find_shard_ranges, self.mbox_path, workers * SHARDS_PER_WORKER)
+        for start, end in ranges:
+            await put(extract_shard, (self.mbox_path, start, end))
+
+    def finish(self, records):
+        for record in records:
+            record['mbox_path'] = self.mbox_path
+        return records
+
+class ImapFolderSource:
+    """New mail of one IMAP folder, on its own pooled connection
+
+    imaplib is blocking, so each round trip runs in a thread; while the
+    next batch is on the wire the previous one is parsed in the pool.
+    """
+
+    def __init__(self, folder, checkpoints=None, batch_size=imap_source.BATCH_SIZE, **account):
+        self.folder = folder
+        self.checkpoints = checkpoints
+        self.batch_size = batch_size
+        self.account = account
+        self.account_name = f"{account.get('user', imap_source.IMAP_USER)}@{account.get('host', imap_source.IMAP_HOST)}"
+        self.name = f"{self.account_name}/{folder}"
+        self.position = None
+
+    async def produce(self, put, workers):
+        conn = await asyncio.to_thread(imap_source.connect, slot=self.folder, **self.account)
+        uidvalidity = await asyncio.to_thread(imap_source.select_folder, conn, self.folder)
+        since_uid = self.checkpoints.last_uid(self.account_name, self.folder, uidvalidity) if self.checkpoints else 0
+        uids = await asyncio.to_thread(imap_source.new_uids, conn, since_uid)
+        gmail = 'X-GM-EXT-1' in conn.capabilities
+
+        for i in range(0, len(uids), self.batch_size):
+            batch = uids[i:i + self.batch_size]
+            messages, payloads = await asyncio.to_thread(imap_source.fetch_batch_responses, conn, batch, gmail)
+            await put(imap_source.batch_records, batch, messages, payloads, gmail)
+        self.position = (self.account_name, self.folder, uidvalidity, max([since_uid] + uids))
+
+    def finish(self, records):
+        for record in records:
+            record['imap_folder'] = self.folder
+        return records
+
+async def ingest(sources, workers=None, queue_jobs_per_worker=QUEUE_JOBS_PER_WORKER):
+    """Records of every source, fetched concurrently and parsed in a process pool
+
+    Each source produces parse jobs into one bounded queue; `workers`
+    consumers hand them to the pool. A full queue makes the sources wait,
+    so a fast reader cannot pile up unparsed batches in memory. Results
+    come back in source order, then job order - the same rows, in the same
+    order, as processing the sources one after another.
+    """
+    workers = workers or os.cpu_count() or 1
+    queue = asyncio.Queue(maxsize=workers * queue_jobs_per_worker)
+    results = {}
+    errors = []
+    loop = asyncio.get_running_loop()
+
+    async def run_source(number, source):
+        jobs = 0
+
+        async def put(function, *args):
+            nonlocal jobs
+            await queue.put(((number, jobs), source, function, args))
+            jobs += 1
+
+        started = time.perf_counter()
+        await source.produce(put, workers)
+        # Stage timers nest, so concurrent sources just report their own fetch time
+        print(f"  ✅ {source.name}: {jobs} batches fetched in {time.perf_counter() - started:.1f}s")
+
+    async def consume(pool):
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            if errors:
+                continue  # keep draining so no source is left waiting on a full queue
+            key, source, function, args = job
+            try:
+                records = await loop.run_in_executor(pool, function, *args)
+            except Exception as e:
+                errors.append(e)
+                continue
+            results[key] = source.finish(records)
+            count('ingest_jobs')
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        consumers = [asyncio.create_task(consume(pool)) for _ in range(workers)]
+        try:
+            await asyncio.gather(*(run_source(number, source) for number, source in enumerate(sources)))
+        finally:
+            for _ in consumers:
+                await queue.put(None)
+            await asyncio.gather(*consumers)
+    if errors:
+        raise errors[0]
+
+    records = []
+    for key in sorted(results):
+        records.extend(results[key])
+    return records
+
+def ingest_sources(sources, workers=None):
+    """Run ingest() and return one DataFrame with sequential email ids, like extract_mailboxes()"""
+    df = pd.DataFrame(asyncio.run(ingest(sources, workers)))
+    if len(df) > 0:
+        df.insert(0, 'email_id', [f"email_{i:05d}" for i in range(1, len(df) + 1)])
+        df['extraction_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return df
+
+if __name__ == '__main__':
+    print("📬 Starting concurrent ingestion...")
+    print(f"Started at: {datetime.now()}")
+
+    # Usage: python ingest_scheduler.py [mbox ...] [--imap=FOLDER,FOLDER] [--workers=N] [--incremental]
+    # (IMAP account from IMAP_HOST / IMAP_USER / IMAP_PASSWORD, as for imap_source.py)
+    args = sys.argv[1:]
+    incremental = '--incremental' in args
+    workers = [int(arg.split('=', 1)[1]) for arg in args if arg.startswith('--workers=')]
+    workers = workers[0] if workers else None
+    imap_folders = [folder for arg in args if arg.startswith('--imap=') for folder in arg.split('=', 1)[1].split(',')]
+    mbox_paths = [arg for arg in args if not arg.startswith('--')]
+    if imap_folders and not incremental:
+        # IMAP fetches only mail past the checkpoints, so it can only add to a dataset, never replace it
+        raise SystemExit("❌ --imap needs --incremental: a sync fetches only new mail, which is merged into EXTRACTED")
+    if not mbox_paths and not imap_folders:
+        # Update these paths to match your extracted files
+        mbox_paths = ['extracted_emails/Takeout/Mail/applications.mbox']
+
+    sources = []
+    for mbox_path in mbox_paths:
+        if os.path.exists(mbox_path):
+            sources.append(MboxSource(mbox_path))
+        else:
+            print(f"❌ File not found: {mbox_path}")
+
+    checkpoints = imap_source.ImapCheckpoints() if imap_folders else None
+    sources += [ImapFolderSource(folder, checkpoints) for folder in imap_folders]
+    print(f"Sources: {len(sources)}, workers: {workers or os.cpu_count()}")
+
+    with stage('Extraction') as timer:
+        df = timer.done(ingest_sources(sources, workers))
+    imap_source.close_connections()
+
+    delta_file = None
+    if incremental:
+        # Same handoff as extract_emails.py --incremental: ledger ids, a delta file, the merged dataset
+        with IngestionLedger() as ledger:
+            total = len(df)
+            df, delta_file, output_file = store_incremental(df, ledger)
+            print(f"🆕 New or changed emails: {len(df)} of {total}")
+    else:
+        output_file = save_dataset(df, 'EXTRACTED')
+
+    # The rows are stored, so the IMAP folders can move past what was fetched
+    if checkpoints is not None:
+        for source in sources:
+            if isinstance(source, ImapFolderSource) and source.position is not None:
+                checkpoints.update(*source.position)
+        checkpoints.close()
+
+    if INDEX_PATH and len(df) > 0 and 'mbox_offset' in df.columns:
+        with MessageIndex() as index:
+            print(f"🗂️  Indexed {index.add(df[df['mbox_offset'].notna()])} messages → {INDEX_PATH}")
+
+    if output_file:
+        print(f"\n🎯 Extracted dataset: {output_file}")
+    if delta_file:
+        print(f"Delta: {delta_file}")
+    print(f"Total emails: {len(df)}")
+    write_report()
+    print(f"\n🏁 Ingestion completed at: {datetime.now()}")
\ No newline at end of file
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import sqlite3
+import pandas as pd
+from datetime import datetime
+
+DEFAULT_LEDGER_PATH = 'processed_data/ingestion_ledger.sqlite'
+
+# Fields that define "the same message" for change detection. Export-specific
+# details (labels, mbox offsets, extraction time) are deliberately left out
+HASHED_FIELDS = ['subject_line', 'sender_email', 'email_date', 'body_preview', 'body_length']
+
+# SQLite limits the number of bound parameters per statement
+LOOKUP_CHUNK = 500
+
+def content_hash(record):
+    """Stable hash of the content fields of one extracted record"""
+    digest = hashlib.sha256()
+    for field in HASHED_FIELDS:
+        value = record.get(field)
+        value = '' if value is None or pd.isna(value) else str(value)
+        digest.update(value.encode('utf-8', errors='ignore'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+def ledger_key(message_id, hash_value):
+    """Message-ID when the message has one, otherwise its content hash"""
+    if message_id is not None and not pd.isna(message_id) and str(message_id).strip():
+        return str(message_id).strip()
+    return f"hash:{hash_value}"
+
+class IngestionLedger:
+    """Persistent record of every message already pushed through the pipeline"""
+
+    def __init__(self, path=DEFAULT_LEDGER_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                ledger_key TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                email_id TEXT NOT NULL,
+                first_seen TEXT,
+                last_seen TEXT
+            )""")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _lookup(self, keys):
+        """Return {ledger_key: (content_hash, email_id)} for the keys already seen"""
+        found = {}
+        keys = list(keys)
+        for i in range(0, len(keys), LOOKUP_CHUNK):
+            chunk = keys[i:i + LOOKUP_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT ledger_key, content_hash, email_id FROM messages WHERE ledger_key IN ({placeholders})",
+                chunk)
+            for key, hash_value, email_id in rows:
+                found[key] = (hash_value, email_id)
+        return found
+
+    def is_empty(self):
+        """True until the first message is recorded"""
+        return self.conn.execute("SELECT 1 FROM messages LIMIT 1").fetchone() is None
+
+    def _next_email_number(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'last_email_number'").fetchone()
+        return (row[0] if row else 0) + 1
+
+    def annotate(self, df):
+        """Add content_hash and ledger_key columns to an extracted DataFrame"""
+        df = df.copy()
+        records = df.to_dict('records')
+        df['content_hash'] = [content_hash(record) for record in records]
+        message_ids = df['message_id'] if 'message_id' in df.columns else [None] * len(df)
+        df['ledger_key'] = [ledger_key(mid, h) for mid, h in zip(message_ids, df['content_hash'])]
+        return df
+
+    def select_new(self, df):
+        """Keep only rows that are new or whose content changed since the last run
+
+        Known messages keep the email_id they were first given, new messages
+        get ids continuing after the highest one ever issued.
+        """
+        df = self.annotate(df)
+        # The same message can appear in several labels/exports - keep the first copy
+        df = df.drop_duplicates('ledger_key')
+        seen = self._lookup(df['ledger_key'])
+
+        keep = []
+        email_ids = []
+        next_number = self._next_email_number()
+        for key, hash_value in zip(df['ledger_key'], df['content_hash']):
+            if key in seen:
+                old_hash, email_id = seen[key]
+                keep.append(old_hash != hash_value)
+                email_ids.append(email_id)
+            else:
+                keep.append(True)
+                email_ids.append(f"email_{next_number:05d}")
+                next_number += 1
+
+        df['email_id'] = email_ids
+        return df[keep].copy()
+
+    def mark_processed(self, df):
+        """Record rows as ingested - call once the dataset holding them has been written"""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rows = [(key, hash_value, email_id, now, now)
+                for key, hash_value, email_id in zip(df['ledger_key'], df['content_hash'], df['email_id'])]
+        self.conn.executemany("""
+            INSERT INTO messages (ledger_key, content_hash, email_id, first_seen, last_seen)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(ledger_key) DO UPDATE SET
+                content_hash = excluded.content_hash,
+                last_seen = excluded.last_seen""", rows)
+
+        numbers = [int(str(email_id).rsplit('_', 1)[-1]) for email_id in df['email_id']
+                   if str(email_id).rsplit('_', 1)[-1].isdigit()]
+        if numbers:
+            self.conn.execute("""
+                INSERT INTO meta (name, value) VALUES ('last_email_number', ?)
+                ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)""", (max(numbers),))
+        self.conn.commit()
+
+def merge_into_dataset(existing_df, delta_df, key='email_id'):
+    """Replace changed rows and append new ones, keeping the dataset ordered by key"""
+    if existing_df is None or len(existing_df) == 0:
+        return delta_df.reset_index(drop=True)
+    if len(delta_df) == 0:
+        return existing_df
+
+    unchanged = existing_df[~existing_df[key].isin(delta_df[key])]
+    merged = pd.concat([unchanged, delta_df], ignore_index=True)
+    # Left-pad so email_99999 still sorts before email_100000
+    return merged.sort_values(key, key=lambda s: s.astype(str).str.zfill(20), kind='stable').reset_index(drop=True)
\ No newline at end of file
@@ -1,6 +1,7 @@
 import os
-import mailbox
 from datetime import datetime
+from body_extraction import scan_message
+from mbox_reader import MboxReader, parse_message
 
 print("🔍 Starting email data inspection...")
 
@@ -19,41 +20,35 @@ for mbox_path in mbox_paths:
         print(f"\n📧 Analyzing: {mbox_path}")
         
         try:
-            mbox = mailbox.mbox(mbox_path)
-            total_emails = len(mbox)
-            total_all_files += total_emails
-            print(f"✅ Total emails found: {total_emails}")
-            
-            # Sample a few emails to understand structure
-            sample_count = min(3, total_emails)
+            # Stream the file - the count comes out of the same single pass
+            mbox = MboxReader(mbox_path)
+            sample_count = 3
             print(f"\n📋 First {sample_count} email samples:")
             
-            for i, message in enumerate(mbox):
+            # Raw iteration: only the sampled messages are parsed, attachments are never decoded
+            for i, (offset, raw) in enumerate(mbox.iter_raw()):
                 if i >= sample_count:
-                    break
+                    continue
                     
+                try:
+                    message, body, attachments = scan_message(raw, offset)
+                except Exception:
+                    message, body, attachments = parse_message(raw), "Could not decode body", []
+                
                 print(f"\n--- Email {i+1} ---")
                 print(f"From: {message.get('From', 'Unknown')}")
                 print(f"Subject: {message.get('Subject', 'No Subject')}")
                 print(f"Date: {message.get('Date', 'No Date')}")
+                for attachment in attachments:
+                    print(f"Attachment: {attachment['filename'] or '(unnamed)'} "
+                          f"({attachment['content_type']}, {attachment['size']:,} bytes at offset {attachment['offset']})")
                 
-                # Preview first 150 chars of body
-                body = ""
-                if message.is_multipart():
-                    for part in message.walk():
-                        if part.get_content_type() == "text/plain":
-                            try:
-                                body = part.get_payload(decode=True).decode('utf-8', errors='ignore')
-                                break
-                            except:
-                                body = "Could not decode body"
-                else:
-                    try:
-                        body = message.get_payload(decode=True).decode('utf-8', errors='ignore')
-                    except:
-                        body = "Could not decode body"
-                
+                # Preview first 150 chars of body (HTML-only emails are stripped to text)
                 print(f"Body preview: {body[:150]}...")
+            
+            total_emails = mbox.count
+            total_all_files += total_emails
+            print(f"\n✅ Total emails found: {total_emails}")
                 
         except Exception as e:
             print(f"❌ Error reading {mbox_path}: {e}")
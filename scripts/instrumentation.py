@@ -0,0 +1,190 @@
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows - peak RSS is left out of the report
+    resource = None
+
+REPORT_DIR = os.environ.get('RUN_REPORT_DIR', 'processed_data')  # empty string disables run reports
+
+# A stage is flagged when it is this much slower than in the previous report of the same script
+REGRESSION_FACTOR = 1.25
+MIN_REGRESSION_SECONDS = 0.5
+
+# Calls to hot functions (nlp.pipe texts, regex scans), incremented where they happen
+counters = Counter()
+
+def count(name, amount=1):
+    counters[name] += amount
+
+def cpu_seconds():
+    """User + system CPU of this process and its finished worker processes"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def peak_rss_mb(who=None):
+    """High-water resident set size in MB (None where the resource module is missing)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+class Stage:
+    """Timings of one stage; rows_out is set with done()"""
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.peak_rss_mb = None
+        self.rss_growth_mb = None
+        self.counters = {}
+
+    def done(self, df):
+        """Record the stage output's row count and pass the output through"""
+        self.rows_out = len(df)
+        return df
+
+    def to_dict(self):
+        return dict(vars(self))
+
+class RunReport:
+    """Per-stage wall time, CPU time, rows and peak memory of one script run"""
+
+    def __init__(self, name=None):
+        self.name = name or os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'run'
+        self.started = datetime.now()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = cpu_seconds()
+        # Counters are process-wide; a report only claims what happened since it started
+        self.counters_start = counters.copy()
+        self.stages = []
+        self.open_stages = []
+        self.metadata = {}  # free-form run details (input size, settings) stored with the report
+
+    @contextmanager
+    def stage(self, name, df=None):
+        """Time the enclosed block; nested stages are named 'OUTER / middle / inner'"""
+        timer = Stage(f"{self.open_stages[-1].name} / {name}" if self.open_stages else name,
+                      len(df) if df is not None else None)
+        counters_before = counters.copy()
+        rss_before = peak_rss_mb()
+        wall_start, cpu_start = time.perf_counter(), cpu_seconds()
+        self.open_stages.append(timer)
+        try:
+            yield timer
+        finally:
+            self.open_stages.pop()
+            timer.wall_seconds = round(time.perf_counter() - wall_start, 3)
+            timer.cpu_seconds = round(cpu_seconds() - cpu_start, 3)
+            timer.peak_rss_mb = peak_rss_mb()
+            if rss_before is not None:
+                timer.rss_growth_mb = round(timer.peak_rss_mb - rss_before, 1)
+            timer.counters = dict(counters - counters_before)
+            self.stages.append(timer)
+
+    def to_dict(self):
+        return {
+            'run': self.name,
+            'started': self.started.isoformat(timespec='seconds'),
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'wall_seconds': round(time.perf_counter() - self.wall_start, 3),
+            'cpu_seconds': round(cpu_seconds() - self.cpu_start, 3),
+            'peak_rss_mb': peak_rss_mb(),
+            'peak_rss_workers_mb': peak_rss_mb(resource.RUSAGE_CHILDREN) if resource is not None else None,
+            'counters': dict(counters - self.counters_start),
+            'metadata': self.metadata,
+            'stages': [timer.to_dict() for timer in self.stages],
+        }
+
+    def report_path(self, output_dir):
+        return os.path.join(output_dir, f"run_report_{self.name}_{self.started.strftime('%Y%m%d_%H%M%S')}.json")
+
+    def previous_report(self, output_dir):
+        """The most recent earlier report of the same script, or None"""
+        paths = sorted(glob.glob(os.path.join(output_dir, f"run_report_{self.name}_*.json")))
+        paths = [path for path in paths if path != self.report_path(output_dir)]
+        if not paths:
+            return None
+        with open(paths[-1], encoding='utf-8') as f:
+            return json.load(f)
+
+    def write(self, output_dir=REPORT_DIR):
+        """Write the JSON report, print the stage table and any regressions, return the path"""
+        if not output_dir:
+            return None
+        report = self.to_dict()
+        previous = self.previous_report(output_dir)
+        report['regressions'] = regressions(report, previous) if previous else []
+
+        os.makedirs(output_dir, exist_ok=True)
+        path = self.report_path(output_dir)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+        print(f"\n⏱️  STAGE TIMINGS ({report['wall_seconds']:.1f}s wall, {report['cpu_seconds']:.1f}s CPU):")
+        for timer in report['stages']:
+            rows = f"{timer['rows_in']} → {timer['rows_out']}" if timer['rows_in'] is not None else ''
+            print(f"  {timer['name'][:60]:<60} {timer['wall_seconds']:>8.2f}s  {rows}")
+        for regression in report['regressions']:
+            print(f"⚠️  Slower than the previous run: {regression['stage']} "
+                  f"{regression['previous_seconds']:.2f}s → {regression['seconds']:.2f}s")
+        print(f"📝 Run report: {path}")
+        return path
+
+def regressions(report, previous):
+    """Stages that took REGRESSION_FACTOR times longer than in the previous report"""
+    def wall_times(stages):
+        seen = Counter()
+        times = {}
+        for timer in stages:
+            # A stage name can repeat within a run - pair the n-th occurrences
+            seen[timer['name']] += 1
+            times[(timer['name'], seen[timer['name']])] = timer['wall_seconds']
+        return times
+
+    before = wall_times(previous.get('stages', []))
+    found = []
+    for key, seconds in wall_times(report['stages']).items():
+        previous_seconds = before.get(key)
+        if previous_seconds is None:
+            continue
+        if seconds > previous_seconds * REGRESSION_FACTOR and seconds - previous_seconds > MIN_REGRESSION_SECONDS:
+            found.append({'stage': key[0], 'previous_seconds': previous_seconds, 'seconds': seconds})
+    return found
+
+_report = None
+
+def current_report():
+    """The report of this process, started on first use"""
+    global _report
+    if _report is None:
+        _report = RunReport()
+    return _report
+
+def start_report(name=None):
+    """Begin a new report - for processes that make several runs (benchmarks, services)"""
+    global _report
+    _report = RunReport(name)
+    return _report
+
+def stage(name, df=None):
+    """Context manager timing one stage of the current run
+
+        with stage('Priority scoring', df) as timer:
+            df = timer.done(score(df))
+    """
+    return current_report().stage(name, df)
+
+def write_report(output_dir=REPORT_DIR):
+    return current_report().write(output_dir)
\ No newline at end of file
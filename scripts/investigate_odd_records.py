@@ -1,7 +1,19 @@
-import pandas as pd
+from dataset_store import load_dataset
+from message_index import get_message_body
 
 # Load the super clean dataset
-df = pd.read_csv('processed_data/job_emails_SUPER_CLEAN_20250613_1141.csv')
+# (only the columns this report prints, plus the content fields that find a row in the message index)
+df = load_dataset('processed_data/job_emails_SUPER_CLEAN_20250613_1141.csv',
+                  columns=['company_name', 'sender_domain', 'sender_email', 'subject_line', 'body_preview',
+                           'body_length', 'email_date'])
+
+def show_body(row, preview_length):
+    """Full body read from the mbox through the message index, else the stored preview"""
+    body = get_message_body(row)
+    if body is None:
+        print(f"Body: {row['body_preview'][:preview_length]}...")
+    else:
+        print(f"Body: {' '.join(body.split())}")
 
 print("🔍 INVESTIGATING ODD COMPANY RECORDS")
 print("=" * 50)
@@ -23,7 +35,7 @@ for odd_company in odd_companies:
         for i, row in records.head(3).iterrows():  # Show first 3
             print(f"Subject: {row['subject_line']}")
             print(f"Sender: {row['sender_email']}")
-            print(f"Body: {row['body_preview'][:150]}...")
+            show_body(row, 150)
             print()
 
 print(f"\n2. INVESTIGATING UNKNOWN COMPANY RECORDS BY DOMAIN:")
@@ -40,7 +52,7 @@ for domain in domains:
         for i, row in domain_records.head(3).iterrows():  # Show first 3
             print(f"Subject: {row['subject_line']}")
             print(f"Sender: {row['sender_email']}")
-            print(f"Body: {row['body_preview'][:150]}...")
+            show_body(row, 150)
             print()
 
 print(f"\n3. INVESTIGATING VERY SHORT COMPANY NAMES:")
@@ -52,7 +64,7 @@ if len(short_names) > 0:
         records = df[df['company_name'] == company]
         for i, row in records.head(2).iterrows():  # Show first 2
             print(f"Subject: {row['subject_line']}")
-            print(f"Body: {row['body_preview'][:100]}...")
+            show_body(row, 100)
 
 print(f"\n4. INVESTIGATING COMPANIES THAT LOOK LIKE JOB TITLES:")
 job_title_companies = [
@@ -69,14 +81,14 @@ if len(actual_job_titles) > 0:
             print(f"\n--- '{company}' ({len(records)} emails) ---")
             for i, row in records.head(2).iterrows():
                 print(f"Subject: {row['subject_line']}")
-                print(f"Body: {row['body_preview'][:120]}...")
+                show_body(row, 120)
 
 print(f"\n5. RANDOM SAMPLE OF UNKNOWN RECORDS:")
 unknown_sample = unknown_records.sample(min(5, len(unknown_records)))
 for i, row in unknown_sample.iterrows():
     print(f"\nSubject: {row['subject_line']}")
     print(f"Sender: {row['sender_email']}")
-    print(f"Body: {row['body_preview'][:150]}...")
+    show_body(row, 150)
 
 print(f"\n🎯 INVESTIGATION COMPLETE!")
 print(f"Total unknown companies: {len(unknown_records)}")
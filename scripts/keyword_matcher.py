@@ -0,0 +1,92 @@
+from collections import deque
+
+try:
+    import ahocorasick  # pyahocorasick - optional C implementation
+except ImportError:
+    ahocorasick = None
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over a keyword dictionary
+
+    One pass over the text reports every keyword occurrence, so lookups stay
+    linear in the text length however large the dictionary grows. Keywords
+    keep their dictionary order (index) so callers can resolve precedence.
+    Uses pyahocorasick when it is installed, otherwise a pure Python build.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(dict.fromkeys(keywords))
+        self.index = {keyword: i for i, keyword in enumerate(self.keywords)}
+        self.automaton = None
+        if ahocorasick is not None and self.keywords:
+            self.automaton = ahocorasick.Automaton()
+            for i, keyword in enumerate(self.keywords):
+                self.automaton.add_word(keyword, i)
+            self.automaton.make_automaton()
+        else:
+            self._build()
+
+    def _build(self):
+        goto = [{}]
+        outputs = [[]]
+        for i, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(i)
+
+        # Breadth-first failure links; each state inherits its fallback's outputs
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                outputs[next_state] = outputs[next_state] + outputs[fail[next_state]]
+
+        self.goto = goto
+        self.fail = fail
+        self.outputs = outputs
+
+    def iter_hits(self, text):
+        """Yield (end_position, keyword_index) for every occurrence in the text"""
+        if not self.keywords:
+            return
+        if self.automaton is not None:
+            yield from self.automaton.iter(text)
+            return
+
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for i in outputs[state]:
+                yield position, i
+
+    def matched(self, text):
+        """Set of keyword indexes found anywhere in the text"""
+        return {i for _, i in self.iter_hits(text)}
+
+    def contains_any(self, text):
+        return next(self.iter_hits(text), None) is not None
+
+    def first_keyword(self, text):
+        """Earliest keyword in dictionary order that occurs in the text, or None"""
+        found = self.matched(text)
+        return self.keywords[min(found)] if found else None
+
+    def longest_hit(self, text):
+        """Length of the longest keyword occurring in the text (0 when none)"""
+        return max((len(self.keywords[i]) for _, i in self.iter_hits(text)), default=0)
\ No newline at end of file
@@ -0,0 +1,114 @@
+import mmap
+import os
+from email import message_from_bytes
+
+# Every message in an mbox starts with a "From " separator line (RFC 4155)
+FROM_SEPARATOR = b'From '
+SEPARATOR_SEARCH = b'\nFrom '
+
+
+def iter_raw_messages(mbox_path, start=0, end=None):
+    """Yield (offset, raw_bytes) for each message, splitting on From lines"""
+    with open(mbox_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        end = size if end is None else min(end, size)
+
+        # mmap keeps memory flat: pages are file-backed and the OS can drop them
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = start
+            # Skip any junk before the first separator of this range
+            if mm[pos:pos + len(FROM_SEPARATOR)] != FROM_SEPARATOR:
+                found = mm.find(SEPARATOR_SEARCH, pos, end)
+                if found == -1:
+                    return
+                pos = found + 1
+
+            while pos < end:
+                found = mm.find(SEPARATOR_SEARCH, pos, end)
+                next_pos = end if found == -1 else found + 1
+                yield pos, mm[pos:next_pos]
+                pos = next_pos
+
+
+def parse_message(raw):
+    """Parse raw mbox bytes into an email.message.Message (From line stripped)"""
+    unixfrom = None
+    if raw.startswith(FROM_SEPARATOR):
+        line_end = raw.find(b'\n')
+        if line_end == -1:
+            line_end = len(raw)
+        unixfrom = raw[:line_end].rstrip(b'\r').decode('latin-1')
+        raw = raw[line_end + 1:]
+
+    # The blank line before the next separator belongs to the mbox, not the message
+    if raw.endswith(b'\r\n\r\n'):
+        raw = raw[:-2]
+    elif raw.endswith(b'\n\n'):
+        raw = raw[:-1]
+
+    message = message_from_bytes(raw)
+    if unixfrom:
+        message.set_unixfrom(unixfrom)
+    return message
+
+
+class MboxReader:
+    """Streaming replacement for mailbox.mbox - no up-front indexing pass
+
+    Iterating yields parsed messages lazily. The number of messages seen so
+    far is available as `count` (the total once iteration has finished), and
+    `offset`/`length` describe where the current message sits in the file.
+    """
+
+    def __init__(self, mbox_path, start=0, end=None):
+        self.mbox_path = mbox_path
+        self.start = start
+        self.end = end
+        self.count = 0
+        self.offset = None
+        self.length = None
+
+    def iter_raw(self):
+        """Yield (offset, raw_bytes) for each message, updating the counters"""
+        for offset, raw in iter_raw_messages(self.mbox_path, self.start, self.end):
+            self.count += 1
+            self.offset = offset
+            self.length = len(raw)
+            yield offset, raw
+
+    def __iter__(self):
+        for _, raw in self.iter_raw():
+            yield parse_message(raw)
+
+
+def read_range(mbox_path, offset, length):
+    """Bytes at [offset, offset + length) of an mbox - one mmap slice, no scanning"""
+    with open(mbox_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[offset:offset + length]
+
+def iter_mbox(mbox_path, start=0, end=None):
+    """Convenience generator over the parsed messages of an mbox file"""
+    return iter(MboxReader(mbox_path, start, end))
+
+def find_shard_ranges(mbox_path, shards):
+    """Split an mbox into up to `shards` (start, end) byte ranges on From boundaries"""
+    size = os.path.getsize(mbox_path)
+    if size == 0:
+        return []
+
+    boundaries = [0]
+    with open(mbox_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i in range(1, max(1, shards)):
+                target = max(size * i // shards, boundaries[-1])
+                found = mm.find(SEPARATOR_SEARCH, max(target - 1, 0))
+                if found == -1:
+                    break
+                if found + 1 > boundaries[-1]:
+                    boundaries.append(found + 1)
+    boundaries.append(size)
+
+    return list(zip(boundaries[:-1], boundaries[1:]))
\ No newline at end of file
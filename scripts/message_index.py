@@ -0,0 +1,121 @@
+import os
+import sqlite3
+from functools import lru_cache
+from body_extraction import scan_message
+from ingestion_ledger import content_hash, ledger_key
+from mbox_reader import read_range
+
+DEFAULT_INDEX_PATH = 'processed_data/message_index.sqlite'
+INDEX_PATH = os.environ.get('MESSAGE_INDEX_PATH', DEFAULT_INDEX_PATH)  # empty string skips the index
+
+def row_keys(row):
+    """(ledger key, content hash) of a dataset row - a dict or a DataFrame row
+
+    Rows of older datasets without a message_id column are found by the
+    hash of their content fields, which the stages leave untouched.
+    """
+    hash_value = content_hash(row)
+    return ledger_key(row.get('message_id'), hash_value), hash_value
+
+class MessageIndex:
+    """On-disk message -> (mbox_path, offset, length) sidecar of the extracted datasets
+
+    Written by the extraction pass, so any row of processed_data can be
+    taken back to its raw message with one key lookup and one mmap slice
+    instead of a scan of the mbox. Entries are keyed like the ingestion
+    ledger (Message-ID, else content hash) rather than by email_id, which
+    is only a position in one extraction run.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS locations (
+                ledger_key TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                email_id TEXT,
+                extraction_date TEXT,
+                mbox_path TEXT NOT NULL,
+                mbox_offset INTEGER NOT NULL,
+                mbox_length INTEGER NOT NULL
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS locations_content_hash ON locations (content_hash)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, df):
+        """Record where every row of an extracted DataFrame sits in its mbox
+
+        Uses the ledger_key / content_hash columns when the rows already
+        carry them (ledger deltas), otherwise computes them.
+        """
+        records = df.to_dict('records')
+        if 'ledger_key' in df.columns and 'content_hash' in df.columns:
+            keys = list(zip(df['ledger_key'], df['content_hash']))
+        else:
+            keys = [row_keys(record) for record in records]
+        rows = [(key, hash_value, str(record.get('email_id')), str(record.get('extraction_date') or ''),
+                 os.path.abspath(record['mbox_path']), int(record['mbox_offset']), int(record['mbox_length']))
+                for (key, hash_value), record in zip(keys, records)]
+        self.conn.executemany("""
+            INSERT INTO locations (ledger_key, content_hash, email_id, extraction_date,
+                                   mbox_path, mbox_offset, mbox_length)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(ledger_key) DO UPDATE SET
+                content_hash = excluded.content_hash,
+                email_id = excluded.email_id,
+                extraction_date = excluded.extraction_date,
+                mbox_path = excluded.mbox_path,
+                mbox_offset = excluded.mbox_offset,
+                mbox_length = excluded.mbox_length""", rows)
+        self.conn.commit()
+        return len(rows)
+
+    def locate(self, row):
+        """(mbox_path, offset, length) of a dataset row's message, or None when it is not indexed"""
+        key, hash_value = row_keys(row)
+        found = self.conn.execute(
+            "SELECT mbox_path, mbox_offset, mbox_length FROM locations WHERE ledger_key = ?", (key,)).fetchone()
+        if found is None:
+            found = self.conn.execute(
+                "SELECT mbox_path, mbox_offset, mbox_length FROM locations WHERE content_hash = ? LIMIT 1",
+                (hash_value,)).fetchone()
+        return found
+
+    def get_raw_message(self, row):
+        """Raw mbox bytes of a row's message (From line included), or None"""
+        location = self.locate(row)
+        if location is None or not os.path.exists(location[0]):
+            return None
+        return read_range(*location)
+
+@lru_cache(maxsize=None)
+def open_index(path=INDEX_PATH):
+    """Shared read connection to a saved index (None when there is none)"""
+    if not path or not os.path.exists(path):
+        return None
+    return MessageIndex(path)
+
+def get_raw_message(row, path=INDEX_PATH):
+    """Raw mbox bytes of a dataset row's message, or None when it cannot be found"""
+    index = open_index(path)
+    return index.get_raw_message(row) if index is not None else None
+
+def get_message_body(row, path=INDEX_PATH):
+    """Full decoded body text of a dataset row's message, or None when it cannot be found"""
+    raw = get_raw_message(row, path)
+    if raw is None:
+        return None
+    return scan_message(raw, limit=None)[1]
\ No newline at end of file
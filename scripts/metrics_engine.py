@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+from instrumentation import stage
+from keyword_matcher import KeywordMatcher
+
+# Business rules shared by every metric column (see docs/data_schema.md)
+CLOSED_STATUSES = ['rejected', 'offer', 'withdrawn']
+ACTIVE_STATUSES = ['applied', 'interview_scheduled', 'follow_up']
+RESPONDED_STATUSES = ['applied', 'interview_scheduled', 'offer']
+
+STATUS_WEIGHTS = {
+    'interview_scheduled': 40,
+    'offer': 50,
+    'applied': 20,
+    'follow_up': 15,
+    'on_hold': -10,
+    'rejected': -50,
+    'unknown': 0
+}
+
+OPPORTUNITY_KEYWORDS = [
+    # (opportunity type, field, keywords) - first matching rule wins
+    ('direct_application', 'subject_line', ['application', 'applied', 'thank you for applying']),
+    ('recruiter_outreach', 'sender_email', ['recruiting', 'talent', 'hr']),
+    ('recruiter_outreach', 'subject_line', ['opportunity', 'role for you', 'interested in']),
+    ('interview_process', 'subject_line', ['interview']),
+    ('follow_up', 'subject_line', ['update', 'follow', 'checking', 're:']),
+    ('networking', 'subject_line', ['connection', 'networking', 'coffee', 'chat']),
+]
+
+# One automaton per field covering every rule's keywords
+OPPORTUNITY_MATCHERS = {
+    field: KeywordMatcher(word for _, rule_field, keywords in OPPORTUNITY_KEYWORDS
+                          if rule_field == field for word in keywords)
+    for field in dict.fromkeys(field for _, field, _ in OPPORTUNITY_KEYWORDS)
+}
+
+PRIORITY_LEVELS = [(80, 'Critical'), (65, 'High'), (50, 'Medium'), (35, 'Low')]
+
+def _column(df, name, default=np.nan):
+    """Column as a Series, or a constant Series when the dataset lacks it"""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(default, index=df.index)
+
+def _numeric(df, name, default=np.nan):
+    """Column as floats, so nullable Int64 columns from typed datasets compare like NaN"""
+    return pd.to_numeric(_column(df, name, default), errors='coerce').astype('float64')
+
+def _parse_single_date(value):
+    """Per-value fallback matching calculate_days_between's parsing"""
+    try:
+        parsed = pd.to_datetime(value)
+    except Exception:
+        return pd.NaT
+    # Timezone-aware dates cannot be compared with the naive analysis date
+    if parsed is pd.NaT or getattr(parsed, 'tzinfo', None) is not None:
+        return pd.NaT
+    return parsed
+
+def parse_email_dates(values):
+    """Parse email_date once for the whole column (NaT where unparseable)"""
+    try:
+        # Fast path for the extractor's ISO timestamps, then the odd formats
+        parsed = pd.to_datetime(values, errors='coerce', format='ISO8601')
+        retry = parsed.isna() & values.notna()
+        if retry.any():
+            parsed[retry] = pd.to_datetime(values[retry], errors='coerce', format='mixed')
+    except (ValueError, TypeError):
+        # Mixed timezones - parse each distinct value on its own
+        uniques = pd.unique(values.dropna())
+        lookup = {value: _parse_single_date(value) for value in uniques}
+        return pd.to_datetime(values.map(lookup), errors='coerce')
+
+    if isinstance(parsed.dtype, pd.DatetimeTZDtype):
+        return pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    return parsed
+
+def days_since(dates, current_date):
+    """Whole days between each date and the analysis date (NaN when unknown)"""
+    return (pd.Timestamp(current_date) - dates).dt.days
+
+def classify_pipeline_status(df, days_since_contact):
+    """Business rule for pipeline health classification"""
+    status = _column(df, 'status')
+    active = status.isin(ACTIVE_STATUSES)
+    conditions = [
+        days_since_contact.isna(),
+        status.isin(CLOSED_STATUSES),
+        active & (days_since_contact <= 7),
+        active & (days_since_contact <= 14),
+        active & (days_since_contact <= 21),
+        active & (days_since_contact <= 30),
+        active,
+    ]
+    choices = ['unknown_timeline', 'closed', 'hot', 'warm', 'cooling', 'cold', 'ghosted']
+    return pd.Series(np.select(conditions, choices, default='unknown_status'), index=df.index)
+
+def calculate_priority_score(df, days_since_contact):
+    """Calculate priority score for follow-up (1-100)"""
+    score = np.full(len(df), 50, dtype=np.int64)
+
+    # Status impact
+    score += _column(df, 'status').astype(object).map(STATUS_WEIGHTS).fillna(0).astype(np.int64).to_numpy()
+
+    # Confidence impact
+    confidence = _numeric(df, 'status_confidence')
+    score += np.select([confidence >= 80, confidence >= 60, confidence.notna()], [15, 5, -10], default=0)
+
+    # Recency impact (based on email_date)
+    score += np.select(
+        [days_since_contact <= 3, days_since_contact <= 7, days_since_contact <= 14,
+         days_since_contact <= 21, days_since_contact.notna()],
+        [20, 10, 0, -10, -20], default=0)
+
+    # Company known/unknown impact
+    score += np.where(_column(df, 'company_name', None).isin(['Unknown Company', '']), 0, 10)
+
+    # Role clarity impact
+    score += np.where(_column(df, 'role_title', None).isin(['Unknown Role', '']), 0, 10)
+
+    # Thread engagement (more emails = more engagement)
+    thread_count = _numeric(df, 'thread_email_count', 1)
+    score += np.select([thread_count > 3, thread_count > 1], [15, 5], default=0)
+
+    return pd.Series(np.clip(score, 0, 100), index=df.index)  # Bound between 0-100
+
+def calculate_response_metrics(df):
+    """Calculate response time and patterns"""
+    thread_count = _numeric(df, 'thread_email_count', 1)
+    status = _column(df, 'status')
+    conditions = [
+        thread_count > 1,
+        status.isin(RESPONDED_STATUSES),
+        status == 'rejected',
+    ]
+    choices = ['multi_exchange', 'responded', 'responded_negative']
+    return pd.Series(np.select(conditions, choices, default='no_response'), index=df.index)
+
+def _lower_text(df, name):
+    """Lower-cased distinct values of a text column plus the codes to expand them"""
+    codes, uniques = pd.factorize(_column(df, name, '').fillna('').astype(str))
+    return codes, pd.Series(uniques).str.lower()
+
+def classify_opportunity_type(df):
+    """Classify the type of opportunity"""
+    fields = {}
+    conditions = []
+    choices = []
+    for opportunity_type, field, keywords in OPPORTUNITY_KEYWORDS:
+        if field not in fields:
+            # One automaton pass per distinct subject/sender finds every keyword
+            codes, uniques = _lower_text(df, field)
+            matcher = OPPORTUNITY_MATCHERS[field]
+            fields[field] = codes, matcher, [matcher.matched(text) for text in uniques]
+        codes, matcher, hits = fields[field]
+        rule_keywords = {matcher.index[word] for word in keywords}
+        matches = np.array([not rule_keywords.isdisjoint(found) for found in hits], dtype=bool)
+        # Expand the per-value result to every row
+        conditions.append(matches[codes])
+        choices.append(opportunity_type)
+    return pd.Series(np.select(conditions, choices, default='other'), index=df.index)
+
+def assign_priority_level(priority_score):
+    """Map 0-100 priority scores to business priority levels"""
+    conditions = [priority_score >= threshold for threshold, _ in PRIORITY_LEVELS]
+    choices = [level for _, level in PRIORITY_LEVELS]
+    return pd.Series(np.select(conditions, choices, default='Inactive'), index=priority_score.index)
+
+def recommend_action(pipeline_status, status):
+    """Suggested next step for each opportunity"""
+    conditions = [
+        pipeline_status == 'closed',
+        pipeline_status == 'ghosted',
+        (pipeline_status == 'hot') & (status == 'interview_scheduled'),
+        (pipeline_status == 'cooling') & status.isin(['applied', 'follow_up']),
+        pipeline_status == 'cold',
+        pipeline_status.isin(['warm', 'hot']),
+    ]
+    choices = [
+        'No action needed',
+        'Send follow-up or mark inactive',
+        'Prepare for interview',
+        'Send polite follow-up',
+        'Final follow-up attempt',
+        'Monitor - no action needed',
+    ]
+    return pd.Series(np.select(conditions, choices, default='Review status'), index=pipeline_status.index)
+
+def add_metric_columns(df, current_date):
+    """Compute every per-row business metric column in whole-column passes"""
+    with stage('Date parsing', df):
+        dates = parse_email_dates(_column(df, 'email_date'))
+        days_since_contact = days_since(dates, current_date)
+
+    with stage('Pipeline status', df):
+        df['pipeline_status'] = classify_pipeline_status(df, days_since_contact)
+        df['days_since_contact'] = days_since_contact
+    with stage('Priority scoring', df):
+        df['priority_score'] = calculate_priority_score(df, days_since_contact)
+    with stage('Response patterns', df):
+        df['response_type'] = calculate_response_metrics(df)
+    with stage('Opportunity classification', df):
+        df['opportunity_type'] = classify_opportunity_type(df)
+    with stage('Priority levels', df):
+        df['priority_level'] = assign_priority_level(df['priority_score'])
+    with stage('Follow-up recommendations', df):
+        df['recommended_action'] = recommend_action(df['pipeline_status'], _column(df, 'status'))
+    return df
\ No newline at end of file
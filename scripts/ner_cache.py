@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+DEFAULT_CACHE_PATH = 'processed_data/ner_cache.sqlite'
+
+# Entries kept before the least recently used ones are evicted
+MAX_ENTRIES = int(os.environ.get('NER_CACHE_MAX_ENTRIES', '200000'))
+
+# SQLite limits the number of bound parameters per statement
+LOOKUP_CHUNK = 500
+
+def cache_key(model_name, model_version, text):
+    """Content address of one NER call: the model that ran and the exact text"""
+    digest = hashlib.sha256()
+    for part in (model_name, model_version, text):
+        digest.update(str(part).encode('utf-8', errors='surrogatepass'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+class NerCache:
+    """On-disk ORG entity results keyed by cache_key(), with LRU eviction"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entities (
+                key TEXT PRIMARY KEY,
+                orgs TEXT NOT NULL,
+                last_used INTEGER NOT NULL
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entities_last_used ON entities (last_used)")
+        self.conn.commit()
+        row = self.conn.execute("SELECT MAX(last_used) FROM entities").fetchone()
+        self.clock = row[0] or 0
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _tick(self):
+        self.clock += 1
+        return self.clock
+
+    def get_many(self, keys):
+        """Return {key: [orgs]} for the keys already cached, refreshing their recency"""
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        for i in range(0, len(keys), LOOKUP_CHUNK):
+            chunk = keys[i:i + LOOKUP_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT key, orgs FROM entities WHERE key IN ({placeholders})", chunk)
+            for key, orgs in rows:
+                found[key] = json.loads(orgs)
+
+        if found:
+            now = self._tick()
+            self.conn.executemany("UPDATE entities SET last_used = ? WHERE key = ?",
+                                  [(now, key) for key in found])
+            self.conn.commit()
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Store (key, orgs) pairs, then evict down to max_entries"""
+        now = self._tick()
+        self.conn.executemany("""
+            INSERT INTO entities (key, orgs, last_used) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET orgs = excluded.orgs, last_used = excluded.last_used""",
+            [(key, json.dumps(orgs), now) for key, orgs in items])
+        self.evict()
+        self.conn.commit()
+
+    def evict(self):
+        """Drop the least recently used entries beyond max_entries"""
+        if not self.max_entries:
+            return 0
+        count = self.conn.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        self.conn.execute("""
+            DELETE FROM entities WHERE key IN (
+                SELECT key FROM entities ORDER BY last_used LIMIT ?)""", (excess,))
+        return excess
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
\ No newline at end of file
@@ -0,0 +1,352 @@
+import atexit
+import os
+import secrets
+import sys
+import threading
+from importlib import metadata
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from instrumentation import count, stage
+from ner_cache import DEFAULT_CACHE_PATH, NerCache, cache_key
+
+MODEL_NAME = "en_core_web_sm"
+
+# Texts per nlp.pipe batch and worker processes (NER_PROCESSES=4 for multicore)
+BATCH_SIZE = 256
+N_PROCESS = int(os.environ.get('NER_PROCESSES', '1'))
+
+# Results are reused across runs from this cache (NER_CACHE_PATH= disables it)
+CACHE_PATH = os.environ.get('NER_CACHE_PATH', DEFAULT_CACHE_PATH)
+
+# A warm server (python ner_service.py --serve) keeps the model loaded between runs;
+# NER_SERVER=host:port sends uncached texts there instead of loading spaCy in every run
+SERVER_ADDRESS = os.environ.get('NER_SERVER', '')
+DEFAULT_SERVER_ADDRESS = 'localhost:6011'
+
+# multiprocessing.connection unpickles what it receives, so only key holders may connect:
+# NER_SERVER_KEY, else a random key the server writes to this owner-only file
+SERVER_KEY = os.environ.get('NER_SERVER_KEY', '')
+SERVER_KEY_PATH = os.environ.get('NER_SERVER_KEY_FILE', 'processed_data/ner_server.key')
+
+# Seconds a run waits to connect and authenticate before loading spaCy itself
+CONNECT_TIMEOUT = float(os.environ.get('NER_SERVER_TIMEOUT', '5'))
+
+_cache = None
+_server = None
+_server_failed = False
+
+def _components_for_ner(model):
+    """Pipeline components the entity recognizer needs (itself plus any shared tok2vec)"""
+    keep = {'ner'}
+    for name, component in model.pipeline:
+        if 'ner' in getattr(component, 'listening_components', []):
+            keep.add(name)
+    return keep
+
+def model_version(model):
+    """Name and version pair identifying which model produced cached results"""
+    meta = model.meta
+    return f"{meta.get('lang', '')}_{meta.get('name', MODEL_NAME)}", meta.get('version', '')
+
+class LazyModel:
+    """Stand-in for the spaCy model that only loads it on first real use
+
+    Cache keys need just the model's name and version, which the installed
+    package metadata provides, so runs where the regex rules or the NER
+    cache resolve every row never pay for spacy.load(). Attribute access
+    (pipe, meta, pipe_names...) loads the model and forwards to it.
+    """
+
+    def __init__(self, name=MODEL_NAME):
+        self.name = name
+        self.model = None
+        self.load_attempted = False
+        self._version = None
+
+    def load(self):
+        """Load the model once, with every component except NER disabled (None if missing)"""
+        if self.load_attempted:
+            return self.model
+        self.load_attempted = True
+
+        with stage('Loading spaCy model'):
+            try:
+                import spacy
+                model = spacy.load(self.name)
+                keep = _components_for_ner(model)
+                model.select_pipes(disable=[name for name in model.pipe_names if name not in keep])
+                self.model = model
+                print(f"✅ spaCy language model loaded (NER only: {', '.join(model.pipe_names)})")
+            except Exception:
+                print("❌ spaCy model not found - using pattern matching only")
+                self.model = None
+        return self.model
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    def version(self):
+        """(name, version) of the model, from package metadata when it is installed as one"""
+        if self._version is None:
+            try:
+                self._version = self.name, metadata.version(self.name)
+            except metadata.PackageNotFoundError:
+                # Loaded from a path rather than a package - only the model itself knows
+                model = self.load()
+                if model is None:
+                    return None
+                self._version = model_version(model)
+        return self._version
+
+    def __getattr__(self, attr):
+        model = self.load()
+        if model is None:
+            raise AttributeError(f"spaCy model {self.name} is not available")
+        return getattr(model, attr)
+
+# One shared model per process: every cleanup stage run in this process reuses it
+nlp = LazyModel()
+
+def load_model():
+    """The loaded spaCy model (None when unavailable) - loads it now if it has not been yet"""
+    return nlp.load()
+
+def parse_address(address):
+    """'host:port' -> (host, port) for TCP; anything else is a Unix socket path"""
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+def server_authkey(create=False):
+    """Key shared by the NER server and its clients (None when there is none)
+
+    NER_SERVER_KEY wins; otherwise the key file is read, or - for the
+    server, with create - a random key is generated into it, readable by
+    its owner only.
+    """
+    if SERVER_KEY:
+        return SERVER_KEY.encode('utf-8')
+    try:
+        with open(SERVER_KEY_PATH, 'rb') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        if not create:
+            return None
+    directory = os.path.dirname(SERVER_KEY_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    key = secrets.token_hex(32).encode('ascii')
+    fd = os.open(SERVER_KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    print(f"🔑 New NER server key → {SERVER_KEY_PATH}")
+    return key
+
+def connect(address, authkey, timeout=CONNECT_TIMEOUT):
+    """Client() with a time limit on connecting and the auth handshake
+
+    Client() itself has no timeout, so it runs in a helper thread; a busy
+    or stuck server raises TimeoutError instead of holding the run up.
+    """
+    result = {}
+
+    def attempt():
+        try:
+            result['conn'] = Client(address, authkey=authkey)
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=attempt, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if 'error' in result:
+        raise result['error']
+    if 'conn' not in result:
+        raise TimeoutError(f"no answer within {timeout:g}s")
+    return result['conn']
+
+def server_connection():
+    """Connection to the warm NER server, or None when none is configured or reachable"""
+    global _server, _server_failed
+    if _server is None and SERVER_ADDRESS and not _server_failed:
+        authkey = server_authkey()
+        if authkey is None:
+            print(f"⚠️  No NER server key (NER_SERVER_KEY or {SERVER_KEY_PATH}) - loading spaCy locally")
+            _server_failed = True
+            return None
+        try:
+            _server = connect(parse_address(SERVER_ADDRESS), authkey)
+            print(f"🔥 Using warm NER server at {SERVER_ADDRESS}")
+        except (OSError, EOFError, AuthenticationError) as e:
+            print(f"⚠️  NER server {SERVER_ADDRESS} unreachable ({e}) - loading spaCy locally")
+            _server_failed = True
+    return _server
+
+@atexit.register
+def close_server_connection():
+    """Hang up on the NER server so it can drop this client's thread"""
+    global _server
+    if _server is not None:
+        _server.close()
+        _server = None
+
+def _ask_server(*request):
+    """Send one request to the NER server; None (and local fallback from then on) if it went away"""
+    global _server, _server_failed
+    conn = server_connection()
+    if conn is None:
+        return None
+    try:
+        conn.send(request)
+        return conn.recv()
+    except (OSError, EOFError):
+        print("⚠️  Lost the NER server connection - loading spaCy locally")
+        conn.close()
+        _server, _server_failed = None, True
+        return None
+
+def get_cache():
+    """Open the shared NER cache on first use (None when caching is disabled)"""
+    global _cache
+    if _cache is None and CACHE_PATH:
+        _cache = NerCache(CACHE_PATH)
+    return _cache
+
+def _run_model(model, texts, batch_size, n_process):
+    count('nlp_pipe_calls')
+    count('nlp_texts', len(texts))
+    results = []
+    for doc in model.pipe(texts, batch_size=batch_size, n_process=n_process):
+        results.append([ent.text for ent in doc.ents if ent.label_ == "ORG"])
+    return results
+
+def _find_orgs(texts, batch_size, n_process):
+    """Run NER on texts - on the warm server when there is one, else on the local model
+
+    Returns None when neither is available.
+    """
+    orgs = _ask_server('orgs', texts, batch_size)
+    if orgs is not None:
+        count('ner_server_texts', len(texts))
+        return orgs
+    model = load_model()
+    if model is None:
+        return None
+    return _run_model(model, texts, batch_size, n_process)
+
+def _cache_version():
+    """(name, version) the cache keys are built from, without loading the model if possible"""
+    version = _ask_server('version')
+    if version is not None:
+        return tuple(version)
+    return nlp.version()
+
+def org_entities(texts, batch_size=BATCH_SIZE, n_process=N_PROCESS):
+    """ORG entity texts for each input text, in input order ([] without a model)
+
+    Each distinct text is looked up in the on-disk cache first, so only
+    texts never seen by this model version reach nlp.pipe - and the model
+    itself is only loaded once such a text turns up.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+
+    cache = get_cache()
+    version = _cache_version() if cache is not None else None
+    if version is None:
+        orgs = _find_orgs(texts, batch_size, n_process)
+        return orgs if orgs is not None else [[] for _ in texts]
+
+    name, version = version
+    keys = [cache_key(name, version, text) for text in texts]
+    found = cache.get_many(keys)
+    cached = sum(key in found for key in keys)
+    count('ner_cache_hits', cached)
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+    if missing:
+        orgs = _find_orgs(list(missing.values()), batch_size, n_process)
+        if orgs is None:
+            # The package is installed but the model would not load - nothing worth caching
+            return [found.get(key, []) for key in keys]
+        new_entries = list(zip(missing.keys(), orgs))
+        cache.put_many(new_entries)
+        found.update(new_entries)
+
+    print(f"   NER cache: {cached} of {len(texts)} texts reused, {len(missing)} sent to spaCy")
+    return [found[key] for key in keys]
+
+def batch_resolve(items, rules, ner_text, finish, batch_size=BATCH_SIZE, n_process=N_PROCESS):
+    """Resolve items with the regex rules first, then one batched NER pass for the rest
+
+    rules(item) returns a result or None when it cannot decide, ner_text(item)
+    builds the text the model should read, and finish(item, orgs) turns the
+    item's ORG entities into the final result.
+    """
+    results = [rules(item) for item in items]
+    pending = [i for i, result in enumerate(results) if result is None]
+    if pending:
+        orgs = org_entities([ner_text(items[i]) for i in pending], batch_size, n_process)
+        for i, entities in zip(pending, orgs):
+            results[i] = finish(items[i], entities)
+    return results
+
+def _serve_client(conn, model, version, model_lock):
+    """Answer one client's requests until it hangs up"""
+    with conn:
+        texts_served = 0
+        while True:
+            try:
+                request = conn.recv()
+            except (OSError, EOFError):
+                break
+            if request[0] == 'version':
+                conn.send(version)
+            elif request[0] == 'orgs':
+                texts, batch_size = request[1], request[2]
+                with model_lock:
+                    orgs = _run_model(model, texts, batch_size, N_PROCESS)
+                conn.send(orgs)
+                texts_served += len(texts)
+        print(f"   Client done: {texts_served} texts")
+
+def serve(address=DEFAULT_SERVER_ADDRESS, authkey=None):
+    """Keep the model loaded and answer NER requests from pipeline runs until interrupted
+
+    Requests are ('version',) and ('orgs', texts, batch_size); clients keep
+    their own NER cache, so the server only ever sees uncached texts. Each
+    client gets its own thread, so a resident daemon holding a connection
+    does not lock other runs out; model calls still run one at a time.
+    """
+    authkey = authkey or server_authkey(create=True)
+    model = load_model()
+    if model is None:
+        raise SystemExit("❌ Cannot serve NER without the spaCy model")
+    version = nlp.version()
+    model_lock = threading.Lock()
+
+    with Listener(parse_address(address), authkey=authkey) as listener:
+        print(f"🔥 NER server ready on {address} ({version[0]} {version[1]}) - Ctrl+C to stop")
+        while True:
+            try:
+                conn = listener.accept()
+            except KeyboardInterrupt:
+                break
+            except (OSError, EOFError, AuthenticationError) as e:  # bad authkey, aborted handshake
+                print(f"⚠️  Rejected NER client: {e}")
+                continue
+            threading.Thread(target=_serve_client, args=(conn, model, version, model_lock), daemon=True).start()
+    print("👋 NER server stopped")
+
+if __name__ == '__main__':
+    # Usage: python ner_service.py --serve [host:port | socket path]
+    args = sys.argv[1:]
+    if not args or args[0] != '--serve':
+        raise SystemExit("Usage: python ner_service.py --serve [host:port]")
+    serve(args[1] if len(args) > 1 else SERVER_ADDRESS or DEFAULT_SERVER_ADDRESS)
\ No newline at end of file
@@ -0,0 +1,231 @@
+import re
+from instrumentation import count
+from keyword_matcher import KeywordMatcher
+
+class PatternSet:
+    """Ordered list of regex rules, compiled once
+
+    The rules are also joined into one alternation that acts as a gate:
+    if the combined scan finds nothing, no single rule can match and the
+    text is rejected in one pass. Otherwise the rules are tried in their
+    listed order, so precedence is exactly that of the original loops (an
+    alternation alone reports the leftmost match, not the first rule).
+    """
+
+    def __init__(self, patterns, flags=0):
+        self.patterns = list(patterns)
+        self.compiled = [re.compile(pattern, flags) for pattern in self.patterns]
+        self.gate = re.compile('|'.join(f'(?:{pattern})' for pattern in self.patterns), flags)
+
+    def matches(self, text):
+        """Yield the first match of each rule that matches, in precedence order"""
+        count('regex_scans')
+        if not self.gate.search(text):
+            return
+        for pattern in self.compiled:
+            match = pattern.search(text)
+            if match:
+                yield match
+
+    def search(self, text):
+        """First match of the highest-priority rule that matches, or None"""
+        return next(self.matches(text), None)
+
+class SubstitutionChain:
+    """Ordered re.sub passes, compiled once
+
+    Each pass runs on the output of the previous one (optionally stripped),
+    just like calling re.sub in a loop. A rule can only start matching after
+    an earlier rule changed the text, so when the gate finds nothing in the
+    input (or its stripped form) every pass would have been a no-op.
+    """
+
+    def __init__(self, patterns, flags=0, replacement='', strip=False):
+        self.patterns = list(patterns)
+        self.compiled = [re.compile(pattern, flags) for pattern in self.patterns]
+        self.gate = re.compile('|'.join(f'(?:{pattern})' for pattern in self.patterns), flags)
+        self.replacement = replacement
+        self.strip = strip
+
+    def apply(self, text):
+        count('regex_scans')
+        if self.strip:
+            stripped = text.strip()
+            if not self.gate.search(text) and (stripped == text or not self.gate.search(stripped)):
+                return stripped
+        elif not self.gate.search(text):
+            return text
+        for pattern in self.compiled:
+            text = pattern.sub(self.replacement, text)
+            if self.strip:
+                text = text.strip()
+        return text
+
+# extract_from_subjects.py - is_obviously_wrong_company
+# Obviously wrong "companies"
+WRONG_COMPANIES = [
+    'jennifer touchton', 'jennifer', 'touchton',  # User's own name
+    'email', 'emails', 'gmail', 'outlook', 'yahoo',  # Email platforms
+    'noreply', 'no-reply', 'donotreply', 'do-not-reply',  # Email artifacts
+    'candidates', 'candidate', 'applicant', 'applicants',  # Generic terms
+    'dear', 'hello', 'hi', 'thanks', 'thank', 'notification',  # Greetings
+    'team', 'recruiting', 'talent', 'hr', 'human resources',  # Generic roles
+    'divthank', 'div', 'span', 'img', 'src',  # HTML artifacts
+    'schemas-microsoft-com', 'xmlns', 'http', 'www',  # XML/HTML
+    'tion powered by icims, the', 'powered by', 'icims',  # ATS artifacts
+    'application', 'apply', 'job', 'position', 'role',  # Job terms
+    'update', 'reminder', 'confirmation', 'receipt'  # Email types
+]
+WRONG_COMPANY_MATCHER = KeywordMatcher(WRONG_COMPANIES)
+
+WRONG_COMPANY_ARTIFACTS = PatternSet([
+    r'^(re|fw|fwd):\s*',  # Email prefixes
+    r'^\d+$',  # Just numbers
+    r'^[^a-zA-Z]*$',  # No letters
+    r'^\s*$',  # Just whitespace
+])
+
+# extract_from_subjects.py - extract_company_from_subject_rules, in precedence order
+# Pattern 1: "Thank you for your interest in [COMPANY]"
+SUBJECT_THANK_PATTERNS = PatternSet([
+    r'(?:thank you for your interest in|interest in)\s+([^,\n!\.]+?)(?:\s*[,!\.]\s*|$)',
+    r'(?:thank you for applying to|applying to)\s+([^,\n!\.]+?)(?:\s*[,!\.]\s*|$)',
+    r'(?:your application to|application to)\s+([^,\n!\.]+?)(?:\s*[,!\.]\s*|$)',
+    r'(?:regarding your|your)\s+([A-Z][a-zA-Z\s&,\.]+?)\s+(?:employment\s+)?application',
+], re.IGNORECASE)
+
+SUBJECT_COMPANY_SUFFIX = re.compile(r'\s*(inc|llc|corp|corporation|company|co\.?)\s*$', re.IGNORECASE)
+
+# Pattern 2: Position at [COMPANY] format
+SUBJECT_POSITION_PATTERNS = PatternSet([
+    r'(?:position|role|opportunity|job)\s+(?:at|with|for)\s+([A-Z][a-zA-Z\s&,\.]+?)(?:\s|$|[,\.])',
+    r'([A-Z][a-zA-Z\s&,\.]+?)\s+(?:position|role|opportunity|job|interview)',
+    r'(?:@|at)\s+([A-Z][a-zA-Z\s&,\.]+?)(?:\s|$|[,\.])',
+], re.IGNORECASE)
+
+# Pattern 3: Company - Position format
+SUBJECT_DASH_PATTERN = re.compile(r'^([A-Z][a-zA-Z\s&,\.]+?)\s*[-–—]\s*')
+
+# Pattern 4: From [COMPANY] format
+SUBJECT_FROM_PATTERNS = PatternSet([
+    r'(?:from|by)\s+([A-Z][a-zA-Z\s&,\.]+?)(?:\s|$|[,\.])',
+    r'^([A-Z][a-zA-Z\s&,\.]+?)\s+(?:team|recruiting|talent|hiring)',
+], re.IGNORECASE)
+
+# extract_from_subjects.py - fix_platform_artifacts
+# Known fixes for platform artifacts, first listed artifact wins
+PLATFORM_FIXES = {
+    'schemas-microsoft-com': 'Microsoft',
+    'ziprecruiter phil': 'ZipRecruiter',
+    'ziprecruiter': 'ZipRecruiter',
+    'applytojob': 'ApplyToJob',
+    'ashbyhq': 'Ashby',
+    'marriotthiring': 'Marriott',
+    'pyramidci': 'Pyramid Consulting',
+    'hiretalent': 'HireTalent',
+    'cdi-careers': 'CDI',
+    'divthank': '',  # Remove this artifact
+}
+PLATFORM_FIX_MATCHER = KeywordMatcher(PLATFORM_FIXES)
+
+PLATFORM_SUFFIXES = SubstitutionChain([
+    r'\s+phil$',  # ZipRecruiter Phil -> ZipRecruiter
+    r'\s+hiring$',  # Company Hiring -> Company
+    r'\s+careers?$',  # Company Careers -> Company
+    r'\s+jobs?$',  # Company Jobs -> Company
+    r'\s+talent$',  # Company Talent -> Company
+], re.IGNORECASE)
+
+# hi_the_cleanup.py - clean_company_name_artifacts
+COMPANY_NAME_ARTIFACTS = SubstitutionChain([
+    r'\s*(logo|hi|dear|hello)\s+jennifer\s*',
+    r'\s*jennifer\s*$',
+    r'\s*hi\s+jennifer\s*$',
+    r'\s*dear\s+jennifer\s*$',
+    r'\s*logo\s*$',
+    r'\s*notification\s*$',
+    r'^\s*(gdpr|thank|thanks|update)\s+',
+    r'\s*team\s*$',
+    r'\s*recruiting\s*$',
+    r'^\s*(the|a|an)\s+',
+    r'\s+(inc|llc|corp|corporation|company|co)\s*$'
+], re.IGNORECASE, strip=True)
+
+# Fallback when the full chain leaves less than two characters
+COMPANY_NAME_GREETINGS = SubstitutionChain([
+    r'\s*(hi|dear|hello)\s+jennifer\s*',
+    r'\s*jennifer\s*$',
+    r'\s*logo\s*$',
+], re.IGNORECASE, strip=True)
+
+# hi_the_cleanup.py - extract_company_by_rules
+# Method 2: Subject line patterns for unknown companies
+UNKNOWN_SUBJECT_PATTERNS = PatternSet([
+    r'(?:from|at|with|@)\s+([A-Z][a-zA-Z\s&,\.]{2,30}?)(?:\s|$|[,\.])',
+    r'([A-Z][a-zA-Z\s&,\.]{2,30}?)\s+(?:team|opportunity|position|role|job)',
+    r'(?:application|interview|position)\s+(?:at|with|for)\s+([A-Z][a-zA-Z\s&,\.]{2,30}?)(?:\s|$)',
+    r'^([A-Z][a-zA-Z\s&,\.]{2,30}?)\s+[-–—]',  # Company - Job Title format
+    r'([A-Z][a-zA-Z\s&,\.]{2,30}?)\s+(?:is\s+)?(?:hiring|looking|seeking)',
+])
+
+# Method 3: Body content analysis
+UNKNOWN_BODY_PATTERNS = PatternSet([
+    r'(?:work|join|at)\s+([A-Z][a-zA-Z\s&,\.]{2,30}?)(?:\s|$|[,\.])',
+    r'([A-Z][a-zA-Z\s&,\.]{2,30}?)\s+(?:is\s+)?(?:excited|pleased|happy)\s+to',
+    r'(?:team\s+at|opportunity\s+at)\s+([A-Z][a-zA-Z\s&,\.]{2,30}?)(?:\s|$)',
+])
+
+# greenhouse_cleanup.py - extract_greenhouse_company_by_rules
+# Pattern 1: "Thank you for applying to [COMPANY]"
+GREENHOUSE_PATTERNS = PatternSet([
+    r'(?:thank you for applying to|application received @|applying to)\s+([^!,\n.]+?)(?:\!|$|,|\.|\.)',
+    r'(?:your application to|interest in)\s+([^!,\n.]+?)(?:\!|$|,|\.|for)',
+    r'(?:opportunity at|role at|position at)\s+([^!,\n.]+?)(?:\!|$|,|\.|\.)',
+    r'(?:@ |at )\s*([A-Z][^!,\n.]{2,25}?)(?:\!|$|,|\.|\.)',
+], re.IGNORECASE)
+
+# ats_extractors.py - content rules for the other ATS platforms, in precedence order
+ATS_COMMON_PATTERNS = [
+    r'(?:thank you for applying to|thanks for applying to|applying to)\s+([^!,\n.]+?)(?:\!|$|,|\.)',
+    r'(?:your application to|application to|application with)\s+([^!,\n.]+?)(?:\!|$|,|\.|\s+for\b)',
+    r'(?:interest in joining|interest in)\s+([^!,\n.]+?)(?:\!|$|,|\.|\s+for\b)',
+    r'(?:opportunity at|role at|position at|career at)\s+([^!,\n.]+?)(?:\!|$|,|\.)',
+]
+ATS_PATTERNS = {
+    'lever': PatternSet(ATS_COMMON_PATTERNS, re.IGNORECASE),
+    'workday': PatternSet(ATS_COMMON_PATTERNS + [
+        r'^([A-Z][^!,\n.]{1,40}?)\s+(?:careers|workday)\b',  # "Acme Careers" sender names
+    ], re.IGNORECASE),
+    'icims': PatternSet(ATS_COMMON_PATTERNS + [
+        r'^([A-Z][^!,\n.]{1,40}?)\s+careers\s*[-–—:]',  # "Acme Careers - Application Received"
+    ], re.IGNORECASE),
+    'bamboohr': PatternSet(ATS_COMMON_PATTERNS + [
+        r'^([A-Z][^!,\n.]{1,40}?)\s+has received your application',
+    ], re.IGNORECASE),
+    'ashby': PatternSet(ATS_COMMON_PATTERNS, re.IGNORECASE),
+}
+
+WHITESPACE = re.compile(r'\s+')
+
+# Name validation checks
+# extract_from_subjects.py - validate_extracted_company
+SUBJECT_FALSE_POSITIVES = frozenset([
+    'thank', 'thanks', 'your', 'our', 'the', 'this', 'that', 'with', 'from',
+    'application', 'position', 'role', 'job', 'opportunity', 'interview',
+    'team', 'hiring', 'recruiting', 'talent', 'employment', 'career',
+    'dear', 'hello', 'hi', 'jennifer', 'regards', 'best', 'sincerely',
+    'email', 'message', 'notification', 'update', 'reminder', 'confirmation',
+    'time', 'work', 'new', 'great', 'excited', 'pleased', 'happy'
+])
+
+# hi_the_cleanup.py - validate_company_name
+UNKNOWN_FALSE_POSITIVES = frozenset([
+    'thank', 'thanks', 'application', 'position', 'role', 'job', 'opportunity',
+    'team', 'interview', 'hiring', 'looking', 'seeking', 'excited', 'pleased',
+    'happy', 'interested', 'received', 'update', 'notification', 'jennifer',
+    'your', 'our', 'the', 'this', 'that', 'with', 'from', 'dear', 'hello',
+    'hi', 'email', 'message', 'sent', 'time', 'work', 'new', 'great'
+])
+
+LETTER_RUN = re.compile(r'[a-zA-Z]{2,}')  # extract_from_subjects.py - validate_extracted_company
+HAS_LETTER = re.compile(r'[a-zA-Z]')  # hi_the_cleanup.py - validate_company_name
\ No newline at end of file
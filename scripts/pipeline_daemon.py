@@ -0,0 +1,263 @@
+import glob
+import os
+import sys
+import time
+import traceback
+import pandas as pd
+from datetime import datetime
+import instrumentation
+import ner_service
+from company_index import INDEX_PATH as COMPANY_INDEX_PATH, CompanyIndex
+from dataset_store import DATASET_FORMAT, OUTPUT_DIR, dataset_path, load_dataset, replace_dataset, resolve_path
+from domain_intelligence import TABLE_PATH as DOMAIN_TABLE_PATH, load_domain_table
+from extract_emails import extract_shard
+from ingestion_ledger import IngestionLedger
+from mbox_reader import FROM_SEPARATOR, read_range
+from message_index import INDEX_PATH as MESSAGE_INDEX_PATH, MessageIndex
+from run_pipeline import pipeline_stages, run_delta
+
+# Folder watched for Takeout .mbox files, new ones or ones with mail appended
+DROP_DIR = os.environ.get('PIPELINE_DROP_DIR', 'extracted_emails/Takeout/Mail')
+POLL_SECONDS = float(os.environ.get('PIPELINE_POLL_SECONDS', '2'))
+
+# Seen messages and per-file read offsets, in one database so they commit together
+STATE_PATH = os.environ.get('PIPELINE_STATE_PATH', 'processed_data/pipeline_daemon.sqlite')
+
+# Fixed output names, replaced in place, so the dashboard always reads the same files
+LIVE_LABEL = 'LIVE'
+LIVE_INPUT_LABEL = 'DAEMON_INPUT'
+LIVE_TIMESTAMP = 'latest'
+
+class MailboxOffsets:
+    """Bytes of each watched mbox already pushed through the pipeline, stored next to the ledger"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS mailboxes (
+                mbox_path TEXT PRIMARY KEY,
+                processed_bytes INTEGER NOT NULL,
+                updated TEXT
+            )""")
+        self.conn.commit()
+
+    def get(self, mbox_path):
+        row = self.conn.execute("SELECT processed_bytes FROM mailboxes WHERE mbox_path = ?",
+                                (mbox_path,)).fetchone()
+        return row[0] if row else 0
+
+    def set_many(self, offsets):
+        """Stage new offsets - they are committed with the ledger's next commit"""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.conn.executemany("""
+            INSERT INTO mailboxes (mbox_path, processed_bytes, updated) VALUES (?, ?, ?)
+            ON CONFLICT(mbox_path) DO UPDATE SET
+                processed_bytes = excluded.processed_bytes,
+                updated = excluded.updated""",
+            [(path, offset, now) for path, offset in offsets.items()])
+
+def unread_range(mbox_path, processed_bytes, size):
+    """(start, end) of the mail in mbox_path not processed yet, or None
+
+    A file that shrank, or whose saved offset no longer lands on a From
+    line, was replaced by a new export and is read again from the start
+    (the ledger drops the messages it has already seen).
+    """
+    if size == processed_bytes:
+        return None
+    if size < processed_bytes:
+        return 0, size
+    if processed_bytes and read_range(mbox_path, processed_bytes, len(FROM_SEPARATOR)) != FROM_SEPARATOR:
+        return 0, size
+    return processed_bytes, size
+
+class PipelineDaemon:
+    """Resident pipeline: watches DROP_DIR and refreshes the LIVE outputs as mail arrives
+
+    The spaCy model, company index, domain table and compiled rules stay
+    loaded between batches (the domain table is re-read only after a
+    rebuild with domain_intelligence.py). The state is every email not
+    yet threaded, as in a DEDUPLICATED checkpoint, next to the LIVE
+    output. Each batch extracts only the appended bytes and folds the new
+    rows in with run_delta(), so only threads are rebuilt beyond the
+    batch, and only when it touches them.
+    """
+
+    def __init__(self, drop_dir=DROP_DIR, base_path=None, output_dir=OUTPUT_DIR, state_path=STATE_PATH):
+        self.drop_dir = drop_dir
+        self.output_dir = output_dir
+        self.ledger = IngestionLedger(state_path)
+        self.offsets = MailboxOffsets(self.ledger.conn)
+        self.file_sizes = {}
+
+        self.input_path = dataset_path(LIVE_INPUT_LABEL, LIVE_TIMESTAMP, output_dir=output_dir)
+        self.output_path = dataset_path(LIVE_LABEL, LIVE_TIMESTAMP, output_dir=output_dir)
+        self.powerbi_path = dataset_path(LIVE_LABEL, LIVE_TIMESTAMP, 'POWERBI', output_dir, 'csv')
+
+        # Emails so far: our own saved input, else the unthreaded dataset we were started from
+        start_path = resolve_path(self.input_path)
+        resumed = os.path.exists(start_path)
+        if not resumed:
+            start_path = base_path
+        self.df = load_dataset(start_path) if start_path else None
+        if self.df is not None and 'thread_email_count' in self.df.columns:
+            self.close()
+            raise ValueError(f"{start_path} is already threaded - start from an extracted dataset or a "
+                             f"DEDUPLICATED checkpoint, whose emails are still one per row")
+        if self.df is not None and len(self.df) > 0:
+            print(f"📊 Starting from {start_path}: {len(self.df)} records")
+            if self.ledger.is_empty():
+                # A new ledger starts from the dataset, so new messages never reuse its ids
+                self.ledger.mark_processed(self.ledger.annotate(self.df))
+
+        # LIVE output the next batch is folded into; a new base goes through every stage once first
+        live_path = resolve_path(self.output_path)
+        self.output = None
+        if resumed and os.path.exists(live_path) and 'content_fingerprint' in self.df.columns:
+            self.output = load_dataset(live_path)
+
+        # Warm state kept for every batch
+        self.company_index = CompanyIndex.load(COMPANY_INDEX_PATH)
+        self.domain_table = None
+        self.domain_table_mtime = None
+        self.refresh_domain_table()
+        if not ner_service.SERVER_ADDRESS:
+            ner_service.load_model()
+
+    def close(self):
+        self.ledger.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def refresh_domain_table(self):
+        """Reload the saved domain table when it was rebuilt since the last batch
+
+        Without a saved table the cleanup stage learns one on every batch,
+        from the LIVE output once there is one.
+        """
+        mtime = os.path.getmtime(DOMAIN_TABLE_PATH) if DOMAIN_TABLE_PATH and os.path.exists(DOMAIN_TABLE_PATH) else None
+        if mtime != self.domain_table_mtime:
+            self.domain_table = load_domain_table() if mtime is not None else None
+            self.domain_table_mtime = mtime
+
+    def pending_ranges(self, wait_for_writes=True):
+        """(mbox_path, start, end) of unread mail in the drop folder
+
+        With wait_for_writes a file is only read once its size is the same
+        as at the previous poll, so a copy or export in progress is not
+        cut off mid-message.
+        """
+        ranges = []
+        for mbox_path in sorted(glob.glob(os.path.join(self.drop_dir, '**', '*.mbox'), recursive=True)):
+            mbox_path = os.path.abspath(mbox_path)
+            size = os.path.getsize(mbox_path)
+            settled = self.file_sizes.get(mbox_path) == size
+            self.file_sizes[mbox_path] = size
+            if wait_for_writes and not settled:
+                continue
+            unread = unread_range(mbox_path, self.offsets.get(mbox_path), size)
+            if unread is not None:
+                ranges.append((mbox_path, *unread))
+        return ranges
+
+    def process(self, ranges):
+        """Push the mail in `ranges` through extraction and the stages, then replace the LIVE outputs"""
+        report = instrumentation.start_report('pipeline_daemon')
+        report.metadata = {'mailboxes': [path for path, _, _ in ranges],
+                           'bytes': sum(end - start for _, start, end in ranges)}
+
+        with instrumentation.stage('Extraction') as timer:
+            records = []
+            for mbox_path, start, end in ranges:
+                for record in extract_shard((mbox_path, start, end)):
+                    record['mbox_path'] = mbox_path
+                    records.append(record)
+            extracted = timer.done(pd.DataFrame(records))
+
+        delta = extracted
+        if len(extracted) > 0:
+            extracted['extraction_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            delta = self.ledger.select_new(extracted)
+        print(f"🆕 {len(delta)} new or changed of {len(extracted)} emails in {len(ranges)} mailbox(es)")
+
+        if len(delta) > 0:
+            delta = delta[['email_id'] + [column for column in delta.columns if column != 'email_id']]
+            inputs = delta.drop(columns=['ledger_key', 'content_hash'])
+
+            self.company_index.added = self.company_index.comparisons = 0
+            self.refresh_domain_table()
+            domain_table = self.domain_table
+            if domain_table is None and self.output is not None:
+                domain_table = load_domain_table(self.output)
+            stages = pipeline_stages(company_index=self.company_index, domain_table=domain_table)
+            rows, df = run_delta(inputs, self.df, self.output, stages)
+
+            with instrumentation.stage('Writing outputs', df):
+                replace_dataset(df, self.output_path)
+                replace_dataset(df[df['company_name'] != 'Unknown Company'], self.powerbi_path)
+                if COMPANY_INDEX_PATH:
+                    self.company_index.save(COMPANY_INDEX_PATH)
+                if MESSAGE_INDEX_PATH:
+                    with MessageIndex() as index:
+                        index.add(delta)
+                # Saved input last: on restart its rows count as seen, so they must already be in LIVE
+                replace_dataset(rows, self.input_path)
+            self.df, self.output = rows, df
+            print(f"📤 {self.output_path}: {len(df)} records, {df['company_name'].nunique()} companies")
+
+        # Offsets and ledger commit together, only once the outputs are in place
+        self.offsets.set_many({mbox_path: end for mbox_path, _, end in ranges})
+        if len(delta) > 0:
+            self.ledger.mark_processed(delta)
+        else:
+            self.ledger.conn.commit()
+        report.write()
+        return len(delta)
+
+    def run(self, poll_seconds=POLL_SECONDS, once=False):
+        """Poll the drop folder until interrupted (or, with once, process what is there and stop)
+
+        A batch that fails is logged and left unprocessed - outputs, saved
+        input, offsets and ledger stay as they were - and is tried again
+        once more mail arrives.
+        """
+        print(f"👀 Watching {self.drop_dir} every {poll_seconds:g}s - Ctrl+C to stop")
+        failed = None
+        try:
+            while True:
+                ranges = self.pending_ranges(wait_for_writes=not once)
+                if ranges and ranges != failed:
+                    print(f"\n📬 {datetime.now():%H:%M:%S} new mail in {len(ranges)} mailbox(es)")
+                    try:
+                        self.process(ranges)
+                        failed = None
+                    except Exception:
+                        traceback.print_exc()
+                        print("❌ Batch failed - nothing was marked processed, retrying when more mail arrives")
+                        failed = ranges
+                if once:
+                    break
+                time.sleep(poll_seconds)
+        except KeyboardInterrupt:
+            pass
+        print(f"👋 Stopped watching {self.drop_dir}")
+
+if __name__ == '__main__':
+    # Usage: python pipeline_daemon.py [drop folder] [--base=unthreaded dataset] [--once]
+    args = sys.argv[1:]
+    folders = [arg for arg in args if not arg.startswith('--')]
+    bases = [arg.split('=', 1)[1] for arg in args if arg.startswith('--base=')]
+
+    print("🛰️  Starting pipeline daemon...")
+    print(f"Started at: {datetime.now()}")
+    try:
+        daemon = PipelineDaemon(folders[0] if folders else DROP_DIR, bases[0] if bases else None)
+    except ValueError as error:
+        raise SystemExit(f"❌ {error}")
+    with daemon:
+        print(f"Live outputs: {daemon.output_path} ({DATASET_FORMAT}), {daemon.powerbi_path}")
+        daemon.run(once='--once' in args)
\ No newline at end of file
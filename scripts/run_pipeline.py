@@ -0,0 +1,235 @@
+import os
+import sys
+import pandas as pd
+from datetime import datetime
+import instrumentation
+from content_dedup import mark_duplicates
+from dataset_store import OUTPUT_DIR, dataset_path, datasets, export_csv, latest_dataset, load_dataset, save_dataset
+from domain_intelligence import load_domain_table
+from ingestion_ledger import merge_into_dataset
+from schema import apply_schema
+from deduplicate_threads import group_email_threads
+from calculate_metrics import calculate_metrics
+from greenhouse_cleanup import cleanup_greenhouse_companies
+from hi_the_cleanup import cleanup_company_names
+from extract_from_subjects import super_clean_companies
+
+DEFAULT_INPUT = 'processed_data/job_emails_IMPROVED_20250613_1034.csv'
+
+# Job fields normally filled in by the job-data extraction step (not part of this repository).
+# New messages start unresolved; the cleanup stages then work out their company
+JOB_FIELD_DEFAULTS = {
+    'company_name': 'Unknown Company',
+    'company_confidence': 0,
+    'role_title': None,
+    'role_confidence': 0,
+    'status': None,
+    'status_confidence': 0,
+}
+
+def pipeline_stages(statuses=('interview_scheduled',), current_date=None, company_index=None, domain_table=None):
+    """(label, stage function) pairs in run order
+
+    Labels match the file names the standalone scripts write, so a
+    checkpoint at any stage is a drop-in replacement for that script's
+    output. The REFINED step between consolidation and metrics has no
+    script in this repository - start at WITH_METRICS to feed a REFINED
+    file in directly. DEDUPLICATED labels copies of the same
+    notification (content_fingerprint, duplicate_count) and keeps every
+    email, so thread counts and the funnel still count each one.
+    A resident process can pass its already loaded company index and
+    domain table so they are not re-read on every run.
+    """
+    return [
+        ('DEDUPLICATED', mark_duplicates),
+        ('CONSOLIDATED', lambda df: group_email_threads(df, statuses)),
+        ('WITH_METRICS', lambda df: calculate_metrics(df, current_date)),
+        ('FINAL_CLEAN', cleanup_greenhouse_companies),
+        ('FINAL_CLEANED', lambda df: cleanup_company_names(df, domain_table)),
+        ('SUPER_CLEAN', lambda df: super_clean_companies(df, company_index)),
+    ]
+
+def run_pipeline(df, stages, start=None, checkpoints=(), output_dir=OUTPUT_DIR):
+    """Run the stages in order on one in-memory DataFrame
+
+    Nothing is written between stages unless the stage label is listed in
+    `checkpoints`; `start` skips the stages before that label.
+    """
+    labels = [label for label, _ in stages]
+    if start is not None:
+        stages = stages[labels.index(start):]
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M')
+
+    for label, stage in stages:
+        print(f"\n▶️  Stage {label} ({len(df)} records in)")
+        dtypes = df.dtypes
+        with instrumentation.stage(label, df) as timer:
+            df = timer.done(stage(df))
+        print(f"✅ Stage {label} done: {len(df)} records in {timer.wall_seconds:.1f}s")
+        # New metric columns arrive as plain strings/int64 - type just those, the rest already is
+        changed = [column for column in df.columns if column not in dtypes or df[column].dtype != dtypes[column]]
+        if changed:
+            df = apply_schema(df, changed)
+
+        if label in checkpoints:
+            checkpoint_file = save_dataset(df, label, timestamp, output_dir)
+            print(f"💾 Checkpoint: {checkpoint_file}")
+    return df
+
+def labelled_rows(delta, existing):
+    """Job fields for freshly extracted rows
+
+    Messages already in the dataset (content changed since) keep the
+    fields they had; new ones get JOB_FIELD_DEFAULTS.
+    """
+    delta = delta.copy()
+    previous = None
+    if existing is not None and len(existing) > 0:
+        previous = existing.set_index('email_id')
+        known = delta['email_id'].isin(previous.index)
+    for column, default in JOB_FIELD_DEFAULTS.items():
+        values = pd.Series(default, index=delta.index, dtype=object)
+        if previous is not None and column in previous.columns:
+            kept = delta['email_id'].map(previous[column].astype(object))
+            values = kept.where(known, values)
+        delta[column] = values
+    return delta
+
+def threaded(df, statuses):
+    """Mask of the rows group_email_threads consolidates (every row when statuses is None)"""
+    if statuses is None:
+        return pd.Series(True, index=df.index)
+    return df['status'].isin(list(statuses))
+
+def run_delta(delta, rows, output, stages, statuses=('interview_scheduled',)):
+    """Fold new or changed emails into an earlier run instead of rerunning it
+
+    `rows` is that run's DEDUPLICATED checkpoint (every email, not yet
+    threaded) and `output` its final dataset. Only the delta is
+    fingerprinted and taken through the later stages. When the delta
+    touches a threaded status the threads are rebuilt, from the threaded
+    rows alone. A delta email only shares a fingerprint with an older one
+    when it is an exact copy; duplicate_count is recounted over all rows.
+    The other rows keep the time-based metrics of the run that computed
+    them until the next full run. Without an output yet, every row goes
+    through the stages once. Returns (rows, output) with the delta
+    merged in by email_id.
+    """
+    labels = [label for label, _ in stages]
+    split = labels.index('CONSOLIDATED')
+    if output is None:
+        rows = run_pipeline(apply_schema(merge_into_dataset(rows, labelled_rows(delta, rows))), stages[:split])
+        return rows, run_pipeline(rows.copy(), stages[split:])
+
+    delta = apply_schema(labelled_rows(delta, rows))
+    changed = rows[rows['email_id'].isin(delta['email_id'])]
+    rethread = threaded(delta, statuses).any() or threaded(changed, statuses).any()
+
+    delta = run_pipeline(delta, stages[:split])
+    rows = merge_into_dataset(rows, delta)
+    rows['duplicate_count'] = rows.groupby('content_fingerprint')['content_fingerprint'].transform('size').astype('int64')
+
+    # A changed email may have been folded into a thread, so its old row goes whatever it becomes
+    output = output[~output['email_id'].isin(delta['email_id'])]
+    batch = delta[~threaded(delta, statuses)]
+    if rethread:
+        batch = pd.concat([batch, rows[threaded(rows, statuses)]], ignore_index=True)
+        if 'thread_id' in output.columns:
+            output = output[output['thread_id'].isna()]
+    print(f"🔀 {len(delta)} new or changed emails, {len(batch)} rows through the remaining stages"
+          f"{' (threads rebuilt)' if rethread else ''}")
+
+    batch = run_pipeline(batch, stages[split:])
+    output = merge_into_dataset(output, batch)
+    output['duplicate_count'] = output['email_id'].map(rows.set_index('email_id')['duplicate_count'])
+    return rows, output
+
+def write_outputs(df, label, output_dir=OUTPUT_DIR):
+    """Write the complete dataset and its Power BI version, return both paths"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M')
+    output_file = save_dataset(df, label, timestamp, output_dir)
+
+    powerbi_clean = df[df['company_name'] != 'Unknown Company'].copy()
+    powerbi_file = export_csv(powerbi_clean, dataset_path(label, timestamp, 'POWERBI', output_dir, 'csv'))
+    return output_file, powerbi_file
+
+def parse_args(args, labels):
+    """Usage: python run_pipeline.py [input.csv|input.parquet] [--start=LABEL] [--checkpoint=LABEL,...|all]
+    [--all-statuses] [--delta[=EXTRACTED_DELTA file,...]]"""
+    options = {'input': DEFAULT_INPUT, 'start': None, 'checkpoints': set(), 'all_statuses': False, 'delta': None}
+    for arg in args:
+        if arg == '--all-statuses':
+            options['all_statuses'] = True
+        elif arg == '--delta':
+            options['delta'] = []
+        elif arg.startswith('--delta='):
+            options['delta'] = arg.split('=', 1)[1].split(',')
+        elif arg.startswith('--start='):
+            options['start'] = arg.split('=', 1)[1].upper()
+        elif arg.startswith('--checkpoint='):
+            value = arg.split('=', 1)[1].upper()
+            options['checkpoints'] = set(labels) if value == 'ALL' else set(value.split(','))
+        else:
+            options['input'] = arg
+
+    unknown = ({options['start']} - {None}) | options['checkpoints']
+    unknown -= set(labels)
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {', '.join(sorted(unknown))} (stages: {', '.join(labels)})")
+    return options
+
+if __name__ == '__main__':
+    print("🚀 Starting in-process cleanup pipeline...")
+    print(f"Started at: {datetime.now()}")
+
+    labels = [label for label, _ in pipeline_stages()]
+    options = parse_args(sys.argv[1:], labels)
+    statuses = None if options['all_statuses'] else ('interview_scheduled',)
+
+    if options['delta'] is not None:
+        # New or changed emails only, folded into the outputs of the last run
+        rows_path, base_path = latest_dataset('DEDUPLICATED'), latest_dataset(labels[-1])
+        if not rows_path or not base_path:
+            raise SystemExit("❌ --delta folds into an earlier run - run once with --checkpoint=DEDUPLICATED first")
+        # By default every delta extracted since the DEDUPLICATED dataset was written
+        delta_paths = options['delta'] or [path for path in datasets('EXTRACTED_DELTA')
+                                           if os.path.getmtime(path) > os.path.getmtime(rows_path)]
+        if not delta_paths:
+            print("✅ No new emails since the last run")
+            raise SystemExit(0)
+
+        print(f"📊 Loading {len(delta_paths)} delta(s), {rows_path} and {base_path}...")
+        with instrumentation.stage('Loading dataset') as timer:
+            delta = None
+            for path in delta_paths:
+                delta = merge_into_dataset(delta, load_dataset(path))
+            rows, df = load_dataset(rows_path), timer.done(load_dataset(base_path))
+        print(f"Total records: {len(df)}, delta: {len(delta)}")
+
+        # Without a saved domain table, learn it from the whole cleaned dataset rather than the delta
+        stages = pipeline_stages(statuses, domain_table=load_domain_table(df))
+        rows, df = run_delta(delta, rows, df, stages, statuses)
+    else:
+        stages = pipeline_stages(statuses)
+
+        print(f"📊 Loading {options['input']}...")
+        with instrumentation.stage('Loading dataset') as timer:
+            df = timer.done(load_dataset(options['input']))
+        print(f"Total records: {len(df)}")
+
+        # The last stage's output is written below either way
+        df = run_pipeline(df, stages, options['start'], options['checkpoints'] - {labels[-1]})
+
+    with instrumentation.stage('Writing outputs', df):
+        output_file, powerbi_file = write_outputs(df, labels[-1])
+        if options['delta'] is not None:
+            # Written last: its time marks which deltas are folded in
+            save_dataset(rows, 'DEDUPLICATED')
+
+    print(f"\n🎯 PIPELINE OUTPUTS:")
+    print(f"Complete dataset: {output_file}")
+    print(f"  - Total records: {len(df)}")
+    print(f"  - Unique companies: {df['company_name'].nunique()}")
+    print(f"Power BI ready: {powerbi_file}")
+    instrumentation.write_report()
+    print(f"\n🏁 Pipeline completed at: {datetime.now()}")
\ No newline at end of file
@@ -0,0 +1,129 @@
+import pandas as pd
+
+# Column types from docs/data_schema.md
+
+STATUS_VALUES = ['applied', 'interview_scheduled', 'interviewed', 'follow_up', 'rejected',
+                 'offer', 'withdrawn', 'on_hold', 'unknown']
+PIPELINE_STATUS_VALUES = ['hot', 'warm', 'cooling', 'cold', 'ghosted', 'closed',
+                          'unknown_timeline', 'unknown_status']
+OPPORTUNITY_TYPE_VALUES = ['direct_application', 'recruiter_outreach', 'interview_process',
+                           'follow_up', 'networking', 'other']
+PRIORITY_LEVEL_VALUES = ['Critical', 'High', 'Medium', 'Low', 'Inactive']
+RESPONSE_TYPE_VALUES = ['multi_exchange', 'responded', 'responded_negative', 'no_response']
+LOCATION_TYPE_VALUES = ['remote', 'hybrid', 'onsite']
+
+# Enum columns -> documented values (None: open set such as sender domains)
+CATEGORICAL_COLUMNS = {
+    'status': STATUS_VALUES,
+    'pipeline_status': PIPELINE_STATUS_VALUES,
+    'opportunity_type': OPPORTUNITY_TYPE_VALUES,
+    'priority_level': PRIORITY_LEVEL_VALUES,
+    'response_type': RESPONSE_TYPE_VALUES,
+    'location_type': LOCATION_TYPE_VALUES,
+    'recommended_action': None,
+    'sender_domain': None,
+}
+
+TIMESTAMP_COLUMNS = ['email_date', 'first_email_date', 'last_email_date', 'extraction_date']
+
+INTEGER_COLUMNS = ['body_length', 'attachment_count', 'thread_email_count', 'duplicate_count', 'days_since_contact']
+
+# 0-100 scores, one byte per row
+SCORE_COLUMNS = ['company_confidence', 'role_confidence', 'status_confidence', 'priority_score',
+                 'salary_confidence', 'location_confidence']
+
+BOOLEAN_COLUMNS = ['requires_review']
+
+BOOLEAN_TEXT = {'true': True, 'false': False, '1': True, '0': False}
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def to_categorical(values, known=None):
+    """Categorical with the documented values first, then any others seen in the data"""
+    text = values.astype(str).where(values.notna(), None)
+    categories = list(known or [])
+    seen = set(categories)
+    categories += sorted(value for value in pd.unique(text.dropna()) if value not in seen)
+    return pd.Categorical(text, categories=categories)
+
+def to_timestamps(values):
+    """Naive UTC timestamps (NaT where unparseable), matching the extractor's email_date
+
+    Values with a UTC offset are converted rather than dropped, so rows
+    the CSV pipeline left as unknown_timeline now get an age in the
+    metrics stage (see docs/data_schema.md).
+    """
+    if pd.api.types.is_datetime64_any_dtype(values) and not isinstance(values.dtype, pd.DatetimeTZDtype):
+        return values
+    parsed = pd.to_datetime(values, errors='coerce', format='ISO8601', utc=True)
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], errors='coerce', format='mixed', utc=True)
+    return parsed.dt.tz_localize(None)
+
+def to_integers(values):
+    """Nullable integers, or floats when the column holds fractional values"""
+    numeric = pd.to_numeric(values, errors='coerce')
+    whole = numeric.dropna()
+    if (whole == whole.round()).all():
+        return numeric.round().astype('Int64')
+    return numeric.astype('float64')
+
+def to_scores(values):
+    """UInt8 for 0-100 scores, or the to_integers type when values fall outside 0-255"""
+    numeric = to_integers(values)
+    if numeric.dtype == 'Int64':
+        known = numeric.dropna()
+        if known.empty or (known.min() >= 0 and known.max() <= 255):
+            return numeric.astype('UInt8')
+    return numeric
+
+def to_booleans(values):
+    if pd.api.types.is_bool_dtype(values):
+        return values.astype('boolean')
+    mapped = values.map(lambda value: value if isinstance(value, bool) else BOOLEAN_TEXT.get(str(value).strip().lower()))
+    if mapped[values.notna()].isna().any():
+        return values  # Free text - leave it as it is
+    return mapped.astype('boolean')
+
+def apply_schema(df, columns=None):
+    """Cast the documented columns present in df to their schema types
+
+    With `columns`, only those are cast and the rest of the frame is not
+    copied - for typing the columns a stage has just added.
+    """
+    df = df.copy() if columns is None else df.copy(deep=False)
+    wanted = set(df.columns) if columns is None else set(columns) & set(df.columns)
+    for column, known in CATEGORICAL_COLUMNS.items():
+        if column in wanted and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = to_categorical(df[column], known)
+    for column in TIMESTAMP_COLUMNS:
+        if column in wanted:
+            df[column] = to_timestamps(df[column])
+    for column in INTEGER_COLUMNS:
+        if column in wanted:
+            df[column] = to_integers(df[column])
+    for column in SCORE_COLUMNS:
+        if column in wanted:
+            df[column] = to_scores(df[column])
+    for column in BOOLEAN_COLUMNS:
+        if column in wanted:
+            df[column] = to_booleans(df[column])
+    return df
+
+def memory_usage(df):
+    """Bytes held by the DataFrame, string contents included"""
+    return int(df.memory_usage(deep=True).sum())
+
+def normalize(df, label='Dataset'):
+    """apply_schema, reporting memory before and after"""
+    before = memory_usage(df)
+    df = apply_schema(df)
+    after = memory_usage(df)
+    print(f"🗜️  {label}: {before / 2**20:.1f} MB → {after / 2**20:.1f} MB in memory ({before / max(after, 1):.1f}x smaller)")
+    return df
+
+def observed_counts(values):
+    """value_counts() without the zero rows categorical columns report for unused categories"""
+    counts = values.value_counts()
+    return counts[counts > 0]
\ No newline at end of file
@@ -0,0 +1,133 @@
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+SIMILARITY_THRESHOLD = 0.8
+
+def subject_bigrams(text):
+    """Multiset of character bigrams in a normalized subject"""
+    return Counter(text[i:i + 2] for i in range(len(text) - 1))
+
+def short_subject_length(threshold):
+    """Length below which two subjects can clear the threshold without sharing a bigram
+
+    SequenceMatcher.ratio() > t implies an insert/delete distance d below
+    (1 - t) * (len_a + len_b). Each edit destroys at most two bigrams, so the
+    pair shares at least max_len - 1 - 2d bigrams, which is positive once
+    max_len >= 1 / (4t - 3). Below that length subjects are always compared.
+    """
+    if threshold <= 0.75:
+        return None  # Bigram filtering is not sound this low - compare everything
+    return int(1 / (4 * threshold - 3)) + 1
+
+class CompanyBucket:
+    """Inverted bigram index over the distinct subjects seen for one company"""
+
+    def __init__(self):
+        self.subjects = []       # distinct normalized subjects, insertion order
+        self.first_thread = []   # lowest thread id each subject belongs to
+        self.lookup = {}         # subject -> position in self.subjects
+        self.postings = defaultdict(list)  # bigram -> [(position, count)]
+        self.unfiltered = []     # positions that must always be compared
+
+    def add(self, subject, thread_id, short_length):
+        position = self.lookup.get(subject)
+        if position is not None:
+            self.first_thread[position] = min(self.first_thread[position], thread_id)
+            return
+
+        position = len(self.subjects)
+        self.subjects.append(subject)
+        self.first_thread.append(thread_id)
+        self.lookup[subject] = position
+        for gram, count in subject_bigrams(subject).items():
+            self.postings[gram].append((position, count))
+        if short_length is None or len(subject) < short_length:
+            self.unfiltered.append(position)
+
+class ThreadMatcher:
+    """Incremental subject clustering equivalent to the all-pairs SequenceMatcher scan
+
+    A new subject joins the lowest-numbered thread holding a subject for the
+    same company with similarity above the threshold, otherwise it opens a
+    new thread - exactly what comparing against every earlier subject does.
+    Candidates come from a per-company bigram index and only those that pass
+    the length and shared-bigram bounds get the exact ratio() check.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.short_length = short_subject_length(threshold)
+        self.buckets = defaultdict(CompanyBucket)
+        self.thread_count = 0
+        self.comparisons = 0
+
+    def _candidates(self, bucket, subject, before=None):
+        """Return sorted (thread_id, position) pairs that could clear the threshold"""
+        length = len(subject)
+        first_thread = bucket.first_thread
+        shared = defaultdict(int)
+        for gram, count in subject_bigrams(subject).items():
+            for position, other_count in bucket.postings.get(gram, ()):
+                shared[position] += count if count < other_count else other_count
+
+        positions = set(shared)
+        if self.short_length is None or length < self.short_length:
+            positions.update(bucket.unfiltered)
+
+        candidates = []
+        for position in positions:
+            thread_id = first_thread[position]
+            if before is not None and thread_id >= before:
+                continue
+            other_length = len(bucket.subjects[position])
+            total = length + other_length
+            # real_quick_ratio() bound
+            if 2 * min(length, other_length) < self.threshold * total - 1e-9:
+                continue
+            if self.short_length is not None:
+                max_edits = int(total * (1 - self.threshold) + 1e-9)
+                required = max(length, other_length) - 1 - 2 * max_edits
+                if required > 0 and shared.get(position, 0) < required:
+                    continue
+            candidates.append((thread_id, position))
+        candidates.sort()
+        return candidates
+
+    def find_thread(self, subject, company):
+        """Return the thread id this subject belongs to, or None for a new thread"""
+        if not subject:
+            return None
+        bucket = self.buckets.get(company)
+        if bucket is None:
+            return None
+
+        # An identical subject always matches, so only earlier threads can win
+        exact_position = bucket.lookup.get(subject)
+        best = bucket.first_thread[exact_position] if exact_position is not None else None
+
+        for thread_id, position in self._candidates(bucket, subject, before=best):
+            self.comparisons += 1
+            # Same argument order as calculate_similarity() - ratio() is not symmetric
+            matcher = SequenceMatcher(None, subject, bucket.subjects[position])
+            if matcher.quick_ratio() > self.threshold and matcher.ratio() > self.threshold:
+                return thread_id
+        return best
+
+    def new_thread(self):
+        """Open a new thread and return its id"""
+        thread_id = self.thread_count
+        self.thread_count += 1
+        return thread_id
+
+    def add(self, subject, company, thread_id):
+        """Register a subject as part of an existing thread"""
+        if subject:
+            self.buckets[company].add(subject, thread_id, self.short_length)
+
+    def assign(self, subject, company):
+        """Place one subject into a thread and return the thread id"""
+        thread_id = self.find_thread(subject, company)
+        if thread_id is None:
+            thread_id = self.new_thread()
+        self.add(subject, company, thread_id)
+        return thread_id
\ No newline at end of file
@@ -0,0 +1,202 @@
+"""Read-only IMAP stand-in that serves the messages of an mbox file
+
+Implements just what imap_source.py sends: CAPABILITY (with Gmail's
+X-GM-EXT-1), LOGIN, NOOP, LOGOUT, EXAMINE/SELECT, UID SEARCH and
+UID FETCH of BODYSTRUCTURE, BODY.PEEK[HEADER.FIELDS (...)],
+BODY.PEEK[section]<0.n> and X-GM-THRID. UIDs start at 101 and
+UIDVALIDITY is 42. message/rfc822 parts are not described correctly, so
+test mailboxes should not contain any.
+
+    python tests/imap_stub_server.py mailbox.mbox 14300
+"""
+import os
+import re
+import socketserver
+import sys
+import threading
+from email import message_from_bytes
+from email.policy import compat32
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from mbox_reader import FROM_SEPARATOR, iter_raw_messages  # noqa: E402
+
+FIRST_UID = 101
+UIDVALIDITY = 42
+
+def load_messages(mbox_path):
+    """Raw messages of an mbox without their From_ lines"""
+    messages = []
+    for _, raw in iter_raw_messages(mbox_path):
+        if raw.startswith(FROM_SEPARATOR):
+            raw = raw[raw.find(b'\n') + 1:]
+        if raw.endswith(b'\n\n'):
+            raw = raw[:-1]
+        messages.append(raw)
+    return messages
+
+def quoted(value):
+    if value is None:
+        return b'NIL'
+    return b'"' + str(value).replace('\\', '\\\\').replace('"', '\\"').encode('utf-8') + b'"'
+
+def parameter_list(pairs):
+    if not pairs:
+        return b'NIL'
+    return b'(' + b' '.join(quoted(name) + b' ' + quoted(value) for name, value in pairs) + b')'
+
+def leaf_parts(message, section=''):
+    """(section number, part) for every non-multipart part, numbered like IMAP does"""
+    if message.is_multipart():
+        parts = []
+        for number, child in enumerate(message.get_payload(), 1):
+            parts += leaf_parts(child, f"{section}.{number}" if section else str(number))
+        return parts
+    return [(section or 'TEXT', message)]
+
+def encoded_payload(part):
+    """A part's body as it appears on the wire (still transfer-encoded)"""
+    payload = part.get_payload(decode=False)
+    if not isinstance(payload, str):
+        return b''
+    try:
+        return payload.encode('ascii', 'surrogateescape')
+    except UnicodeEncodeError:
+        return payload.encode('utf-8', 'surrogateescape')
+
+def body_structure(message):
+    """RFC 3501 BODYSTRUCTURE of a message, extension data included"""
+    if message.is_multipart():
+        children = b''.join(body_structure(child) for child in message.get_payload())
+        boundary = parameter_list(message.get_params()[1:] if message.get_params() else [])
+        return b'(' + children + b' ' + quoted(message.get_content_subtype()) + b' ' + boundary + b' NIL NIL NIL)'
+
+    main_type = message.get_content_maintype()
+    payload = encoded_payload(message)
+    content_params = message.get_params()[1:] if message.get_params() else []
+    fields = [quoted(main_type), quoted(message.get_content_subtype()), parameter_list(content_params),
+              b'NIL', b'NIL', quoted(message.get('Content-Transfer-Encoding', '7bit')), str(len(payload)).encode()]
+    if main_type == 'text':
+        fields.append(str(payload.count(b'\n')).encode())
+
+    disposition = message.get_content_disposition()
+    filename = message.get_filename()
+    disposition_params = [('filename', filename)] if disposition and filename else []
+    fields.append(b'NIL')  # body MD5
+    fields.append(b'(' + quoted(disposition) + b' ' + parameter_list(disposition_params) + b')' if disposition else b'NIL')
+    fields += [b'NIL', b'NIL']  # language, location
+    return b'(' + b' '.join(fields) + b')'
+
+def header_fields(raw, names):
+    """The named header lines (with continuations) of a raw message, CRLF-terminated"""
+    block = raw[:raw.find(b'\n\n') + 1]
+    lines, keep = [], False
+    for line in block.split(b'\n'):
+        if not line:
+            continue
+        if line[:1] in b' \t':
+            if keep:
+                lines.append(line + b'\r\n')
+            continue
+        keep = line.split(b':', 1)[0].strip().upper().decode('ascii', errors='ignore') in names
+        if keep:
+            lines.append(line + b'\r\n')
+    return b''.join(lines) + b'\r\n'
+
+class StubImapServer(socketserver.ThreadingTCPServer):
+    """Serve one mbox as a single read-only folder on 127.0.0.1 (port 0 picks a free port)"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, mbox_path, port=0):
+        self.messages = load_messages(mbox_path)
+        self.uids = list(range(FIRST_UID, FIRST_UID + len(self.messages)))
+        self.by_uid = dict(zip(self.uids, self.messages))
+        self.commands = []
+        super().__init__(('127.0.0.1', port), StubImapHandler)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve from a background thread and return self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def uid_range(self, sequence_set):
+        """UIDs of the messages matched by an IMAP sequence set such as 101:105,110,120:*"""
+        matched = set()
+        for item in sequence_set.split(','):
+            low, _, high = item.partition(':')
+            low = int(low)
+            high = (max(self.uids, default=low) if high == '*' else int(high)) if high else low
+            matched.update(uid for uid in self.uids if min(low, high) <= uid <= max(low, high))
+        return sorted(matched)
+
+class StubImapHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        self.wfile.write(b'* OK stand-in ready\r\n')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            line = line.decode('utf-8').rstrip('\r\n')
+            self.server.commands.append(line)
+            tag, command, *rest = line.split(' ', 2)
+            arguments = rest[0] if rest else ''
+            command = command.upper()
+
+            if command == 'CAPABILITY':
+                self.wfile.write(b'* CAPABILITY IMAP4rev1 X-GM-EXT-1\r\n')
+            elif command == 'LOGOUT':
+                self.wfile.write(b'* BYE\r\n' + tag.encode() + b' OK logged out\r\n')
+                return
+            elif command in ('EXAMINE', 'SELECT'):
+                self.wfile.write(f'* {len(self.server.messages)} EXISTS\r\n'
+                                 f'* OK [UIDVALIDITY {UIDVALIDITY}] UIDs valid\r\n'.encode())
+                self.wfile.write(tag.encode() + b' OK [READ-ONLY] selected\r\n')
+                continue
+            elif command == 'UID':
+                self.uid_command(arguments)
+            self.wfile.write(tag.encode() + b' OK done\r\n')
+
+    def uid_command(self, arguments):
+        subcommand, arguments = arguments.split(' ', 1)
+        if subcommand.upper() == 'SEARCH':
+            uids = self.server.uid_range(arguments.split()[-1])
+            self.wfile.write(b'* SEARCH ' + ' '.join(map(str, uids)).encode() + b'\r\n')
+            return
+
+        sequence_set, items = arguments.split(' ', 1)
+        for uid in self.server.uid_range(sequence_set):
+            raw = self.server.by_uid[uid]
+            message = message_from_bytes(raw, policy=compat32)
+            response = [b'UID ' + str(uid).encode()]
+            if 'BODYSTRUCTURE' in items:
+                response.append(b'BODYSTRUCTURE ' + body_structure(message))
+            fields = re.search(r'BODY\.PEEK\[HEADER\.FIELDS \(([^)]*)\)\]', items)
+            if fields:
+                headers = header_fields(raw, fields.group(1).split())
+                response.append(f'BODY[HEADER.FIELDS ({fields.group(1)})] {{{len(headers)}}}\r\n'.encode() + headers)
+            section = re.search(r'BODY\.PEEK\[([0-9.]+|TEXT)\]<0\.(\d+)>', items)
+            if section:
+                data = encoded_payload(dict(leaf_parts(message))[section.group(1)])[:int(section.group(2))]
+                response.append(f'BODY[{section.group(1)}]<0> {{{len(data)}}}\r\n'.encode() + data)
+            if 'X-GM-THRID' in items:
+                response.append(b'X-GM-THRID ' + str(9000 + uid).encode())
+            sequence_number = self.server.uids.index(uid) + 1
+            self.wfile.write(f'* {sequence_number} FETCH ('.encode() + b' '.join(response) + b')\r\n')
+
+if __name__ == '__main__':
+    server = StubImapServer(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 14300)
+    print(f"📮 Serving {len(server.messages)} messages of {sys.argv[1]} on 127.0.0.1:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
\ No newline at end of file
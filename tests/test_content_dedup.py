@@ -0,0 +1,52 @@
+import pandas as pd
+
+from content_dedup import duplicate_groups, mark_duplicates, once_per_fingerprint, simhash, simhashes
+
+def emails(*rows):
+    return pd.DataFrame([dict(zip(['sender_domain', 'subject_line', 'body_preview', 'message_id'], row))
+                         for row in rows])
+
+def test_copies_group_despite_distinct_message_ids():
+    df = emails(('linkedin.com', '12 new jobs for you', 'Data Analyst at Acme, posted 2 days ago.', '<a@linkedin.com>'),
+                ('linkedin.com', '30 new jobs for you', 'Data Analyst at Acme, posted 5 days ago.', '<b@linkedin.com>'),
+                ('linkedin.com', '30 new jobs for you', 'Data Analyst at Acme, posted 5 days ago.', '<c@linkedin.com>'))
+    assert len(set(duplicate_groups(df))) == 1
+
+def test_template_naming_another_company_is_not_a_duplicate():
+    body = "Hi Jennifer, Just checking in - your application with {} is still under review. We'll have an update soon."
+    df = emails(('myworkday.com', 'Checking in on your PMO Lead application', body.format('Stark Retail'), None),
+                ('myworkday.com', 'Checking in on your PMO Lead application', body.format('Tyrell Consulting'), None),
+                ('other.com', 'Checking in on your PMO Lead application', body.format('Stark Retail'), None))
+    assert len(set(duplicate_groups(df))) == 3
+
+def test_rewording_within_the_same_names_is_a_near_duplicate():
+    df = emails(('acme.com', 'Application received',
+                 'Thank you for applying to Acme. Our recruiting team will review your application and '
+                 'contact you if your skills and experience match the role. Kind regards, Acme Talent', None),
+                ('acme.com', 'Application received',
+                 'Thank you for applying to Acme! Our recruiting team will review your application and '
+                 'contact you if your skills and experience match this role. Kind regards, Acme Talent', None))
+    assert len(set(duplicate_groups(df))) == 1
+
+def test_mark_duplicates_keeps_every_row():
+    df = emails(('a.com', 'Hello', 'same text', '<1@a.com>'), ('a.com', 'Hello', 'same text', '<2@a.com>'),
+                ('b.com', 'Hello', 'same text', '<3@b.com>'))
+    marked = mark_duplicates(df)
+    assert len(marked) == 3
+    assert marked['duplicate_count'].tolist() == [2, 2, 1]
+
+def test_simhashes_match_one_at_a_time():
+    texts = ['', 'one', 'the quick brown fox', 'the quick brown fox jumps']
+    assert simhashes(texts) == [simhash(text) for text in texts]
+
+def test_once_per_fingerprint_resolves_each_group_once():
+    records = pd.DataFrame({'subject_line': ['a', 'b', 'a2', 'c', 'd'],
+                            'content_fingerprint': ['x', 'y', 'x', None, None]})
+    calls = []
+
+    def resolve(rows):
+        calls.append(rows['subject_line'].tolist())
+        return [subject.upper() for subject in rows['subject_line']]
+
+    assert once_per_fingerprint(records, resolve) == ['A', 'B', 'A', 'C', 'D']
+    assert calls == [['a', 'b', 'c', 'd']]
\ No newline at end of file
@@ -0,0 +1,171 @@
+import json
+import mailbox
+from email.message import EmailMessage
+
+import pandas as pd
+import pytest
+
+import imap_source
+from extract_emails import extract_mailboxes
+from imap_source import fetch_items, iter_structure, parse_response, structure_parts
+from imap_stub_server import FIRST_UID, UIDVALIDITY, StubImapServer
+
+NESTED_STRUCTURE = (
+    b'* 1 FETCH (UID 9 BODYSTRUCTURE ('
+    b'(("text" "plain" ("charset" "utf-8") NIL NIL "quoted-printable" 120 4 NIL NIL NIL NIL)'
+    b'("text" "html" ("charset" "utf-8") NIL NIL "base64" 400 6 NIL NIL NIL NIL)'
+    b' "alternative" ("boundary" "inner") NIL NIL NIL)'
+    b'("application" "pdf" ("name" "cv.pdf") NIL NIL "base64" 7800 NIL'
+    b' ("attachment" ("filename" "Offer \\"final\\".pdf")) NIL NIL)'
+    b' "mixed" ("boundary" "outer") NIL NIL NIL))'
+)
+
+FORWARDED_STRUCTURE = (
+    b'* 2 FETCH (UID 10 BODYSTRUCTURE ('
+    b'("text" "plain" ("charset" "us-ascii") NIL NIL "7bit" 20 2 NIL NIL NIL NIL)'
+    b'("message" "rfc822" NIL NIL NIL "7bit" 500'
+    b' ("Mon, 1 Jan 2024 10:00:00 +0000" "Fwd" NIL NIL NIL NIL NIL NIL NIL "<a@b>")'
+    b' ("text" "plain" ("charset" "us-ascii") NIL NIL "7bit" 300 9 NIL NIL NIL NIL) 12'
+    b' NIL ("attachment" ("filename" "forwarded.eml")) NIL NIL)'
+    b' "mixed" ("boundary" "b") NIL NIL NIL))'
+)
+
+def structure_of(response):
+    return fetch_items([response]).popitem()[1]['BODYSTRUCTURE']
+
+def test_parse_response_nil_quoted_and_nested_lists():
+    data = [b'1 (UID 5 FLAGS () X-TEST ("a \\"quoted\\" word" NIL (nil "x")))']
+    assert parse_response(data) == [b'1', [b'UID', b'5', b'FLAGS', [], b'X-TEST',
+                                           [b'a "quoted" word', None, [None, b'x']]]]
+
+def test_fetch_items_literals_are_taken_verbatim():
+    header = b'Subject: (not "a list"\r\n\r\n'
+    data = [(b'1 (UID 7 BODY[HEADER.FIELDS (SUBJECT)] {%d}' % len(header), header),
+            (b' BODY[1]<0> {3}', b'a)c'),
+            b' X-GM-THRID 55)']
+    items = fetch_items(data)[7]
+    assert items['BODY[HEADER.FIELDS (SUBJECT)]'] == header
+    assert items['BODY[1]<0>'] == b'a)c'
+    assert items['X-GM-THRID'] == b'55'
+
+def test_fetch_items_several_messages():
+    data = [b'1 (UID 101 X-GM-THRID 55)', b'2 (UID 102 X-GM-THRID NIL)']
+    assert fetch_items(data) == {101: {'UID': b'101', 'X-GM-THRID': b'55'},
+                                 102: {'UID': b'102', 'X-GM-THRID': None}}
+
+def test_nested_multipart_sections():
+    parts = list(iter_structure(structure_of(NESTED_STRUCTURE)))
+    assert [(section, content_type) for section, content_type, *_ in parts] == [
+        ('1.1', 'text/plain'), ('1.2', 'text/html'), ('2', 'application/pdf')]
+
+    text_part, html_part, attachments = structure_parts(structure_of(NESTED_STRUCTURE))
+    assert text_part[0] == '1.1' and text_part[3] == 'quoted-printable'
+    assert html_part[0] == '1.2' and html_part[3] == 'base64'
+    assert attachments == [{'filename': 'Offer "final".pdf', 'content_type': 'application/pdf',
+                            'size': int(7800 * imap_source.BASE64_BYTES_PER_OCTET),
+                            'section': '2', 'encoding': 'base64'}]
+
+def test_forwarded_message_disposition():
+    text_part, html_part, attachments = structure_parts(structure_of(FORWARDED_STRUCTURE))
+    assert text_part[0] == '1' and html_part is None
+    assert [(a['section'], a['filename'], a['content_type']) for a in attachments] == [
+        ('2', 'forwarded.eml', 'message/rfc822')]
+
+def test_single_part_section_is_text():
+    response = b'* 3 FETCH (UID 11 BODYSTRUCTURE ("text" "plain" ("charset" "us-ascii") NIL NIL "7bit" 10 1 NIL NIL NIL NIL))'
+    text_part, html_part, attachments = structure_parts(structure_of(response))
+    assert text_part[0] == 'TEXT' and html_part is None and attachments == []
+
+def sample_messages():
+    def message(subject, message_id=True, **headers):
+        msg = EmailMessage()
+        number = len(messages) + 1
+        msg['From'] = headers.pop('sender', 'Recruiting <jobs@example.com>')
+        msg['To'] = 'me@example.org'
+        msg['Subject'] = subject
+        if message_id:
+            msg['Message-ID'] = f"<sample-{number}@example.com>"
+            msg['Date'] = 'Tue, 02 Jan 2024 09:30:00 +0100'
+        for name, value in headers.items():
+            msg[name.replace('_', '-')] = value
+        messages.append(msg)
+        return msg
+
+    messages = []
+
+    plain = message('Application received')
+    plain.set_content('Thanks for applying to the Data Analyst role.\nWe will be in touch.\n')
+
+    alternative = message('Interview invitation', In_Reply_To='<earlier@example.com>')
+    alternative.set_content('Café chat on Thursday? Let us know — thanks!\n', cte='quoted-printable')
+    alternative.add_alternative('<p>Café chat on <b>Thursday</b>?</p>\n', subtype='html')
+
+    nested = message('Your offer letter')
+    nested.set_content('Please find the offer attached.\n')
+    nested.add_alternative('<p>Please find the <i>offer</i> attached.</p>\n', subtype='html')
+    nested.add_attachment(b'%PDF-1.4 offer' * 50, maintype='application', subtype='pdf', filename='offer.pdf')
+
+    html_only = message('Weekly job alert')
+    html_only.set_content('<html><body><h1>New jobs</h1><p>Analyst at Acme</p></body></html>\n',
+                          subtype='html', cte='base64')
+
+    eight_bit = message('=?utf-8?q?R=C3=A9sum=C3=A9_update?=',
+                        References=' '.join(f'<reply-{n}.thread@mail.example.com>' for n in range(6)))
+    eight_bit.set_content('Grüße aus München — see you soon.\n', cte='8bit')
+
+    quoted_name = message('Signed contract')
+    quoted_name.set_content('Contract attached.\n')
+    quoted_name.add_attachment(b'contract', maintype='application', subtype='octet-stream',
+                               filename='Contract "v2".docx')
+
+    anonymous = message('No headers here', message_id=False, sender='noreply@example.net')
+    anonymous.set_content('A message without Message-ID or Date.\n')
+
+    # Raw bytes, with the References header folded over two lines as long headers are on the wire
+    raw = [msg.as_bytes() for msg in messages]
+    raw[messages.index(eight_bit)] = raw[messages.index(eight_bit)].replace(b'> <reply-3', b'>\n <reply-3')
+    return raw
+
+@pytest.fixture
+def mbox_path(tmp_path):
+    path = tmp_path / 'sample.mbox'
+    box = mailbox.mbox(str(path))
+    for raw in sample_messages():
+        box.add(raw)
+    box.close()
+    return str(path)
+
+@pytest.fixture
+def imap_server(mbox_path):
+    server = StubImapServer(mbox_path).start()
+    yield server
+    imap_source.close_connections()
+    server.stop()
+
+# Columns only one of the two sources can fill, or that depend on when/where a message was read
+SOURCE_COLUMNS = {'email_id', 'extraction_date', 'mbox_path', 'mbox_offset', 'mbox_length',
+                  'gmail_thread_id', 'attachments', 'imap_folder', 'imap_uid'}
+
+def test_records_match_mbox_extraction(mbox_path, imap_server):
+    conn = imap_source.connect(host='127.0.0.1', port=imap_server.port, user='u', password='p', use_ssl=False)
+    assert imap_source.select_folder(conn, 'INBOX') == UIDVALIDITY
+    fetched = pd.DataFrame(imap_source.fetch_new(conn))
+    extracted = extract_mailboxes([mbox_path], 1)
+
+    assert len(fetched) == len(extracted) == len(sample_messages())
+    columns = [column for column in extracted.columns if column not in SOURCE_COLUMNS]
+    assert set(columns) <= set(fetched.columns)
+    pd.testing.assert_frame_equal(fetched[columns].reset_index(drop=True),
+                                  extracted[columns].reset_index(drop=True), check_dtype=False)
+
+    uids = range(FIRST_UID, FIRST_UID + len(fetched))
+    assert list(fetched['gmail_thread_id']) == [str(9000 + uid) for uid in uids]
+    attachment_fields = lambda files: [(f['filename'], f['content_type'], f.get('encoding')) for f in json.loads(files)]
+    assert list(fetched['attachments'].map(attachment_fields)) == list(extracted['attachments'].map(attachment_fields))
+
+def test_fetch_new_after_checkpoint(imap_server):
+    conn = imap_source.connect(host='127.0.0.1', port=imap_server.port, user='u', password='p', use_ssl=False)
+    imap_source.select_folder(conn, 'INBOX')
+    last = FIRST_UID + len(imap_server.messages) - 1
+    assert len(imap_source.fetch_new(conn, since_uid=last - 2)) == 2
+    assert imap_source.fetch_new(conn, since_uid=last) == []
\ No newline at end of file
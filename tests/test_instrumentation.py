@@ -0,0 +1,16 @@
+import instrumentation
+
+def test_nested_stage_names_are_paths():
+    report = instrumentation.start_report('test')
+    with report.stage('FINAL_CLEAN'):
+        with report.stage('Extracting Greenhouse company names'):
+            with report.stage('Loading spaCy model'):
+                pass
+        with report.stage('Resolving companies'):
+            pass
+    assert [timer.name for timer in report.stages] == [
+        'FINAL_CLEAN / Extracting Greenhouse company names / Loading spaCy model',
+        'FINAL_CLEAN / Extracting Greenhouse company names',
+        'FINAL_CLEAN / Resolving companies',
+        'FINAL_CLEAN',
+    ]
\ No newline at end of file
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pandas as pd
+
+from company_index import CompanyIndex
+from domain_intelligence import load_domain_table
+from ingestion_ledger import merge_into_dataset
+from run_pipeline import JOB_FIELD_DEFAULTS, labelled_rows, pipeline_stages, run_delta, run_pipeline
+from schema import apply_schema
+
+def emails(*rows):
+    columns = ['email_id', 'subject_line', 'sender_email', 'email_date', 'body_preview', 'status', 'company_name']
+    df = pd.DataFrame([dict(zip(columns, row)) for row in rows])
+    df['sender_domain'] = df['sender_email'].str.split('@').str[1]
+    df['company_confidence'] = df['status_confidence'] = df['role_confidence'] = 80
+    df['role_title'] = 'Data Analyst'
+    return apply_schema(df)
+
+def stages(df):
+    return pipeline_stages(current_date=datetime(2025, 3, 1), company_index=CompanyIndex(),
+                           domain_table=load_domain_table(df))
+
+HISTORY = emails(
+    ('email_00001', 'Thank you for applying', 'jobs@acme.com', '2025-01-02 09:00:00',
+     'Thanks for applying to Acme.', 'applied', 'Acme'),
+    ('email_00002', 'Interview: Data Analyst', 'talent@globex.com', '2025-01-05 10:00:00',
+     'Can you meet on Friday?', 'interview_scheduled', 'Globex'),
+    ('email_00003', 'Update on your application', 'jobs@initech.com', '2025-01-07 11:00:00',
+     'We have decided to move forward with other candidates.', 'rejected', 'Initech'),
+)
+
+def folded(delta):
+    """run_delta over HISTORY, plus a full run over the same rows, both sorted by email_id"""
+    rows = run_pipeline(HISTORY.copy(), stages(HISTORY)[:1])
+    output = run_pipeline(rows.copy(), stages(HISTORY)[1:])
+    _, merged = run_delta(delta, rows, output, stages(output))
+    full = run_pipeline(merge_into_dataset(HISTORY, labelled_rows(delta, HISTORY)), stages(output))
+    return [apply_schema(df).sort_values('email_id').reset_index(drop=True) for df in (merged, full)]
+
+def test_new_email_is_added_without_touching_the_rest():
+    delta = emails(('email_00004', 'Thank you for applying', 'jobs@hooli.com', '2025-02-01 09:00:00',
+                    'Thanks for applying to Hooli.', None, None)).drop(columns=list(JOB_FIELD_DEFAULTS))
+    merged, full = folded(delta)
+    assert merged['email_id'].tolist() == ['email_00001', 'email_00002', 'email_00003', 'email_00004']
+    columns = [column for column in full.columns if column != 'company_id']
+    pd.testing.assert_frame_equal(merged[columns], full[columns], check_dtype=False, check_like=True)
+
+def test_changed_interview_email_rebuilds_its_thread():
+    delta = emails(('email_00002', 'Interview: Data Analyst', 'talent@globex.com', '2025-01-05 10:00:00',
+                    'Can you meet on Friday at 3pm?', None, None)).drop(columns=list(JOB_FIELD_DEFAULTS))
+    merged, full = folded(delta)
+    assert merged['email_id'].tolist() == ['email_00001', 'email_00002', 'email_00003']
+    interview = merged.set_index('email_id').loc['email_00002']
+    assert interview['status'] == 'interview_scheduled'
+    assert interview['body_preview'] == 'Can you meet on Friday at 3pm?'
+    assert interview['thread_email_count'] == 1
+    columns = [column for column in full.columns if column != 'company_id']
+    pd.testing.assert_frame_equal(merged[columns], full[columns], check_dtype=False, check_like=True)
\ No newline at end of file